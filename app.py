@@ -2,13 +2,46 @@
 # 9 Páginas Funcionales
 
 import dash
-from dash import dcc, html, Input, Output, State
+from dash import dcc, html, Input, Output, State, Patch, ClientsideFunction, DiskcacheManager
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
+import base64
+import hashlib
+import json
+import os
 import pickle
+import threading
+import time
+from collections import OrderedDict
+from flask import g, request
+
+try:
+    import diskcache
+except ImportError:  # sin diskcache los callbacks pesados se ejecutan en el worker
+    diskcache = None
+
+from model_registry import ModelRegistry
+from hot_reload import Reloader
+from figure_cache import FigureCache
+from figure_encoding import PayloadStats, figure_json, loads, slim_figure
+from forest_inference import FOREST_FLAT, FOREST_PKL, load_forest
+from compression import (MIN_BYTES, StaticCompressor, accepted_encoding, compress,
+                         is_compressible)
+from player_search import build_search_index, player_options
+from scatter_lod import DENSITY_THRESHOLD, MAX_POINTS, lod_scatter
+from valuation import valuation_ranking, value_table
+from cluster_service import ClusterService, sync_clusters
+from bargains import bargain_ranking, score_table, weight_vector
+from train_models import check_stage, read_models_manifest
+from neighbors import NeighborIndex, filter_mask, player_vectors
+from similarity_store import neighbour_scores
+from build_data import (COMPACT_TABLE, CSV_PATH, SNAPSHOT_DIR, compact_table, file_hash,
+                        load_dataset, load_model, read_manifest)
+from indexes import (BEST_BY_GROUP, POSITION_BITS, build_position_index, build_team_index,
+                     build_team_stats, build_topk_index, topk_rows)
 
 # ==================== INICIALIZACIÓN ====================
 app = dash.Dash(
@@ -32,65 +65,346 @@ COLORS = {
 }
 
 # ==================== CARGAR DATOS ====================
-print("📊 Cargando dataset histórico...")
-df = pd.read_csv('data/final_data.csv')
-df.columns = df.columns.str.strip()
-df = df.copy()  # Evitar ChainedAssignment warnings
+# El dataset y sus índices viajan juntos en un dict que se sustituye entero
+# al recargar: cada callback lee DATA una sola vez al empezar y trabaja con
+# una versión coherente aunque otra recarga termine mientras tanto.
+def load_data(version=1):
+    # Snapshot columnar con métricas ya calculadas (python build_data.py);
+    # si falta o el CSV ha cambiado se recalcula desde data/final_data.csv
+    df, df_source = load_dataset()
+
+    # Tabla compacta: category para team/position y enteros pequeños. El
+    # snapshot ya se escribe compacto (sus columnas siguen mapeadas) y su
+    # manifest trae la memoria medida en el build; solo hay que compactar
+    # si se ha leído el CSV
+    if df_source == 'snapshot':
+        memory = (read_manifest() or {}).get('memory')
+        if memory:
+            print(f"💾 Tabla compacta (snapshot): {memory['csv_bytes']/1e6:.1f} MB → "
+                  f"{memory['compact_bytes']/1e6:.1f} MB")
+    elif COMPACT_TABLE:
+        mem_before = df.memory_usage(deep=True).sum()
+        df = compact_table(df)
+        mem_after = df.memory_usage(deep=True).sum()
+        print(f"💾 Tabla compacta: {mem_before/1e6:.1f} MB → {mem_after/1e6:.1f} MB")
 
-# Calcular métricas
-df['goles_totales'] = (df['goals'] * df['appearance']).round()
-df['asistencias_totales'] = (df['assists'] * df['appearance']).round()
-df['contribucion_total'] = df['goles_totales'] + df['asistencias_totales']
-df['goles_por_partido'] = (df['goles_totales'] / df['appearance']).fillna(0).replace([np.inf, -np.inf], 0)
-df['asistencias_por_partido'] = (df['asistencias_totales'] / df['appearance']).fillna(0).replace([np.inf, -np.inf], 0)
-df['minutos_por_partido'] = (df['minutes played'] / df['appearance']).fillna(0).replace([np.inf, -np.inf], 0)
+    # Índice de grupos de posición (Portero/Defensa/Medio/Ataque) como bits
+    df['position_group'], position_rows = build_position_index(df)
 
-print(f"✅ {len(df)} jugadores - {df['team'].nunique()} equipos")
+    print(f"✅ {len(df)} jugadores - {df['team'].nunique()} equipos ({df_source})")
+    return {
+        'version': version,
+        'source': df_source,
+        'df': df,
+        'position_rows': position_rows,
+        # Filas de cada equipo y agregados por equipo (totales, medias, mejores)
+        'team_rows': build_team_index(df),
+        'team_stats': build_team_stats(df),
+        # Top-15 de los rankings del dashboard para cada mínimo de partidos
+        'topk': build_topk_index(df, k=15),
+        # Vistas filtradas compartidas entre gráficas (ver shared_view)
+        'views': OrderedDict(),
+        # Buscadores de jugadores (comparación: todos; valuación: con valor)
+        'player_search': build_search_index(df),
+        'valued_search': build_search_index(df, np.flatnonzero(df['current_value'].to_numpy() > 0)),
+    }
+
+print("📊 Cargando dataset histórico...")
+DATA = load_data()
 
 # ==================== CARGAR MODELOS ML ====================
-try:
-    with open('data/model_valuation.pkl', 'rb') as f:
-        ml_model = pickle.load(f)
-    with open('data/scaler_valuation.pkl', 'rb') as f:
-        ml_scaler = pickle.load(f)
-    with open('data/features_valuation.pkl', 'rb') as f:
-        ml_features = pickle.load(f)
-    ML_ENABLED = True
-    print("✅ Predicción Valor")
-except:
-    ML_ENABLED = False
-    ml_model, ml_scaler, ml_features = None, None, None
-    print("⚠️ Predicción no disponible")
+# Los modelos se cargan al primer uso (o en segundo plano tras el arranque
+# con MODEL_WARMUP=1, por defecto) para no retrasar el health check
+def load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
 
-try:
-    with open('data/model_clustering.pkl', 'rb') as f:
-        clustering_model = pickle.load(f)
-    CLUSTERING_ENABLED = True
-    print("✅ Clustering")
-except:
-    CLUSTERING_ENABLED = False
-    clustering_model = None
-    print("⚠️ Clustering no disponible")
+def load_valuation():
+    return {
+        # Bosque en arrays planos (forest_inference.py) si está exportado
+        'model': load_forest(FOREST_PKL, FOREST_FLAT),
+        'scaler': load_pickle('data/scaler_valuation.pkl'),
+        'features': load_pickle('data/features_valuation.pkl'),
+    }
 
-try:
-    with open('data/model_anomaly.pkl', 'rb') as f:
-        anomaly_model = pickle.load(f)
-    ANOMALY_ENABLED = True
-    print("✅ Gangas")
-except:
-    ANOMALY_ENABLED = False
-    anomaly_model = None
-    print("⚠️ Gangas no disponible")
+# Cada modelo se compara al cargarlo con data/models_manifest.json (ver
+# train_models.py): si falta un fichero, no es el del build o se entrenó con
+# otro CSV se avisa en el log y en /models/status
+MODEL_BUILD_ISSUES = {}
 
-try:
-    with open('data/model_recommendation_optimized.pkl', 'rb') as f:
-        recommendation_model = pickle.load(f)
-    RECOMMENDATION_ENABLED = True
-    print("✅ Recomendación")
-except:
-    RECOMMENDATION_ENABLED = False
-    recommendation_model = None
-    print("⚠️ Recomendación no disponible")
+def checked(name, loader):
+    def load():
+        issues = check_stage(read_models_manifest(), name, file_hash(CSV_PATH))
+        MODEL_BUILD_ISSUES[name] = issues
+        for issue in issues:
+            print(f"⚠️ Modelo {name}: {issue}")
+        return loader()
+    return load
+
+MODELS = ModelRegistry()
+MODELS.register('valuation', checked('valuation', load_valuation), "Predicción Valor",
+                paths=[FOREST_PKL, FOREST_FLAT, 'data/scaler_valuation.pkl',
+                       'data/features_valuation.pkl'])
+MODELS.register('clustering', checked('clustering', lambda: load_pickle('data/model_clustering.pkl')),
+                "Clustering", paths=['data/model_clustering.pkl'])
+MODELS.register('anomaly', checked('anomaly', lambda: load_pickle('data/model_anomaly.pkl')), "Gangas",
+                paths=['data/model_anomaly.pkl'])
+# top_indices/top_scores mapeados desde el snapshot (compartidos entre workers)
+def load_recommendation():
+    model = load_model('recommendation', 'data/model_recommendation_optimized.pkl')
+    model['player_search'] = build_search_index(model['players_data'])
+    # Índice de vecinos sobre todos los jugadores para las búsquedas con
+    # filtros; un modelo antiguo con solo similarity_matrix no trae scaler
+    if 'scaler' in model and 'features' in model:
+        model['neighbors'] = NeighborIndex(player_vectors(model, DATA['df']))
+    model['position_groups'], _ = build_position_index(model['players_data'])
+    return model
+
+MODELS.register('recommendation', checked('recommendation', load_recommendation), "Recomendación",
+                paths=['data/model_recommendation_optimized.pkl', f'{SNAPSHOT_DIR}/manifest.json'])
+
+if os.environ.get('MODEL_WARMUP', '1') != '0':
+    MODELS.load_async()
+
+@server.route('/models/status')
+def models_status():
+    status = MODELS.status()
+    for name, issues in MODEL_BUILD_ISSUES.items():
+        status[name]['build_issues'] = issues
+    manifest = read_models_manifest()
+    if manifest is not None:
+        status['build'] = {key: manifest[key] for key in ('created', 'dataset', 'libraries', 'seconds')}
+        for name, stage in manifest['stages'].items():
+            if name in status:
+                status[name]['build'] = {key: stage.get(key) for key in ('seconds', 'metrics')}
+                status[name]['build']['bytes'] = sum(a['bytes'] for a in stage['artifacts'].values())
+    return status
+
+# ==================== VALORACIÓN EN LOTE ====================
+# El valor predicho de todos los jugadores se calcula de una pasada y se
+# guarda junto al dataset (DATA['valuation']); se rehace si cambia el
+# dataset o el modelo. Los callbacks solo leen la tabla.
+VALUATION_LOCK = threading.Lock()
+
+def valuation_values(data):
+    """predicted_value / value_gap / value_gap_pct alineados con data['df'] (None sin modelo)."""
+    valuation = MODELS.get('valuation')
+    if valuation is None:
+        return None
+    version = MODELS.version('valuation')
+    with VALUATION_LOCK:
+        cached = data.get('valuation')
+        if cached is None or cached[0] != version:
+            start = time.perf_counter()
+            cached = (version, value_table(valuation, data['df']))
+            data['valuation'] = cached
+            print(f"💰 Valoración de {len(data['df'])} jugadores ({time.perf_counter() - start:.2f}s)")
+    return cached[1]
+
+if os.environ.get('MODEL_WARMUP', '1') != '0':
+    threading.Thread(target=lambda: valuation_values(DATA), name='valuation-warmup', daemon=True).start()
+
+# ==================== CLUSTERING INCREMENTAL ====================
+# Los jugadores del explorador de estilos salen del dataset actual: los
+# nuevos o con estadísticas cambiadas se proyectan y asignan con el scaler,
+# el PCA y los centroides del modelo (DATA['clustering']). Si el dataset
+# cambia, CLUSTERS reajusta los centroides por mini-lotes en segundo plano
+# cada CLUSTER_REFIT_INTERVAL segundos (0 lo desactiva).
+CLUSTER_LOCK = threading.Lock()
+CLUSTERS = ClusterService(interval=float(os.environ.get('CLUSTER_REFIT_INTERVAL', '3600')))
+
+def clustering_version():
+    return (MODELS.version('clustering'), CLUSTERS.generation)
+
+def clustering_state(data):
+    """Modelo de clustering con 'data' al día con data['df'] (None sin modelo)."""
+    clustering_model = MODELS.get('clustering')
+    if clustering_model is None:
+        return None
+    version = clustering_version()
+    with CLUSTER_LOCK:
+        cached = data.get('clustering')
+        if cached is None or cached[0] != version:
+            start = time.perf_counter()
+            try:
+                synced = sync_clusters(clustering_model, data['df'], CLUSTERS.centers(clustering_model))
+            except KeyError as e:
+                # Dataset sin las columnas de las features: la foto del modelo
+                print(f"⚠️ Clustering sin sincronizar (falta la columna {e})")
+                synced = clustering_model
+            cached = (version, synced)
+            data['clustering'] = cached
+            if 'sync' in synced:
+                print(f"🎨 Estilos de {synced['sync']['players']} jugadores ({synced['sync']['new']} nuevos, "
+                      f"{synced['sync']['changed']} cambiados, {time.perf_counter() - start:.2f}s)")
+    return cached[1]
+
+def clustering_source():
+    if MODELS.is_loading('clustering'):
+        return None
+    data = DATA
+    return MODELS.get('clustering'), data['df'], data['version']
+
+if CLUSTERS.interval > 0:
+    CLUSTERS.start(clustering_source)
+
+@server.route('/clustering/status')
+def clustering_status():
+    state = DATA.get('clustering')
+    return {**CLUSTERS.status(), 'sync': state[1].get('sync') if state else None}
+
+# ==================== RECARGA EN CALIENTE ====================
+# Si cambian el CSV, el snapshot o algún .pkl se reconstruye lo afectado en
+# un hilo aparte y se sustituye de una vez, sin reiniciar gunicorn.
+# DATA_WATCH_INTERVAL=0 desactiva la vigilancia; /admin/reload fuerza una
+# recarga si se define RELOAD_TOKEN.
+DATA_PATHS = [CSV_PATH, f'{SNAPSHOT_DIR}/manifest.json']
+
+def reload_changed(paths):
+    global DATA
+    if any(p in DATA_PATHS for p in paths):
+        start = time.perf_counter()
+        data = load_data(version=DATA['version'] + 1)
+        DATA = data
+        print(f"🔄 Dataset recargado: versión {data['version']} ({time.perf_counter() - start:.2f}s)")
+
+    watched = MODELS.watched_paths()
+    for name in dict.fromkeys(n for p in paths for n in watched.get(p, [])):
+        MODELS.reload(name)
+    
+    # Valoraciones de la versión nueva calculadas antes de que las pida nadie
+    if not MODELS.is_loading('valuation'):
+        valuation_values(DATA)
+    if not MODELS.is_loading('clustering'):
+        clustering_state(DATA)
+
+RELOADER = Reloader(DATA_PATHS + list(MODELS.watched_paths()), reload_changed,
+                    interval=float(os.environ.get('DATA_WATCH_INTERVAL', '30')))
+if RELOADER.interval > 0:
+    RELOADER.start()
+
+@server.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    token = os.environ.get('RELOAD_TOKEN')
+    if not token or request.headers.get('X-Reload-Token') != token:
+        return {'error': 'forbidden'}, 403
+    RELOADER.trigger()
+    return {'status': 'reloading', 'version': DATA['version']}, 202
+
+@server.route('/data/status')
+def data_status():
+    return {'version': DATA['version'], 'source': DATA['source'],
+            'rows': len(DATA['df']), **RELOADER.status()}
+
+# ==================== CACHÉ DE FIGURAS ====================
+# Figuras del dashboard y de rendimiento ya serializadas, por inputs y
+# versión del dataset (FIGURE_CACHE_MB=0 la desactiva)
+FIGURES = FigureCache(max_bytes=int(float(os.environ.get('FIGURE_CACHE_MB', '64')) * 1024 * 1024),
+                      serialize=figure_json, deserialize=loads)
+
+# Vista filtrada que comparten las 4 gráficas de una página: se calcula una
+# vez por filtro y versión del dataset (LRU pequeña dentro de DATA)
+VIEW_SLOTS = 16
+VIEW_LOCK = threading.Lock()
+
+def shared_view(data, key, build):
+    views = data['views']
+    with VIEW_LOCK:
+        if key in views:
+            views.move_to_end(key)
+            return views[key]
+    view = build()
+    with VIEW_LOCK:
+        views[key] = view
+        while len(views) > VIEW_SLOTS:
+            views.popitem(last=False)
+    return view
+
+def figure_update(fig, shown_layout):
+    """(figure, hash del layout) para una gráfica y su dcc.Store.
+
+    Si el layout que ya se muestra es el mismo (p. ej. solo ha cambiado el
+    mínimo de partidos) se envía un Patch que sustituye únicamente los datos.
+    """
+    layout_key = hashlib.sha1(json.dumps(fig['layout'], sort_keys=True).encode()).hexdigest()
+    if layout_key == shown_layout:
+        patch = Patch()
+        patch['data'] = fig['data']
+        return patch, dash.no_update
+    return fig, layout_key
+
+@server.route('/cache/status')
+def cache_status():
+    return FIGURES.stats()
+
+# Bytes y tiempo de cada respuesta de callback, por output (/payload/status)
+PAYLOADS = PayloadStats()
+
+@server.before_request
+def start_timer():
+    g.start = time.perf_counter()
+
+@server.after_request
+def record_payload(response):
+    if request.path.endswith('/_dash-update-component') and 'start' in g:
+        body = request.get_json(silent=True) or {}
+        size = response.calculate_content_length() or 0
+        PAYLOADS.record(body.get('output', '?'), g.get('raw_bytes', size),
+                        time.perf_counter() - g.start, wire_size=size)
+    return response
+
+@server.route('/payload/status')
+def payload_status():
+    return PAYLOADS.stats()
+
+# ==================== COMPRESIÓN ====================
+# brotli/gzip para respuestas de más de COMPRESS_MIN_BYTES (0 desactiva la
+# compresión); los estáticos salen de data/compressed/ (python compression.py)
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', MIN_BYTES))
+STATIC = StaticCompressor()
+STATIC_PREFIXES = ('/assets/', '/_dash-component-suites/')
+
+@server.after_request
+def compress_response(response):
+    static = request.path.startswith(STATIC_PREFIXES)
+    # Los assets (?m=<mtime>) y los bundles de Dash (versión en el nombre)
+    # cambian de URL si cambian de contenido: se cachean un año
+    if static and response.status_code == 200 and (request.args.get('m') or response.cache_control.max_age):
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.no_cache = None
+    
+    encoding = accepted_encoding(request.headers.get('Accept-Encoding'))
+    if (not COMPRESS_MIN_BYTES or encoding is None or response.status_code != 200
+            or 'Content-Encoding' in response.headers or not is_compressible(response.mimetype)):
+        return response
+    
+    response.direct_passthrough = False  # send_file: leer el fichero para comprimirlo
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    g.raw_bytes = len(body)
+    response.set_data(STATIC.get(body, encoding) if static else compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)  # mismo recurso, distintos bytes
+    return response
+
+@server.route('/compression/status')
+def compression_status():
+    return {'min_bytes': COMPRESS_MIN_BYTES, **STATIC.status()}
+
+# Scatter en WebGL con todos los jugadores: capa de densidad a partir de
+# SCATTER_DENSITY puntos y muestra estratificada solo por encima de SCATTER_MAX_POINTS
+SCATTER_MAX_POINTS = int(os.environ.get('SCATTER_MAX_POINTS', MAX_POINTS))
+SCATTER_DENSITY = int(os.environ.get('SCATTER_DENSITY', DENSITY_THRESHOLD))
+
+def scatter(frame, x, y, color, size, **kwargs):
+    return lod_scatter(frame, x, y, color, size, max_points=SCATTER_MAX_POINTS,
+                       density_threshold=SCATTER_DENSITY, **kwargs)
 
 # ==================== NAVBAR ====================
 navbar = dbc.Navbar(
@@ -117,12 +431,14 @@ navbar = dbc.Navbar(
 
 app.layout = html.Div([
     dcc.Location(id='url', refresh=False),
+    dcc.Interval(id='models-poll', interval=1000, disabled=True),
     navbar,
     dbc.Container([html.Div(id='page-content')], fluid=True)
 ])
 
 # ==================== PÁGINA 1: DASHBOARD ====================
 def create_home():
+    df = DATA['df']
     return html.Div([
         html.H1("⚽ Dashboard General", className="mb-4"),
         
@@ -186,7 +502,7 @@ def create_home():
                         ], width=True)
                     ], align="center")
                 ]),
-                dbc.CardBody([dcc.Graph(id='home-graph1')])
+                dbc.CardBody([dcc.Graph(id='home-graph1'), dcc.Store(id='home-graph1-layout')])
             ], className="shadow-sm")], width=12, lg=6, className="mb-4"),
             
             # Gráfico 2 (Top derecha)
@@ -213,7 +529,7 @@ def create_home():
                         ], width=True)
                     ], align="center")
                 ]),
-                dbc.CardBody([dcc.Graph(id='home-graph2')])
+                dbc.CardBody([dcc.Graph(id='home-graph2'), dcc.Store(id='home-graph2-layout')])
             ], className="shadow-sm")], width=12, lg=6, className="mb-4"),
         ]),
         
@@ -241,7 +557,7 @@ def create_home():
                         ], width=True)
                     ], align="center")
                 ]),
-                dbc.CardBody([dcc.Graph(id='home-graph3')])
+                dbc.CardBody([dcc.Graph(id='home-graph3'), dcc.Store(id='home-graph3-layout')])
             ], className="shadow-sm")], width=12, lg=6, className="mb-4"),
             
             # Gráfico 4 (Bottom derecha)
@@ -267,15 +583,15 @@ def create_home():
                         ], width=True)
                     ], align="center")
                 ]),
-                dbc.CardBody([dcc.Graph(id='home-graph4')])
+                dbc.CardBody([dcc.Graph(id='home-graph4'), dcc.Store(id='home-graph4-layout')])
             ], className="shadow-sm")], width=12, lg=6, className="mb-4"),
         ])
     ])
 
 # ==================== PÁGINA 2: COMPARAR ====================
 def create_comparison():
-    options = [{'label': f"{row['name']} ({row['team']}) - {row['position']}", 'value': idx} 
-               for idx, row in df.iterrows()]
+    # Solo los más conocidos; el resto llega al escribir (search_players_callback)
+    options = player_options(DATA['player_search'], '')
     
     return html.Div([
         html.H1("⚖️ Comparar Jugadores", className="mb-4"),
@@ -294,6 +610,7 @@ def create_comparison():
 
 # ==================== PÁGINA 3: ANÁLISIS POR EQUIPOS ====================
 def create_teams():
+    df = DATA['df']
     return html.Div([
         html.H1("🏟️ Análisis por Equipos", className="mb-4"),
         
@@ -312,6 +629,8 @@ def create_teams():
                         )
                     ], width=12, className="mb-4")
                 ]),
+                dbc.Progress(id='teams-progress', value=0, striped=True, animated=True,
+                             style={'display': 'none'}, className="mb-3"),
                 html.Div(id='teams-content')
             ])
         ], className="mb-4 shadow-sm"),
@@ -340,6 +659,8 @@ def create_teams():
                         )
                     ], width=12, md=6, className="mb-3"),
                 ]),
+                dbc.Progress(id='teams-comparison-progress', value=0, striped=True, animated=True,
+                             style={'display': 'none'}, className="mb-3"),
                 html.Div(id='teams-comparison-content')
             ])
         ], className="shadow-sm")
@@ -348,6 +669,7 @@ def create_teams():
 
 # ==================== PÁGINA 4: ANÁLISIS DE RENDIMIENTO ====================
 def create_performance():
+    df = DATA['df']
     # Opciones de posición categorizadas
     position_options = [
         {'label': '🌍 Todas las Posiciones', 'value': 'all'},
@@ -420,7 +742,7 @@ def create_performance():
                         ], width=True)
                     ], align="center")
                 ]),
-                dbc.CardBody([dcc.Graph(id='perf-graph1')])
+                dbc.CardBody([dcc.Graph(id='perf-graph1'), dcc.Store(id='perf-graph1-layout')])
             ], className="shadow-sm")], width=12, lg=6, className="mb-4"),
             
             # Gráfico 2 (Top derecha)
@@ -439,7 +761,7 @@ def create_performance():
                         ], width=True)
                     ], align="center")
                 ]),
-                dbc.CardBody([dcc.Graph(id='perf-graph2')])
+                dbc.CardBody([dcc.Graph(id='perf-graph2'), dcc.Store(id='perf-graph2-layout')])
             ], className="shadow-sm")], width=12, lg=6, className="mb-4"),
         ]),
         
@@ -460,7 +782,7 @@ def create_performance():
                         ], width=True)
                     ], align="center")
                 ]),
-                dbc.CardBody([dcc.Graph(id='perf-graph3')])
+                dbc.CardBody([dcc.Graph(id='perf-graph3'), dcc.Store(id='perf-graph3-layout')])
             ], className="shadow-sm")], width=12, lg=6, className="mb-4"),
             
             # Gráfico 4 (Bottom derecha)
@@ -479,18 +801,30 @@ def create_performance():
                         ], width=True)
                     ], align="center")
                 ]),
-                dbc.CardBody([dcc.Graph(id='perf-graph4')])
+                dbc.CardBody([dcc.Graph(id='perf-graph4'), dcc.Store(id='perf-graph4-layout')])
             ], className="shadow-sm")], width=12, lg=6, className="mb-4"),
         ])
     ])
 
 # ==================== PÁGINA 6: VALUACIÓN ML ====================
 def create_valuation():
-    if not ML_ENABLED:
+    valuation = MODELS.get('valuation')
+    if valuation is None:
         return dbc.Alert("Modelo de predicción no disponible", color="warning")
     
-    options = [{'label': f"{row['name']} ({row['team']}) - {row['position']}", 'value': idx} 
-               for idx, row in df[df['current_value'] > 0].iterrows()]
+    options = player_options(DATA['valued_search'], '')
+    
+    # Rankings sobre la valoración en lote (sin pasar por el modelo)
+    values = valuation_values(DATA)
+    
+    def ranking_table(undervalued):
+        top = valuation_ranking(DATA['df'], values, n=10, undervalued=undervalued)
+        return dbc.Table.from_dataframe(pd.DataFrame({
+            'Jugador': top['name'], 'Equipo': top['team'],
+            'Valor (€)': top['current_value'].map(lambda v: f"€{v/1e6:.1f}M"),
+            'Predicción (€)': top['predicted_value'].map(lambda v: f"€{v/1e6:.1f}M"),
+            'Diferencia': top['value_gap_pct'].map(lambda v: f"{v:+.0f}%"),
+        }), striped=True, bordered=True, hover=True, size='sm')
     
     return html.Div([
         html.H1("💰 Predicción de Valor", className="mb-2"),
@@ -513,18 +847,80 @@ def create_valuation():
                     dbc.CardBody([
                         html.P([
                             html.Strong("Algoritmo: "), "Random Forest", html.Br(),
-                            html.Strong("Features: "), f"{len(ml_features)}", html.Br(),
+                            html.Strong("Features: "), f"{len(valuation['features'])}", html.Br(),
                             html.Strong("Jugadores entrenamiento: "), "~9,000", html.Br(),
                         ])
                     ])
                 ], className="shadow-sm")
             ], width=12, lg=4, className="mb-4"),
+        ]),
+        
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader(html.H5("📉 Más Infravalorados")),
+                    dbc.CardBody([ranking_table(undervalued=True)])
+                ], className="shadow-sm")
+            ], width=12, lg=6, className="mb-4"),
+            
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader(html.H5("📈 Más Sobrevalorados")),
+                    dbc.CardBody([ranking_table(undervalued=False)])
+                ], className="shadow-sm")
+            ], width=12, lg=6, className="mb-4"),
         ])
     ])
 
 # ==================== PÁGINA 7: CLUSTERING ====================
+# Con CLUSTER_CLIENTSIDE=1 (por defecto) los puntos del PCA viajan una sola
+# vez con la página en un dcc.Store y el filtro por estilo/valor se resuelve
+# en el navegador (assets/clustering.js), sin volver al servidor
+CLUSTER_CLIENTSIDE = os.environ.get('CLUSTER_CLIENTSIDE', '1') != '0'
+
+def typed_array(values, dtype):
+    """Array como {'dtype', 'bdata'}: bytes little-endian en base64."""
+    values = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {'dtype': np.dtype(dtype).name, 'bdata': base64.b64encode(values.tobytes()).decode('ascii')}
+
+def cluster_payload(clustering_model):
+    """Datos del explorador de estilos para el dcc.Store 'cluster-data'."""
+    data = clustering_model['data']
+    labels = clustering_model['labels']
+    teams = pd.Categorical(data['team'])
+    positions = pd.Categorical(data['position'])
+    value = data['current_value'].to_numpy()
+    value_dtype = 'uint32' if value.min() >= 0 and value.max() < 2**32 else 'float64'
+    
+    # Layout que generaría px.scatter (plantilla, ejes, leyenda) sin los puntos
+    base = px.scatter(data.head(1).assign(label=labels[0]), x='pca_x', y='pca_y', color='label')
+    base.update_layout(height=600, showlegend=True)
+    
+    return {
+        'arrays': {
+            'x': typed_array(data['pca_x'], 'float32'),
+            'y': typed_array(data['pca_y'], 'float32'),
+            'cluster': typed_array(data['cluster'], 'int8'),
+            'value': typed_array(value, value_dtype),
+            'goles': typed_array(data['goles_totales'], 'float32'),
+            'asistencias': typed_array(data['asistencias_totales'], 'float32'),
+            'team': typed_array(teams.codes, 'int16'),
+            'position': typed_array(positions.codes, 'int16'),
+        },
+        'name': data['name'].astype(str).tolist(),
+        'teams': teams.categories.astype(str).tolist(),
+        'positions': positions.categories.astype(str).tolist(),
+        'labels': {str(i): labels[i] for i in range(len(labels))},
+        'colorway': list(base.layout.template.layout.colorway),
+        'layout': json.loads(base.to_json())['layout'],
+        'hovertemplate': ("<b>%{hovertext}</b><br><br>team=%{customdata[0]}<br>"
+                          "goles_totales=%{customdata[1]}<br>current_value=%{customdata[2]€:,.0f}"
+                          "<extra></extra>"),
+    }
+
 def create_clustering():
-    if not CLUSTERING_ENABLED:
+    clustering_model = clustering_state(DATA)
+    if clustering_model is None:
         return dbc.Alert("Modelo de clustering no disponible", color="warning")
     
     data = clustering_model['data']
@@ -532,7 +928,7 @@ def create_clustering():
     
     return html.Div([
         html.H1("🎨 Estilos de Juego", className="mb-2"),
-        html.P(f"{len(data)} jugadores agrupados en 6 estilos usando K-Means", className="lead mb-4"),
+        html.P(f"{len(data)} jugadores agrupados en {len(labels)} estilos usando K-Means", className="lead mb-4"),
         
         dbc.Row([
             dbc.Col([dbc.Card([
@@ -547,12 +943,14 @@ def create_clustering():
                         html.Label("Estilo:", className="fw-bold"),
                         dcc.Dropdown(id='cluster-filter',
                             options=[{'label': 'Todos', 'value': 'all'}] + 
-                                   [{'label': labels[i], 'value': i} for i in range(6)],
+                                   [{'label': labels[i], 'value': i} for i in range(len(labels))],
                             value='all', clearable=False, className="mb-3"),
                         html.Label("Valor Máximo (M€):", className="fw-bold"),
                         dcc.Slider(id='cluster-value', min=0, max=100, value=100,
                                   marks={0:'0', 25:'25', 50:'50', 75:'75', 100:'100+'},
-                                  tooltip={"placement": "bottom", "always_visible": True})
+                                  tooltip={"placement": "bottom", "always_visible": True},
+                                  # En el navegador el filtro es instantáneo: seguir el arrastre
+                                  updatemode='drag' if CLUSTER_CLIENTSIDE else 'mouseup')
                     ])
                 ], className="shadow-sm mb-4"),
                 dbc.Card([
@@ -560,7 +958,7 @@ def create_clustering():
                     dbc.CardBody([html.Div([
                         html.Div([html.Strong(labels[i]), html.Br(), 
                                  html.Small(f"{len(data[data['cluster']==i])} jugadores", className="text-muted")],
-                                className="mb-3") for i in range(6)
+                                className="mb-3") for i in range(len(labels))
                     ])])
                 ], className="shadow-sm")
             ], width=12, lg=4)
@@ -569,39 +967,48 @@ def create_clustering():
         dbc.Row([dbc.Col([dbc.Card([
             dbc.CardHeader(html.H5("Top 30 Jugadores por Valor")),
             dbc.CardBody([html.Div(id='cluster-table')])
-        ], className="shadow-sm")], width=12)])
+        ], className="shadow-sm")], width=12)]),
+        
+        dcc.Store(id='cluster-data', data=cluster_payload(clustering_model) if CLUSTER_CLIENTSIDE else None)
     ])
 
 # ==================== PÁGINA 8: GANGAS ====================
+# Las gangas se calculan en vivo sobre todo el dataset (bargains.py) con los
+# pesos de la fórmula elegidos en la página; la tabla de puntuaciones se
+# cachea por vector de pesos y los filtros de posición y presupuesto se
+# aplican encima
+def bargain_scores(data, weights):
+    """Puntuaciones de todos los jugadores con `weights` (None sin modelo)."""
+    anomaly_model = MODELS.get('anomaly')
+    if anomaly_model is None:
+        return None
+    key = ('bargains', MODELS.version('anomaly'), weights)
+    return shared_view(data, key, lambda: score_table(anomaly_model, data['df'], weights))
+
+def bargain_kpi(icon, color, value, label):
+    return dbc.Col([dbc.Card([dbc.CardBody([
+        html.I(className=f"fas {icon} fa-2x mb-2", style={'color': color}),
+        html.H3(value),
+        html.P(label, className="text-muted mb-0")
+    ])], className="text-center shadow-sm")], width=4, className="mb-4")
+
 def create_bargains():
-    if not ANOMALY_ENABLED:
+    anomaly_model = MODELS.get('anomaly')
+    if anomaly_model is None:
         return dbc.Alert("Modelo de gangas no disponible", color="warning")
     
-    gangas = anomaly_model['gangas']
+    goals_w, assists_w, matches_w = weight_vector()
+    groups = DATA['df']['position_group'].to_numpy()
+    position_options = [{'label': 'Todas', 'value': 'all'}] + [
+        {'label': label, 'value': group} for group, label in REC_POSITION_LABELS.items()
+        if (groups & POSITION_BITS[group]).any()
+    ]
     
     return html.Div([
         html.H1("💎 Gangas del Mercado", className="mb-2"),
-        html.P(f"{len(gangas)} jugadores infravalorados detectados", className="lead mb-4"),
+        html.P(id='bargains-lead', className="lead mb-4"),
         
-        dbc.Row([
-            dbc.Col([dbc.Card([dbc.CardBody([
-                html.I(className="fas fa-gem fa-2x mb-2", style={'color': COLORS['accent']}),
-                html.H3(f"{len(gangas)}"),
-                html.P("Gangas Detectadas", className="text-muted mb-0")
-            ])], className="text-center shadow-sm")], width=4, className="mb-4"),
-            
-            dbc.Col([dbc.Card([dbc.CardBody([
-                html.I(className="fas fa-chart-line fa-2x mb-2", style={'color': COLORS['secondary']}),
-                html.H3(f"€{gangas['current_value'].median()/1e6:.1f}M"),
-                html.P("Precio Mediano", className="text-muted mb-0")
-            ])], className="text-center shadow-sm")], width=4, className="mb-4"),
-            
-            dbc.Col([dbc.Card([dbc.CardBody([
-                html.I(className="fas fa-star fa-2x mb-2", style={'color': COLORS['primary']}),
-                html.H3(f"{gangas['ratio'].mean():.0f}x"),
-                html.P("Ratio Promedio", className="text-muted mb-0")
-            ])], className="text-center shadow-sm")], width=4, className="mb-4"),
-        ]),
+        dbc.Row(id='bargains-kpis'),
         
         dbc.Row([
             dbc.Col([dbc.Card([
@@ -609,32 +1016,68 @@ def create_bargains():
                 dbc.CardBody([dcc.Graph(id='bargains-chart', style={'height': '700px'})])
             ], className="shadow-sm")], width=12, lg=8, className="mb-4"),
             
-            dbc.Col([dbc.Card([
-                dbc.CardHeader(html.H5("Cómo Funciona")),
-                dbc.CardBody([
-                    html.P([
-                        html.Strong("Algoritmo: "), "Isolation Forest", html.Br(),
-                        html.Strong("Método: "), "Detecta outliers positivos", html.Br(),
-                        html.Strong("Ratio: "), "Rendimiento / Precio", html.Br(),
-                    ]),
-                    html.Hr(),
-                    html.Small([
-                        html.Strong("Fórmula Rendimiento:"), html.Br(),
-                        "(Goles × 3) + (Asist × 2) + (Partidos × 0.5)"
-                    ], className="text-muted")
-                ])
-            ], className="shadow-sm")], width=12, lg=4, className="mb-4"),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader(html.H5("Filtros")),
+                    dbc.CardBody([
+                        html.Label("Posición:", className="fw-bold"),
+                        dcc.Dropdown(id='bargains-position', options=position_options,
+                                    value='all', clearable=False, className="mb-3"),
+                        html.Label("Presupuesto Máximo (M€):", className="fw-bold"),
+                        dcc.Slider(id='bargains-budget', min=0, max=100, value=100,
+                                  marks={0:'0', 25:'25', 50:'50', 75:'75', 100:'100+'},
+                                  tooltip={"placement": "bottom", "always_visible": True}),
+                        html.Hr(),
+                        html.Label("Peso de los Goles:", className="fw-bold"),
+                        dcc.Slider(id='bargains-w-goals', min=0, max=5, step=0.5, value=goals_w,
+                                  marks={0:'0', 1:'1', 2:'2', 3:'3', 4:'4', 5:'5'},
+                                  tooltip={"placement": "bottom", "always_visible": True}),
+                        html.Label("Peso de las Asistencias:", className="fw-bold"),
+                        dcc.Slider(id='bargains-w-assists', min=0, max=5, step=0.5, value=assists_w,
+                                  marks={0:'0', 1:'1', 2:'2', 3:'3', 4:'4', 5:'5'},
+                                  tooltip={"placement": "bottom", "always_visible": True}),
+                        html.Label("Peso de los Partidos:", className="fw-bold"),
+                        dcc.Slider(id='bargains-w-matches', min=0, max=2, step=0.1, value=matches_w,
+                                  marks={0:'0', 0.5:'0.5', 1:'1', 1.5:'1.5', 2:'2'},
+                                  tooltip={"placement": "bottom", "always_visible": True}),
+                    ])
+                ], className="shadow-sm mb-4"),
+                dbc.Card([
+                    dbc.CardHeader(html.H5("Cómo Funciona")),
+                    dbc.CardBody([
+                        html.P([
+                            html.Strong("Algoritmo: "), "Isolation Forest", html.Br(),
+                            html.Strong("Método: "), "Detecta outliers positivos", html.Br(),
+                            html.Strong("Ratio: "), "Rendimiento / Precio", html.Br(),
+                        ]),
+                        html.Hr(),
+                        html.Small(id='bargains-formula', className="text-muted")
+                    ])
+                ], className="shadow-sm")
+            ], width=12, lg=4, className="mb-4"),
         ])
     ])
 
 # ==================== PÁGINA 9: RECOMENDACIÓN ====================
+REC_POSITION_LABELS = {
+    'Goalkeeper': '🧤 Porteros',
+    'Defender': '🛡️ Defensores',
+    'Midfield': '🎯 Mediocentros',
+    'Attack': '⚽ Delanteros',
+}
+
 def create_recommend():
-    if not RECOMMENDATION_ENABLED:
+    recommendation_model = MODELS.get('recommendation')
+    if recommendation_model is None:
         return dbc.Alert("Modelo de recomendación no disponible", color="warning")
     
     players = recommendation_model['players_data']
-    options = [{'label': f"{row['name']} ({row['team']}) - {row['position']}", 'value': idx} 
-               for idx, row in players.iterrows()]
+    options = player_options(recommendation_model['player_search'], '')
+    groups = recommendation_model['position_groups']
+    position_options = [{'label': '🌍 Todas las Posiciones', 'value': 'all'}] + [
+        {'label': label, 'value': group} for group, label in REC_POSITION_LABELS.items()
+        if (groups & POSITION_BITS[group]).any()
+    ]
     
     return html.Div([
         html.H1("🔍 Recomendador", className="mb-2"),
@@ -645,6 +1088,25 @@ def create_recommend():
             dbc.CardBody([
                 dcc.Dropdown(id='rec-player', options=options, 
                             placeholder="Buscar por nombre o equipo...", className="mb-3"),
+                dbc.Row([
+                    dbc.Col([
+                        html.Label("Posición:", className="fw-bold"),
+                        dcc.Dropdown(id='rec-position', options=position_options,
+                                     value='all', clearable=False)
+                    ], width=12, md=4, className="mb-3"),
+                    dbc.Col([
+                        html.Label("Valor Máximo (M€):", className="fw-bold"),
+                        dcc.Slider(id='rec-max-value', min=0, max=100, value=100,
+                                  marks={0:'0', 25:'25', 50:'50', 75:'75', 100:'100+'},
+                                  tooltip={"placement": "bottom", "always_visible": True})
+                    ], width=12, md=4, className="mb-3"),
+                    dbc.Col([
+                        html.Label("Edad Máxima:", className="fw-bold"),
+                        dcc.Slider(id='rec-max-age', min=16, max=40, step=1, value=40,
+                                  marks={16:'16', 20:'20', 24:'24', 28:'28', 32:'32', 36:'36', 40:'40+'},
+                                  tooltip={"placement": "bottom", "always_visible": True})
+                    ], width=12, md=4, className="mb-3"),
+                ]),
                 dbc.Button("🔍 Buscar Similares", id='rec-btn', 
                           color="primary", size="lg", className="w-100")
             ])
@@ -655,182 +1117,295 @@ def create_recommend():
 
 # ==================== CALLBACKS ====================
 
-@app.callback(Output('page-content', 'children'), Input('url', 'pathname'))
-def display_page(path):
-    if path == '/comparison': return create_comparison()
-    elif path == '/teams': return create_teams()
-    elif path == '/performance': return create_performance()
-    elif path == '/valuation': return create_valuation()
-    elif path == '/clustering': return create_clustering()
-    elif path == '/bargains': return create_bargains()
-    elif path == '/recommend': return create_recommend()
-    else: return create_home()
+# Callbacks pesados (análisis y comparación de equipos) en un proceso aparte:
+# el worker solo lanza el trabajo y responde a los sondeos, así que el resto
+# de páginas no espera. Los trabajos viven en diskcache (compartido entre
+# workers); BACKGROUND_CALLBACKS=0 los ejecuta en el worker como antes.
+BACKGROUND = None
+if diskcache is not None and os.environ.get('BACKGROUND_CALLBACKS', '1') != '0':
+    BACKGROUND = DiskcacheManager(diskcache.Cache(os.environ.get('BACKGROUND_CACHE_DIR', 'data/callbacks')))
+
+def no_progress(progress):
+    pass
+
+def heavy_callback(output, inputs, progress_id):
+    """Registra `func(set_progress, *inputs)` como callback en segundo plano.
+
+    `set_progress((valor, texto))` mueve la barra `progress_id`, visible solo
+    mientras se calcula. Si el usuario cambia otra vez el desplegable, Dash
+    cancela el trabajo anterior; al salir de la página se cancela también.
+    Sin gestor, el callback es normal y el progreso se ignora.
+    """
+    def register(func):
+        if BACKGROUND is None:
+            app.callback(output, inputs)(lambda *args: func(no_progress, *args))
+            return func
+        app.callback(
+            output, inputs,
+            background=True, manager=BACKGROUND, interval=250,
+            progress=[Output(progress_id, 'value'), Output(progress_id, 'label')],
+            progress_default=[0, ''],
+            running=[(Output(progress_id, 'style'), {'display': 'flex'}, {'display': 'none'})],
+            cancel=[Input('url', 'pathname')],
+        )(func)
+        return func
+    return register
+
+# Páginas que dependen de un modelo: mientras carga se muestra un aviso
+# y 'models-poll' vuelve a comprobarlo cada segundo
+MODEL_PAGES = {
+    '/valuation': ('valuation', "predicción de valor"),
+    '/clustering': ('clustering', "estilos de juego"),
+    '/bargains': ('anomaly', "gangas"),
+    '/recommend': ('recommendation', "recomendación"),
+}
+
+def create_warmup(label):
+    return dbc.Alert([
+        html.I(className="fas fa-spinner fa-spin me-2"),
+        f"Cargando el modelo de {label}, un momento..."
+    ], color="info")
+
+PAGE_BUILDERS = {
+    '/': create_home,
+    '/comparison': create_comparison,
+    '/teams': create_teams,
+    '/performance': create_performance,
+    '/valuation': create_valuation,
+    '/clustering': create_clustering,
+    '/bargains': create_bargains,
+    '/recommend': create_recommend,
+}
+
+# Layout de cada página ya construido, con la versión del dataset (y del
+# modelo que use) con la que se hizo: cambiar de página no recalcula nada
+# hasta que una recarga cambia esa versión
+PAGE_CACHE = {}
+
+def cached_page(path):
+    path = path if path in PAGE_BUILDERS else '/'
+    model = MODEL_PAGES[path][0] if path in MODEL_PAGES else None
+    # El clustering cambia también cuando se reajustan sus centroides
+    version = clustering_version() if model == 'clustering' else MODELS.version(model) if model else None
+    key = (DATA['version'], version)
+    cached = PAGE_CACHE.get(path)
+    if cached is None or cached[0] != key:
+        cached = (key, PAGE_BUILDERS[path]())
+        PAGE_CACHE[path] = cached
+    return cached[1]
 
 @app.callback(
-    [Output('home-graph1', 'figure'), Output('home-graph2', 'figure'),
-     Output('home-graph3', 'figure'), Output('home-graph4', 'figure')],
-    [Input('home-matches', 'value'), Input('graph1-type', 'value'),
-     Input('graph2-type', 'value'), Input('graph3-type', 'value'),
-     Input('graph4-type', 'value')]
+    [Output('page-content', 'children'), Output('models-poll', 'disabled')],
+    [Input('url', 'pathname'), Input('models-poll', 'n_intervals')]
 )
-def update_home(min_matches, g1_type, g2_type, g3_type, g4_type):
-    df_f = df[df['appearance'] >= min_matches]
-    
-    def create_graph(graph_type):
-        # Gráficos tipo TOP (barras horizontales)
-        if graph_type == 'top_scorers':
-            top = df_f.nlargest(15, 'goles_totales')
-            fig = px.bar(top, y='name', x='goles_totales', orientation='h',
-                        color='goles_totales', color_continuous_scale='Reds',
-                        labels={'goles_totales': 'Goles', 'name': 'Jugador'},
-                        hover_data=['team', 'appearance'])
-            fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
-            
-        elif graph_type == 'top_assisters':
-            top = df_f.nlargest(15, 'asistencias_totales')
-            fig = px.bar(top, y='name', x='asistencias_totales', orientation='h',
-                        color='asistencias_totales', color_continuous_scale='Blues',
-                        labels={'asistencias_totales': 'Asistencias', 'name': 'Jugador'},
-                        hover_data=['team', 'appearance'])
-            fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
-            
-        elif graph_type == 'top_contribution':
-            top = df_f.nlargest(15, 'contribucion_total')
-            fig = px.bar(top, y='name', x='contribucion_total', orientation='h',
-                        color='contribucion_total', color_continuous_scale='Greens',
-                        labels={'contribucion_total': 'Goles + Asistencias', 'name': 'Jugador'},
-                        hover_data=['team', 'goles_totales', 'asistencias_totales'])
-            fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
-            
-        elif graph_type == 'top_minutes':
-            top = df_f.nlargest(15, 'minutes played')
-            fig = px.bar(top, y='name', x='minutes played', orientation='h',
-                        color='minutes played', color_continuous_scale='Purples',
-                        labels={'minutes played': 'Minutos', 'name': 'Jugador'},
-                        hover_data=['team', 'appearance'])
-            fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
-            
-        elif graph_type == 'goals_per_game':
-            top = df_f.nlargest(15, 'goles_por_partido')
-            fig = px.bar(top, y='name', x='goles_por_partido', orientation='h',
-                        color='goles_por_partido', color_continuous_scale='Oranges',
-                        labels={'goles_por_partido': 'Goles/Partido', 'name': 'Jugador'},
-                        hover_data=['team', 'goles_totales', 'appearance'])
-            fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
-            
-        elif graph_type == 'top_value':
-            top = df_f[df_f['current_value'] > 0].nlargest(15, 'current_value')
-            fig = px.bar(top, y='name', x='current_value', orientation='h',
-                        color='current_value', color_continuous_scale='YlOrRd',
-                        labels={'current_value': 'Valor (€)', 'name': 'Jugador'},
-                        hover_data=['team', 'position'])
-            fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
-            fig.update_xaxes(tickformat='.0s')
-            
-        elif graph_type == 'top_appearances':
-            top = df_f.nlargest(15, 'appearance')
-            fig = px.bar(top, y='name', x='appearance', orientation='h',
-                        color='appearance', color_continuous_scale='Teal',
-                        labels={'appearance': 'Partidos', 'name': 'Jugador'},
-                        hover_data=['team', 'minutes played'])
-            fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+def display_page(path, n_intervals=None):
+    polling = dash.callback_context.triggered_id == 'models-poll'
+    if path in MODEL_PAGES:
+        name, label = MODEL_PAGES[path]
+        if MODELS.is_loading(name):
+            MODELS.get(name, wait=False)  # Lanza la carga si aún no empezó
+            return (dash.no_update if polling else create_warmup(label)), False
+    elif polling:
+        return dash.no_update, True
+    
+    return cached_page(path), True
+
+def home_view(data, min_matches):
+    """Jugadores con al menos `min_matches` partidos (compartida por las 4 gráficas)."""
+    df = data['df']
+    return shared_view(data, ('home', min_matches), lambda: df[df['appearance'] >= min_matches])
+
+def create_home_graph(data, min_matches, graph_type):
+    df = data['df']
+    df_f = home_view(data, min_matches)
+    
+    def top15(metric):
+        return df.iloc[topk_rows(data['topk'], metric, min_matches)]
+    
+    # Gráficos tipo TOP (barras horizontales)
+    if graph_type == 'top_scorers':
+        top = top15('goles_totales')
+        fig = px.bar(top, y='name', x='goles_totales', orientation='h',
+                    color='goles_totales', color_continuous_scale='Reds',
+                    labels={'goles_totales': 'Goles', 'name': 'Jugador'},
+                    hover_data=['team', 'appearance'])
+        fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
         
-        # Gráficos de DISTRIBUCIÓN
-        elif graph_type == 'positions':
-            pos_counts = df_f['position'].value_counts().head(10)
-            fig = px.pie(values=pos_counts.values, names=pos_counts.index, hole=0.3)
-            fig.update_traces(textposition='inside', textinfo='percent+label')
-            
-        elif graph_type == 'teams':
-            team_counts = df_f['team'].value_counts().head(15)
-            fig = px.bar(x=team_counts.values, y=team_counts.index, orientation='h',
-                        labels={'x': 'Jugadores', 'y': 'Equipo'})
-            fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
-            
-        elif graph_type == 'ages':
-            fig = px.histogram(df_f, x='age', nbins=20, 
-                             labels={'age': 'Edad', 'count': 'Jugadores'},
-                             color_discrete_sequence=['steelblue'])
-            
-        elif graph_type == 'values':
-            df_val = df_f[df_f['current_value'] > 0]
-            fig = px.histogram(df_val, x='current_value', nbins=30,
-                             labels={'current_value': 'Valor (€)', 'count': 'Jugadores'},
-                             color_discrete_sequence=['orange'])
-            fig.update_xaxes(tickformat='.0s')
-            
-        elif graph_type == 'goals_position':
-            pos_goals = df_f.groupby('position')['goles_totales'].sum().nlargest(10)
-            fig = px.bar(x=pos_goals.values, y=pos_goals.index, orientation='h',
-                        labels={'x': 'Goles Totales', 'y': 'Posición'},
-                        color=pos_goals.values, color_continuous_scale='Reds')
-            fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
-            
-        elif graph_type == 'assists_position':
-            pos_assists = df_f.groupby('position')['asistencias_totales'].sum().nlargest(10)
-            fig = px.bar(x=pos_assists.values, y=pos_assists.index, orientation='h',
-                        labels={'x': 'Asistencias Totales', 'y': 'Posición'},
-                        color=pos_assists.values, color_continuous_scale='Blues')
-            fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+    elif graph_type == 'top_assisters':
+        top = top15('asistencias_totales')
+        fig = px.bar(top, y='name', x='asistencias_totales', orientation='h',
+                    color='asistencias_totales', color_continuous_scale='Blues',
+                    labels={'asistencias_totales': 'Asistencias', 'name': 'Jugador'},
+                    hover_data=['team', 'appearance'])
+        fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
         
-        # Gráficos de SCATTER (comparaciones)
-        elif graph_type == 'goals_assists':
-            sample = df_f.sample(min(500, len(df_f)))
-            fig = px.scatter(sample, x='goles_totales', y='asistencias_totales',
-                           hover_name='name', hover_data=['team', 'position'],
-                           color='position', size='appearance',
-                           labels={'goles_totales': 'Goles', 'asistencias_totales': 'Asistencias'})
-            
-        elif graph_type == 'age_value':
-            sample = df_f[df_f['current_value'] > 0].sample(min(500, len(df_f[df_f['current_value'] > 0])))
-            fig = px.scatter(sample, x='age', y='current_value',
-                           hover_name='name', hover_data=['team', 'position'],
-                           color='position', size='contribucion_total',
-                           labels={'age': 'Edad', 'current_value': 'Valor (€)'})
-            fig.update_yaxes(tickformat='.0s')
-            
-        elif graph_type == 'games_minutes':
-            sample = df_f.sample(min(500, len(df_f)))
-            fig = px.scatter(sample, x='appearance', y='minutes played',
-                           hover_name='name', hover_data=['team', 'position'],
-                           color='position', size='contribucion_total',
-                           labels={'appearance': 'Partidos', 'minutes played': 'Minutos'})
-            
-        elif graph_type == 'goals_minutes':
-            sample = df_f[df_f['goles_totales'] > 0].sample(min(500, len(df_f[df_f['goles_totales'] > 0])))
-            fig = px.scatter(sample, x='minutes played', y='goles_totales',
-                           hover_name='name', hover_data=['team', 'position'],
-                           color='position', size='appearance',
-                           labels={'minutes played': 'Minutos', 'goles_totales': 'Goles'})
-            
-        elif graph_type == 'assists_minutes':
-            sample = df_f[df_f['asistencias_totales'] > 0].sample(min(500, len(df_f[df_f['asistencias_totales'] > 0])))
-            fig = px.scatter(sample, x='minutes played', y='asistencias_totales',
-                           hover_name='name', hover_data=['team', 'position'],
-                           color='position', size='appearance',
-                           labels={'minutes played': 'Minutos', 'asistencias_totales': 'Asistencias'})
-            
-        elif graph_type == 'value_contribution':
-            sample = df_f[df_f['current_value'] > 0].sample(min(500, len(df_f[df_f['current_value'] > 0])))
-            fig = px.scatter(sample, x='contribucion_total', y='current_value',
-                           hover_name='name', hover_data=['team', 'position'],
-                           color='position', size='appearance',
-                           labels={'contribucion_total': 'Goles + Asistencias', 'current_value': 'Valor (€)'})
-            fig.update_yaxes(tickformat='.0s')
+    elif graph_type == 'top_contribution':
+        top = top15('contribucion_total')
+        fig = px.bar(top, y='name', x='contribucion_total', orientation='h',
+                    color='contribucion_total', color_continuous_scale='Greens',
+                    labels={'contribucion_total': 'Goles + Asistencias', 'name': 'Jugador'},
+                    hover_data=['team', 'goles_totales', 'asistencias_totales'])
+        fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
         
-        else:
-            fig = px.scatter(title="Selecciona un tipo de gráfico")
+    elif graph_type == 'top_minutes':
+        top = top15('minutes played')
+        fig = px.bar(top, y='name', x='minutes played', orientation='h',
+                    color='minutes played', color_continuous_scale='Purples',
+                    labels={'minutes played': 'Minutos', 'name': 'Jugador'},
+                    hover_data=['team', 'appearance'])
+        fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
         
-        fig.update_layout(template='plotly_white', margin=dict(l=20, r=20, t=40, b=20))
-        return fig
+    elif graph_type == 'goals_per_game':
+        top = top15('goles_por_partido')
+        fig = px.bar(top, y='name', x='goles_por_partido', orientation='h',
+                    color='goles_por_partido', color_continuous_scale='Oranges',
+                    labels={'goles_por_partido': 'Goles/Partido', 'name': 'Jugador'},
+                    hover_data=['team', 'goles_totales', 'appearance'])
+        fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+        
+    elif graph_type == 'top_value':
+        top = top15('current_value')
+        fig = px.bar(top, y='name', x='current_value', orientation='h',
+                    color='current_value', color_continuous_scale='YlOrRd',
+                    labels={'current_value': 'Valor (€)', 'name': 'Jugador'},
+                    hover_data=['team', 'position'])
+        fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+        fig.update_xaxes(tickformat='.0s')
+        
+    elif graph_type == 'top_appearances':
+        top = top15('appearance')
+        fig = px.bar(top, y='name', x='appearance', orientation='h',
+                    color='appearance', color_continuous_scale='Teal',
+                    labels={'appearance': 'Partidos', 'name': 'Jugador'},
+                    hover_data=['team', 'minutes played'])
+        fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+    
+    # Gráficos de DISTRIBUCIÓN
+    elif graph_type == 'positions':
+        pos_counts = df_f['position'].value_counts().loc[lambda s: s > 0].head(10)
+        fig = px.pie(values=pos_counts.values, names=pos_counts.index, hole=0.3)
+        fig.update_traces(textposition='inside', textinfo='percent+label')
+        
+    elif graph_type == 'teams':
+        team_counts = df_f['team'].value_counts().loc[lambda s: s > 0].head(15)
+        fig = px.bar(x=team_counts.values, y=team_counts.index, orientation='h',
+                    labels={'x': 'Jugadores', 'y': 'Equipo'})
+        fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+        
+    elif graph_type == 'ages':
+        fig = px.histogram(df_f, x='age', nbins=20, 
+                         labels={'age': 'Edad', 'count': 'Jugadores'},
+                         color_discrete_sequence=['steelblue'])
+        
+    elif graph_type == 'values':
+        df_val = df_f[df_f['current_value'] > 0]
+        fig = px.histogram(df_val, x='current_value', nbins=30,
+                         labels={'current_value': 'Valor (€)', 'count': 'Jugadores'},
+                         color_discrete_sequence=['orange'])
+        fig.update_xaxes(tickformat='.0s')
+        
+    elif graph_type == 'goals_position':
+        pos_goals = df_f.groupby('position', observed=True)['goles_totales'].sum().nlargest(10)
+        fig = px.bar(x=pos_goals.values, y=pos_goals.index, orientation='h',
+                    labels={'x': 'Goles Totales', 'y': 'Posición'},
+                    color=pos_goals.values, color_continuous_scale='Reds')
+        fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+        
+    elif graph_type == 'assists_position':
+        pos_assists = df_f.groupby('position', observed=True)['asistencias_totales'].sum().nlargest(10)
+        fig = px.bar(x=pos_assists.values, y=pos_assists.index, orientation='h',
+                    labels={'x': 'Asistencias Totales', 'y': 'Posición'},
+                    color=pos_assists.values, color_continuous_scale='Blues')
+        fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+    
+    # Gráficos de SCATTER (comparaciones)
+    elif graph_type == 'goals_assists':
+        fig = scatter(df_f, x='goles_totales', y='asistencias_totales',
+                       hover_name='name', hover_data=['team', 'position'],
+                       color='position', size='appearance',
+                       labels={'goles_totales': 'Goles', 'asistencias_totales': 'Asistencias'})
+        
+    elif graph_type == 'age_value':
+        fig = scatter(df_f[df_f['current_value'] > 0], x='age', y='current_value',
+                       hover_name='name', hover_data=['team', 'position'],
+                       color='position', size='contribucion_total',
+                       labels={'age': 'Edad', 'current_value': 'Valor (€)'})
+        fig.update_yaxes(tickformat='.0s')
+        
+    elif graph_type == 'games_minutes':
+        fig = scatter(df_f, x='appearance', y='minutes played',
+                       hover_name='name', hover_data=['team', 'position'],
+                       color='position', size='contribucion_total',
+                       labels={'appearance': 'Partidos', 'minutes played': 'Minutos'})
+        
+    elif graph_type == 'goals_minutes':
+        fig = scatter(df_f[df_f['goles_totales'] > 0], x='minutes played', y='goles_totales',
+                       hover_name='name', hover_data=['team', 'position'],
+                       color='position', size='appearance',
+                       labels={'minutes played': 'Minutos', 'goles_totales': 'Goles'})
+        
+    elif graph_type == 'assists_minutes':
+        fig = scatter(df_f[df_f['asistencias_totales'] > 0], x='minutes played', y='asistencias_totales',
+                       hover_name='name', hover_data=['team', 'position'],
+                       color='position', size='appearance',
+                       labels={'minutes played': 'Minutos', 'asistencias_totales': 'Asistencias'})
+        
+    elif graph_type == 'value_contribution':
+        fig = scatter(df_f[df_f['current_value'] > 0], x='contribucion_total', y='current_value',
+                       hover_name='name', hover_data=['team', 'position'],
+                       color='position', size='appearance',
+                       labels={'contribucion_total': 'Goles + Asistencias', 'current_value': 'Valor (€)'})
+        fig.update_yaxes(tickformat='.0s')
+    
+    else:
+        fig = px.scatter(title="Selecciona un tipo de gráfico")
     
-    return create_graph(g1_type), create_graph(g2_type), create_graph(g3_type), create_graph(g4_type)
+    fig.update_layout(template='plotly_white', margin=dict(l=20, r=20, t=40, b=20))
+    return fig
+
+def update_home_graph(min_matches, graph_type, shown_layout):
+    data = DATA  # una sola lectura: versión coherente aunque haya recarga
+    # La figura solo depende del tipo y del mínimo de partidos, no del hueco
+    fig = FIGURES.get_or_build(('home', min_matches, graph_type), data['version'],
+                               lambda: create_home_graph(data, min_matches, graph_type))
+    return figure_update(fig, shown_layout)
+
+# Un callback por gráfica: cambiar el tipo de una no recalcula las otras tres
+for i in range(1, 5):
+    app.callback(
+        [Output(f'home-graph{i}', 'figure'), Output(f'home-graph{i}-layout', 'data')],
+        [Input('home-matches', 'value'), Input(f'graph{i}-type', 'value')],
+        State(f'home-graph{i}-layout', 'data')
+    )(update_home_graph)
+
+# Desplegables de jugadores: el layout solo trae los más conocidos y el
+# resto se busca en el servidor con lo que se va escribiendo
+def search_all_players(search_value, value):
+    return player_options(DATA['player_search'], search_value, value)
+
+for dropdown in ['compare-p1', 'compare-p2']:
+    app.callback(Output(dropdown, 'options'), Input(dropdown, 'search_value'),
+                 State(dropdown, 'value'), prevent_initial_call=True)(search_all_players)
+
+@app.callback(Output('val-player', 'options'), Input('val-player', 'search_value'),
+              State('val-player', 'value'), prevent_initial_call=True)
+def search_valued_players(search_value, value):
+    return player_options(DATA['valued_search'], search_value, value)
+
+@app.callback(Output('rec-player', 'options'), Input('rec-player', 'search_value'),
+              State('rec-player', 'value'), prevent_initial_call=True)
+def search_similar_players(search_value, value):
+    recommendation_model = MODELS.get('recommendation')
+    if recommendation_model is None:
+        return []
+    return player_options(recommendation_model['player_search'], search_value, value)
 
 @app.callback(
     Output('compare-content', 'children'),
     [Input('compare-p1', 'value'), Input('compare-p2', 'value')]
 )
 def update_comparison(p1_idx, p2_idx):
+    df = DATA['df']
     if p1_idx is None or p2_idx is None:
         return dbc.Alert("Selecciona dos jugadores", color="info")
     
@@ -940,73 +1515,78 @@ def update_comparison(p1_idx, p2_idx):
     fig = px.bar(comp_data, x='Métrica', y=[p1['name'], p2['name']], barmode='group',
                 color_discrete_sequence=['#3498db', '#e74c3c'])
     fig.update_layout(template='plotly_white', margin=dict(l=20, r=20, t=40, b=20))
-    chart = dbc.Card([dbc.CardBody([dcc.Graph(figure=fig)])], className="shadow-sm")
+    chart = dbc.Card([dbc.CardBody([dcc.Graph(figure=slim_figure(fig))])], className="shadow-sm")
     
     return html.Div([cards, chart])
 
-@app.callback(
-    Output('teams-content', 'children'),
-    Input('teams-dropdown', 'value')
-)
-def update_teams(team):
-    team_df = df[df['team'] == team]
+@heavy_callback(Output('teams-content', 'children'), Input('teams-dropdown', 'value'), 'teams-progress')
+def update_teams(set_progress, team):
+    data = DATA
+    df, team_rows, team_stats = data['df'], data['team_rows'], data['team_stats']
+    if team not in team_rows:
+        return dbc.Alert("Equipo no encontrado", color="warning")
+    
+    team_df = df.iloc[team_rows[team]]
+    ts = team_stats.loc[team]
     
     # Stats Cards (8 métricas)
     stats = dbc.Row([
         dbc.Col([dbc.Card([dbc.CardBody([
             html.I(className="fas fa-users fa-2x mb-2", style={'color': COLORS['primary']}),
             html.H5("Jugadores"),
-            html.H3(f"{len(team_df)}")
+            html.H3(f"{ts['jugadores']}")
         ])], className="text-center shadow-sm")], width=6, md=3, className="mb-4"),
         
         dbc.Col([dbc.Card([dbc.CardBody([
             html.I(className="fas fa-futbol fa-2x mb-2", style={'color': COLORS['accent']}),
             html.H5("Goles"),
-            html.H3(f"{int(team_df['goles_totales'].sum())}")
+            html.H3(f"{int(ts['goles'])}")
         ])], className="text-center shadow-sm")], width=6, md=3, className="mb-4"),
         
         dbc.Col([dbc.Card([dbc.CardBody([
             html.I(className="fas fa-hands-helping fa-2x mb-2", style={'color': COLORS['secondary']}),
             html.H5("Asistencias"),
-            html.H3(f"{int(team_df['asistencias_totales'].sum())}")
+            html.H3(f"{int(ts['asistencias'])}")
         ])], className="text-center shadow-sm")], width=6, md=3, className="mb-4"),
         
         dbc.Col([dbc.Card([dbc.CardBody([
             html.I(className="fas fa-euro-sign fa-2x mb-2", style={'color': COLORS['danger']}),
             html.H5("Valor Total"),
-            html.H3(f"€{team_df['current_value'].sum()/1e6:.1f}M")
+            html.H3(f"€{ts['valor']/1e6:.1f}M")
         ])], className="text-center shadow-sm")], width=6, md=3, className="mb-4"),
         
         dbc.Col([dbc.Card([dbc.CardBody([
             html.I(className="fas fa-birthday-cake fa-2x mb-2", style={'color': '#9b59b6'}),
             html.H5("Edad Promedio"),
-            html.H3(f"{team_df['age'].mean():.1f}")
+            html.H3(f"{ts['edad_media']:.1f}")
         ])], className="text-center shadow-sm")], width=6, md=3, className="mb-4"),
         
         dbc.Col([dbc.Card([dbc.CardBody([
             html.I(className="fas fa-trophy fa-2x mb-2", style={'color': '#f39c12'}),
             html.H5("Partidos Totales"),
-            html.H3(f"{int(team_df['appearance'].sum())}")
+            html.H3(f"{int(ts['partidos'])}")
         ])], className="text-center shadow-sm")], width=6, md=3, className="mb-4"),
         
         dbc.Col([dbc.Card([dbc.CardBody([
             html.I(className="fas fa-exclamation-triangle fa-2x mb-2", style={'color': '#e74c3c'}),
             html.H5("Tarjetas"),
-            html.H3(f"{int(team_df['yellow cards'].sum())}🟨 {int(team_df['red cards'].sum())}🟥")
+            html.H3(f"{int(ts['amarillas'])}🟨 {int(ts['rojas'])}🟥")
         ])], className="text-center shadow-sm")], width=6, md=3, className="mb-4"),
         
         dbc.Col([dbc.Card([dbc.CardBody([
             html.I(className="fas fa-star fa-2x mb-2", style={'color': '#e67e22'}),
             html.H5("Contribución"),
-            html.H3(f"{int(team_df['contribucion_total'].sum())}")
+            html.H3(f"{int(ts['contribucion'])}")
         ])], className="text-center shadow-sm")], width=6, md=3, className="mb-4"),
     ])
     
+    set_progress((25, "Mejores por posición"))
+    
     # Mejores Jugadores por POSICIÓN REAL
-    def get_best_by_position(position_filter, metric, metric_name):
-        filtered = team_df[team_df['position'].str.contains(position_filter, case=False, na=False)]
-        if len(filtered) > 0:
-            best = filtered.nlargest(1, metric).iloc[0]
+    def get_best_by_position(group, metric_name):
+        metric = BEST_BY_GROUP[group]
+        if ts[f'best_{group}'] >= 0:
+            best = df.iloc[ts[f'best_{group}']]
             return html.P([
                 html.Strong(best['name']), html.Br(),
                 f"{int(best[metric]) if metric in ['goles_totales', 'asistencias_totales', 'appearance'] else best[metric]:.1f} {metric_name}",
@@ -1016,9 +1596,8 @@ def update_teams(team):
         return html.P("N/A")
     
     # Mejor portero
-    gk_df = team_df[team_df['position'] == 'Goalkeeper']
-    if len(gk_df) > 0:
-        best_gk = gk_df.nlargest(1, 'clean sheets').iloc[0] if gk_df['clean sheets'].sum() > 0 else gk_df.nlargest(1, 'appearance').iloc[0]
+    if ts['best_Goalkeeper'] >= 0:
+        best_gk = df.iloc[ts['best_Goalkeeper']]
         gk_card = html.P([
             html.Strong(best_gk['name']), html.Br(),
             f"{int(best_gk['clean sheets'])} porterías a cero" if best_gk['clean sheets'] > 0 else f"{int(best_gk['appearance'])} partidos",
@@ -1040,24 +1619,32 @@ def update_teams(team):
             # Mejor Defensor
             dbc.Col([dbc.Card([
                 dbc.CardHeader(html.H6("🛡️ Mejor Defensor", className="mb-0")),
-                dbc.CardBody([get_best_by_position('Defender', 'appearance', 'partidos')])
+                dbc.CardBody([get_best_by_position('Defender', 'partidos')])
             ], className="shadow-sm")], width=6, md=3, className="mb-3"),
             
             # Mejor Mediocentro
             dbc.Col([dbc.Card([
                 dbc.CardHeader(html.H6("🎯 Mejor Medio", className="mb-0")),
-                dbc.CardBody([get_best_by_position('Midfield|midfield', 'contribucion_total', 'G+A')])
+                dbc.CardBody([get_best_by_position('Midfield', 'G+A')])
             ], className="shadow-sm")], width=6, md=3, className="mb-3"),
             
             # Mejor Delantero
             dbc.Col([dbc.Card([
                 dbc.CardHeader(html.H6("⚽ Mejor Delantero", className="mb-0")),
-                dbc.CardBody([get_best_by_position('Attack|Forward|Striker', 'goles_totales', 'goles')])
+                dbc.CardBody([get_best_by_position('Attack', 'goles')])
             ], className="shadow-sm")], width=6, md=3, className="mb-3"),
         ])
     ])
     
-    # Mejores jugadores por categoría general
+    set_progress((50, "Mejores por categoría"))
+    
+    # Mejores jugadores por categoría general (filas precalculadas)
+    top_scorer = df.iloc[ts['top_goles_totales']]
+    top_assister = df.iloc[ts['top_asistencias_totales']]
+    top_valued = df.iloc[ts['top_current_value']]
+    top_veteran = df.iloc[ts['top_appearance']]
+    has_value = ts['con_valor'] > 0
+    
     best_players_section = html.Div([
         html.H4("🏆 Destacados del Equipo", className="mt-4 mb-3"),
         dbc.Row([
@@ -1066,10 +1653,10 @@ def update_teams(team):
                 dbc.CardHeader(html.H6("🔴 Máximo Goleador", className="mb-0")),
                 dbc.CardBody([
                     html.P([
-                        html.Strong(team_df.nlargest(1, 'goles_totales')['name'].iloc[0] if len(team_df) > 0 else "N/A"), html.Br(),
-                        f"{int(team_df.nlargest(1, 'goles_totales')['goles_totales'].iloc[0]) if len(team_df) > 0 else 0} goles",
+                        html.Strong(top_scorer['name']), html.Br(),
+                        f"{int(top_scorer['goles_totales'])} goles",
                         html.Br(),
-                        html.Small(team_df.nlargest(1, 'goles_totales')['position'].iloc[0] if len(team_df) > 0 else "", className="text-muted")
+                        html.Small(top_scorer['position'], className="text-muted")
                     ])
                 ])
             ], className="shadow-sm")], width=6, md=3, className="mb-3"),
@@ -1079,10 +1666,10 @@ def update_teams(team):
                 dbc.CardHeader(html.H6("🔵 Máximo Asistente", className="mb-0")),
                 dbc.CardBody([
                     html.P([
-                        html.Strong(team_df.nlargest(1, 'asistencias_totales')['name'].iloc[0] if len(team_df) > 0 else "N/A"), html.Br(),
-                        f"{int(team_df.nlargest(1, 'asistencias_totales')['asistencias_totales'].iloc[0]) if len(team_df) > 0 else 0} asistencias",
+                        html.Strong(top_assister['name']), html.Br(),
+                        f"{int(top_assister['asistencias_totales'])} asistencias",
                         html.Br(),
-                        html.Small(team_df.nlargest(1, 'asistencias_totales')['position'].iloc[0] if len(team_df) > 0 else "", className="text-muted")
+                        html.Small(top_assister['position'], className="text-muted")
                     ])
                 ])
             ], className="shadow-sm")], width=6, md=3, className="mb-3"),
@@ -1092,10 +1679,10 @@ def update_teams(team):
                 dbc.CardHeader(html.H6("💰 Más Valioso", className="mb-0")),
                 dbc.CardBody([
                     html.P([
-                        html.Strong(team_df.nlargest(1, 'current_value')['name'].iloc[0] if len(team_df[team_df['current_value'] > 0]) > 0 else "N/A"), html.Br(),
-                        f"€{team_df.nlargest(1, 'current_value')['current_value'].iloc[0]/1e6:.1f}M" if len(team_df[team_df['current_value'] > 0]) > 0 else "€0",
+                        html.Strong(top_valued['name'] if has_value else "N/A"), html.Br(),
+                        f"€{top_valued['current_value']/1e6:.1f}M" if has_value else "€0",
                         html.Br(),
-                        html.Small(team_df.nlargest(1, 'current_value')['position'].iloc[0] if len(team_df[team_df['current_value'] > 0]) > 0 else "", className="text-muted")
+                        html.Small(top_valued['position'] if has_value else "", className="text-muted")
                     ])
                 ])
             ], className="shadow-sm")], width=6, md=3, className="mb-3"),
@@ -1105,16 +1692,18 @@ def update_teams(team):
                 dbc.CardHeader(html.H6("🏆 Más Experimentado", className="mb-0")),
                 dbc.CardBody([
                     html.P([
-                        html.Strong(team_df.nlargest(1, 'appearance')['name'].iloc[0] if len(team_df) > 0 else "N/A"), html.Br(),
-                        f"{int(team_df.nlargest(1, 'appearance')['appearance'].iloc[0]) if len(team_df) > 0 else 0} partidos",
+                        html.Strong(top_veteran['name']), html.Br(),
+                        f"{int(top_veteran['appearance'])} partidos",
                         html.Br(),
-                        html.Small(team_df.nlargest(1, 'appearance')['position'].iloc[0] if len(team_df) > 0 else "", className="text-muted")
+                        html.Small(top_veteran['position'], className="text-muted")
                     ])
                 ])
             ], className="shadow-sm")], width=6, md=3, className="mb-3"),
         ])
     ])
     
+    set_progress((75, "Gráficos"))
+    
     # Gráficos
     top_scorers = team_df.nlargest(10, 'goles_totales')
     fig1 = px.bar(top_scorers, x='name', y='goles_totales', color='goles_totales',
@@ -1126,7 +1715,7 @@ def update_teams(team):
                   color_continuous_scale='Blues', title="Top 10 Asistentes")
     fig2.update_layout(showlegend=False, template='plotly_white', xaxis_tickangle=-45)
     
-    pos_dist = team_df['position'].value_counts()
+    pos_dist = team_df['position'].value_counts().loc[lambda s: s > 0]
     fig3 = px.pie(values=pos_dist.values, names=pos_dist.index, title="Distribución por Posición", hole=0.4)
     fig3.update_traces(textposition='inside', textinfo='percent+label')
     fig3.update_layout(template='plotly_white')
@@ -1140,28 +1729,32 @@ def update_teams(team):
     fig4.update_yaxes(tickformat='.0s')
     
     charts = dbc.Row([
-        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=fig1)])], className="shadow-sm")], 
+        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=slim_figure(fig1))])], className="shadow-sm")], 
                 width=12, lg=6, className="mb-4"),
-        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=fig2)])], className="shadow-sm")],
+        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=slim_figure(fig2))])], className="shadow-sm")],
                 width=12, lg=6, className="mb-4"),
-        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=fig3)])], className="shadow-sm")], 
+        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=slim_figure(fig3))])], className="shadow-sm")], 
                 width=12, lg=6, className="mb-4"),
-        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=fig4)])], className="shadow-sm")],
+        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=slim_figure(fig4))])], className="shadow-sm")],
                 width=12, lg=6, className="mb-4"),
     ])
     
     return html.Div([stats, best_players_by_position, best_players_section, charts])
 
-@app.callback(
-    Output('teams-comparison-content', 'children'),
-    [Input('team-compare-1', 'value'), Input('team-compare-2', 'value')]
-)
-def update_teams_comparison(team1, team2):
+@heavy_callback(Output('teams-comparison-content', 'children'),
+                [Input('team-compare-1', 'value'), Input('team-compare-2', 'value')],
+                'teams-comparison-progress')
+def update_teams_comparison(set_progress, team1, team2):
+    data = DATA
+    df, team_rows, team_stats = data['df'], data['team_rows'], data['team_stats']
     if team1 is None or team2 is None or team1 == team2:
         return dbc.Alert("Selecciona dos equipos diferentes para comparar", color="info")
     
-    t1_df = df[df['team'] == team1]
-    t2_df = df[df['team'] == team2]
+    if team1 not in team_rows or team2 not in team_rows:
+        return dbc.Alert("Equipo no encontrado", color="warning")
+    
+    t1_df, t2_df = df.iloc[team_rows[team1]], df.iloc[team_rows[team2]]
+    t1, t2 = team_stats.loc[team1], team_stats.loc[team2]
     
     # Comparación de stats principales
     comp_stats = dbc.Row([
@@ -1171,14 +1764,14 @@ def update_teams_comparison(team1, team2):
                 dbc.CardHeader(html.H5(team1, className="text-center")),
                 dbc.CardBody([
                     dbc.Row([
-                        dbc.Col([html.P([html.Strong("Jugadores:"), html.Br(), f"{len(t1_df)}"])], width=6),
-                        dbc.Col([html.P([html.Strong("Goles:"), html.Br(), f"{int(t1_df['goles_totales'].sum())}"])], width=6),
-                        dbc.Col([html.P([html.Strong("Asistencias:"), html.Br(), f"{int(t1_df['asistencias_totales'].sum())}"])], width=6),
-                        dbc.Col([html.P([html.Strong("Contribución:"), html.Br(), f"{int(t1_df['contribucion_total'].sum())}"])], width=6),
-                        dbc.Col([html.P([html.Strong("Valor:"), html.Br(), f"€{t1_df['current_value'].sum()/1e6:.1f}M"])], width=6),
-                        dbc.Col([html.P([html.Strong("Edad Media:"), html.Br(), f"{t1_df['age'].mean():.1f}"])], width=6),
-                        dbc.Col([html.P([html.Strong("Tarjetas:"), html.Br(), f"{int(t1_df['yellow cards'].sum())}🟨 {int(t1_df['red cards'].sum())}🟥"])], width=6),
-                        dbc.Col([html.P([html.Strong("Partidos:"), html.Br(), f"{int(t1_df['appearance'].sum())}"])], width=6),
+                        dbc.Col([html.P([html.Strong("Jugadores:"), html.Br(), f"{t1['jugadores']}"])], width=6),
+                        dbc.Col([html.P([html.Strong("Goles:"), html.Br(), f"{int(t1['goles'])}"])], width=6),
+                        dbc.Col([html.P([html.Strong("Asistencias:"), html.Br(), f"{int(t1['asistencias'])}"])], width=6),
+                        dbc.Col([html.P([html.Strong("Contribución:"), html.Br(), f"{int(t1['contribucion'])}"])], width=6),
+                        dbc.Col([html.P([html.Strong("Valor:"), html.Br(), f"€{t1['valor']/1e6:.1f}M"])], width=6),
+                        dbc.Col([html.P([html.Strong("Edad Media:"), html.Br(), f"{t1['edad_media']:.1f}"])], width=6),
+                        dbc.Col([html.P([html.Strong("Tarjetas:"), html.Br(), f"{int(t1['amarillas'])}🟨 {int(t1['rojas'])}🟥"])], width=6),
+                        dbc.Col([html.P([html.Strong("Partidos:"), html.Br(), f"{int(t1['partidos'])}"])], width=6),
                     ])
                 ])
             ], color="primary", outline=True)
@@ -1190,25 +1783,27 @@ def update_teams_comparison(team1, team2):
                 dbc.CardHeader(html.H5(team2, className="text-center")),
                 dbc.CardBody([
                     dbc.Row([
-                        dbc.Col([html.P([html.Strong("Jugadores:"), html.Br(), f"{len(t2_df)}"])], width=6),
-                        dbc.Col([html.P([html.Strong("Goles:"), html.Br(), f"{int(t2_df['goles_totales'].sum())}"])], width=6),
-                        dbc.Col([html.P([html.Strong("Asistencias:"), html.Br(), f"{int(t2_df['asistencias_totales'].sum())}"])], width=6),
-                        dbc.Col([html.P([html.Strong("Contribución:"), html.Br(), f"{int(t2_df['contribucion_total'].sum())}"])], width=6),
-                        dbc.Col([html.P([html.Strong("Valor:"), html.Br(), f"€{t2_df['current_value'].sum()/1e6:.1f}M"])], width=6),
-                        dbc.Col([html.P([html.Strong("Edad Media:"), html.Br(), f"{t2_df['age'].mean():.1f}"])], width=6),
-                        dbc.Col([html.P([html.Strong("Tarjetas:"), html.Br(), f"{int(t2_df['yellow cards'].sum())}🟨 {int(t2_df['red cards'].sum())}🟥"])], width=6),
-                        dbc.Col([html.P([html.Strong("Partidos:"), html.Br(), f"{int(t2_df['appearance'].sum())}"])], width=6),
+                        dbc.Col([html.P([html.Strong("Jugadores:"), html.Br(), f"{t2['jugadores']}"])], width=6),
+                        dbc.Col([html.P([html.Strong("Goles:"), html.Br(), f"{int(t2['goles'])}"])], width=6),
+                        dbc.Col([html.P([html.Strong("Asistencias:"), html.Br(), f"{int(t2['asistencias'])}"])], width=6),
+                        dbc.Col([html.P([html.Strong("Contribución:"), html.Br(), f"{int(t2['contribucion'])}"])], width=6),
+                        dbc.Col([html.P([html.Strong("Valor:"), html.Br(), f"€{t2['valor']/1e6:.1f}M"])], width=6),
+                        dbc.Col([html.P([html.Strong("Edad Media:"), html.Br(), f"{t2['edad_media']:.1f}"])], width=6),
+                        dbc.Col([html.P([html.Strong("Tarjetas:"), html.Br(), f"{int(t2['amarillas'])}🟨 {int(t2['rojas'])}🟥"])], width=6),
+                        dbc.Col([html.P([html.Strong("Partidos:"), html.Br(), f"{int(t2['partidos'])}"])], width=6),
                     ])
                 ])
             ], color="info", outline=True)
         ], width=12, md=6, className="mb-4"),
     ])
     
+    set_progress((35, "Mejores por posición"))
+    
     # Mejores jugadores por posición de cada equipo
-    def get_best_player_card(team_df, position_name, position_filter, metric, color):
-        filtered = team_df[team_df['position'].str.contains(position_filter, case=False, na=False)]
-        if len(filtered) > 0:
-            best = filtered.nlargest(1, metric).iloc[0]
+    def get_best_player_card(ts, position_name, group, color):
+        metric = ts['gk_metric'] if group == 'Goalkeeper' else BEST_BY_GROUP[group]
+        if ts[f'best_{group}'] >= 0:
+            best = df.iloc[ts[f'best_{group}']]
             return dbc.Card([
                 dbc.CardBody([
                     html.H6(best['name'], className="mb-2"),
@@ -1223,13 +1818,6 @@ def update_teams_comparison(team1, team2):
             dbc.CardBody([html.P("No disponible", className="text-muted mb-0")])
         ], className="mb-2")
     
-    # Porteros
-    t1_gk = t1_df[t1_df['position'] == 'Goalkeeper']
-    t2_gk = t2_df[t2_df['position'] == 'Goalkeeper']
-    
-    t1_gk_metric = 'clean sheets' if len(t1_gk) > 0 and t1_gk['clean sheets'].sum() > 0 else 'appearance'
-    t2_gk_metric = 'clean sheets' if len(t2_gk) > 0 and t2_gk['clean sheets'].sum() > 0 else 'appearance'
-    
     best_by_position = html.Div([
         html.H4("⭐ Comparación de Mejores Jugadores por Posición", className="mt-4 mb-3"),
         dbc.Row([
@@ -1239,11 +1827,11 @@ def update_teams_comparison(team1, team2):
                 dbc.Row([
                     dbc.Col([
                         html.P(team1, className="text-muted small mb-1"),
-                        get_best_player_card(t1_df, "Portero", "Goalkeeper", t1_gk_metric, "#3498db")
+                        get_best_player_card(t1, "Portero", "Goalkeeper", "#3498db")
                     ], width=6),
                     dbc.Col([
                         html.P(team2, className="text-muted small mb-1"),
-                        get_best_player_card(t2_df, "Portero", "Goalkeeper", t2_gk_metric, "#e74c3c")
+                        get_best_player_card(t2, "Portero", "Goalkeeper", "#e74c3c")
                     ], width=6),
                 ])
             ], width=12, lg=6, className="mb-4"),
@@ -1254,11 +1842,11 @@ def update_teams_comparison(team1, team2):
                 dbc.Row([
                     dbc.Col([
                         html.P(team1, className="text-muted small mb-1"),
-                        get_best_player_card(t1_df, "Defensor", "Defender", "appearance", "#3498db")
+                        get_best_player_card(t1, "Defensor", "Defender", "#3498db")
                     ], width=6),
                     dbc.Col([
                         html.P(team2, className="text-muted small mb-1"),
-                        get_best_player_card(t2_df, "Defensor", "Defender", "appearance", "#e74c3c")
+                        get_best_player_card(t2, "Defensor", "Defender", "#e74c3c")
                     ], width=6),
                 ])
             ], width=12, lg=6, className="mb-4"),
@@ -1269,11 +1857,11 @@ def update_teams_comparison(team1, team2):
                 dbc.Row([
                     dbc.Col([
                         html.P(team1, className="text-muted small mb-1"),
-                        get_best_player_card(t1_df, "Medio", "Midfield|midfield", "contribucion_total", "#3498db")
+                        get_best_player_card(t1, "Medio", "Midfield", "#3498db")
                     ], width=6),
                     dbc.Col([
                         html.P(team2, className="text-muted small mb-1"),
-                        get_best_player_card(t2_df, "Medio", "Midfield|midfield", "contribucion_total", "#e74c3c")
+                        get_best_player_card(t2, "Medio", "Midfield", "#e74c3c")
                     ], width=6),
                 ])
             ], width=12, lg=6, className="mb-4"),
@@ -1284,35 +1872,37 @@ def update_teams_comparison(team1, team2):
                 dbc.Row([
                     dbc.Col([
                         html.P(team1, className="text-muted small mb-1"),
-                        get_best_player_card(t1_df, "Delantero", "Attack|Forward|Striker", "goles_totales", "#3498db")
+                        get_best_player_card(t1, "Delantero", "Attack", "#3498db")
                     ], width=6),
                     dbc.Col([
                         html.P(team2, className="text-muted small mb-1"),
-                        get_best_player_card(t2_df, "Delantero", "Attack|Forward|Striker", "goles_totales", "#e74c3c")
+                        get_best_player_card(t2, "Delantero", "Attack", "#e74c3c")
                     ], width=6),
                 ])
             ], width=12, lg=6, className="mb-4"),
         ])
     ])
     
+    set_progress((70, "Gráficos"))
+    
     # Gráfico comparativo general
     comp_data = pd.DataFrame({
         'Métrica': ['Jugadores', 'Goles', 'Asistencias', 'Contribución', 'Valor (M€)', 'Tarjetas'],
         team1: [
-            len(t1_df),
-            int(t1_df['goles_totales'].sum()),
-            int(t1_df['asistencias_totales'].sum()),
-            int(t1_df['contribucion_total'].sum()),
-            t1_df['current_value'].sum()/1e6,
-            int(t1_df['yellow cards'].sum() + t1_df['red cards'].sum())
+            t1['jugadores'],
+            int(t1['goles']),
+            int(t1['asistencias']),
+            int(t1['contribucion']),
+            t1['valor']/1e6,
+            int(t1['amarillas'] + t1['rojas'])
         ],
         team2: [
-            len(t2_df),
-            int(t2_df['goles_totales'].sum()),
-            int(t2_df['asistencias_totales'].sum()),
-            int(t2_df['contribucion_total'].sum()),
-            t2_df['current_value'].sum()/1e6,
-            int(t2_df['yellow cards'].sum() + t2_df['red cards'].sum())
+            t2['jugadores'],
+            int(t2['goles']),
+            int(t2['asistencias']),
+            int(t2['contribucion']),
+            t2['valor']/1e6,
+            int(t2['amarillas'] + t2['rojas'])
         ]
     })
     
@@ -1348,8 +1938,8 @@ def update_teams_comparison(team1, team2):
     )
     
     # Distribución por posición
-    t1_pos = t1_df['position'].value_counts().head(8)
-    t2_pos = t2_df['position'].value_counts().head(8)
+    t1_pos = t1_df['position'].value_counts().loc[lambda s: s > 0].head(8)
+    t2_pos = t2_df['position'].value_counts().loc[lambda s: s > 0].head(8)
     
     fig_pos = go.Figure()
     fig_pos.add_trace(go.Bar(
@@ -1372,11 +1962,11 @@ def update_teams_comparison(team1, team2):
     )
     
     charts = dbc.Row([
-        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=fig_comp)])], className="shadow-sm")],
+        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=slim_figure(fig_comp))])], className="shadow-sm")],
                 width=12, className="mb-4"),
-        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=fig_scorers)])], className="shadow-sm")],
+        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=slim_figure(fig_scorers))])], className="shadow-sm")],
                 width=12, lg=6, className="mb-4"),
-        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=fig_pos)])], className="shadow-sm")],
+        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=slim_figure(fig_pos))])], className="shadow-sm")],
                 width=12, lg=6, className="mb-4"),
     ])
     
@@ -1403,11 +1993,11 @@ def update_teams_comparison(team1, team2):
     )
     
     charts = dbc.Row([
-        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=fig_comp)])], className="shadow-sm")],
+        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=slim_figure(fig_comp))])], className="shadow-sm")],
                 width=12, className="mb-4"),
-        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=fig_scorers)])], className="shadow-sm")],
+        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=slim_figure(fig_scorers))])], className="shadow-sm")],
                 width=12, lg=6, className="mb-4"),
-        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=fig_pos)])], className="shadow-sm")],
+        dbc.Col([dbc.Card([dbc.CardBody([dcc.Graph(figure=slim_figure(fig_pos))])], className="shadow-sm")],
                 width=12, lg=6, className="mb-4"),
     ])
     
@@ -1458,235 +2048,230 @@ def update_perf_dropdown_options(position):
     
     return options, options, options, options
 
-@app.callback(
-    [Output('perf-graph1', 'figure'), Output('perf-graph2', 'figure'),
-     Output('perf-graph3', 'figure'), Output('perf-graph4', 'figure')],
-    [Input('perf-team', 'value'), Input('perf-position', 'value'),
-     Input('perf-matches', 'value'), Input('perf-graph1-type', 'value'),
-     Input('perf-graph2-type', 'value'), Input('perf-graph3-type', 'value'),
-     Input('perf-graph4-type', 'value')]
-)
-def update_performance(team, position, min_matches, g1_type, g2_type, g3_type, g4_type):
-    # Filtrar datos
-    df_f = df[df['appearance'] >= min_matches].copy()
+def perf_view(data, team, position, min_matches):
+    """Jugadores filtrados por equipo, posición y partidos (compartida por las 4 gráficas)."""
+    def build():
+        df = data['df']
+        # Filtro por posición: filas del grupo precalculadas
+        base = df.iloc[data['position_rows'][position]] if position in POSITION_BITS else df
+        
+        # Filtrar datos (partidos y equipo) con una sola máscara
+        mask = base['appearance'].to_numpy() >= min_matches
+        if team != 'all':
+            mask &= (base['team'] == team).to_numpy()
+        return base[mask]
     
-    # Filtro por equipo
-    if team != 'all':
-        df_f = df_f[df_f['team'] == team]
+    return shared_view(data, ('perf', team, position, min_matches), build)
+
+def create_perf_graph(data, team, position, min_matches, graph_type):
+    df_f = perf_view(data, team, position, min_matches)
     
-    # Filtro por posición
-    if position == 'Goalkeeper':
-        df_f = df_f[df_f['position'] == 'Goalkeeper']
-    elif position == 'Defender':
-        df_f = df_f[df_f['position'].str.contains('Defender', case=False, na=False)]
-    elif position == 'Midfield':
-        df_f = df_f[df_f['position'].str.contains('Midfield|midfield', case=False, na=False)]
-    elif position == 'Attack':
-        df_f = df_f[df_f['position'].str.contains('Attack|Forward|Striker', case=False, na=False)]
-    
-    def create_perf_graph(graph_type):
-        if len(df_f) == 0:
-            fig = px.scatter(title="No hay datos con los filtros seleccionados")
-            fig.update_layout(template='plotly_white')
-            return fig
+    if len(df_f) == 0:
+        fig = px.scatter(title="No hay datos con los filtros seleccionados")
+        fig.update_layout(template='plotly_white')
+        return fig
+    
+    # Gráficos para jugadores de campo
+    if graph_type == 'goals_per_game':
+        top = df_f.nlargest(20, 'goles_por_partido')
+        fig = px.bar(top, y='name', x='goles_por_partido', orientation='h',
+                    color='goles_por_partido', color_continuous_scale='Reds',
+                    labels={'goles_por_partido': 'Goles/Partido', 'name': 'Jugador'},
+                    hover_data=['team', 'position', 'goles_totales'])
+        fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
         
-        # Gráficos para jugadores de campo
-        if graph_type == 'goals_per_game':
-            top = df_f.nlargest(20, 'goles_por_partido')
-            fig = px.bar(top, y='name', x='goles_por_partido', orientation='h',
-                        color='goles_por_partido', color_continuous_scale='Reds',
-                        labels={'goles_por_partido': 'Goles/Partido', 'name': 'Jugador'},
-                        hover_data=['team', 'position', 'goles_totales'])
-            fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
-            
-        elif graph_type == 'assists_per_game':
-            top = df_f.nlargest(20, 'asistencias_por_partido')
-            fig = px.bar(top, y='name', x='asistencias_por_partido', orientation='h',
-                        color='asistencias_por_partido', color_continuous_scale='Blues',
-                        labels={'asistencias_por_partido': 'Asistencias/Partido', 'name': 'Jugador'},
-                        hover_data=['team', 'position', 'asistencias_totales'])
-            fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
-            
-        elif graph_type == 'contribution_per_game':
-            df_f['contrib_per_game'] = df_f['contribucion_total'] / df_f['appearance']
-            top = df_f.nlargest(20, 'contrib_per_game')
-            fig = px.bar(top, y='name', x='contrib_per_game', orientation='h',
-                        color='contrib_per_game', color_continuous_scale='Greens',
-                        labels={'contrib_per_game': 'Contribución/Partido', 'name': 'Jugador'},
-                        hover_data=['team', 'position', 'contribucion_total'])
-            fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
-            
-        elif graph_type == 'top_scorers':
-            top = df_f.nlargest(20, 'goles_totales')
-            fig = px.bar(top, y='name', x='goles_totales', orientation='h',
-                        color='goles_totales', color_continuous_scale='Reds',
-                        labels={'goles_totales': 'Goles Totales', 'name': 'Jugador'},
-                        hover_data=['team', 'position', 'appearance'])
+    elif graph_type == 'assists_per_game':
+        top = df_f.nlargest(20, 'asistencias_por_partido')
+        fig = px.bar(top, y='name', x='asistencias_por_partido', orientation='h',
+                    color='asistencias_por_partido', color_continuous_scale='Blues',
+                    labels={'asistencias_por_partido': 'Asistencias/Partido', 'name': 'Jugador'},
+                    hover_data=['team', 'position', 'asistencias_totales'])
+        fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+        
+    elif graph_type == 'contribution_per_game':
+        # La vista es compartida: la columna auxiliar va en una copia
+        top = (df_f.assign(contrib_per_game=df_f['contribucion_total'] / df_f['appearance'])
+               .nlargest(20, 'contrib_per_game'))
+        fig = px.bar(top, y='name', x='contrib_per_game', orientation='h',
+                    color='contrib_per_game', color_continuous_scale='Greens',
+                    labels={'contrib_per_game': 'Contribución/Partido', 'name': 'Jugador'},
+                    hover_data=['team', 'position', 'contribucion_total'])
+        fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+        
+    elif graph_type == 'top_scorers':
+        top = df_f.nlargest(20, 'goles_totales')
+        fig = px.bar(top, y='name', x='goles_totales', orientation='h',
+                    color='goles_totales', color_continuous_scale='Reds',
+                    labels={'goles_totales': 'Goles Totales', 'name': 'Jugador'},
+                    hover_data=['team', 'position', 'appearance'])
+        fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+        
+    elif graph_type == 'top_assisters':
+        top = df_f.nlargest(20, 'asistencias_totales')
+        fig = px.bar(top, y='name', x='asistencias_totales', orientation='h',
+                    color='asistencias_totales', color_continuous_scale='Blues',
+                    labels={'asistencias_totales': 'Asistencias Totales', 'name': 'Jugador'},
+                    hover_data=['team', 'position', 'appearance'])
+        fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+        
+    elif graph_type == 'contribution':
+        top = df_f.nlargest(20, 'contribucion_total')
+        fig = px.bar(top, y='name', x='contribucion_total', orientation='h',
+                    color='contribucion_total', color_continuous_scale='Greens',
+                    labels={'contribucion_total': 'Goles + Asistencias', 'name': 'Jugador'},
+                    hover_data=['team', 'position', 'appearance'])
+        fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+        
+    elif graph_type == 'value_market':
+        df_val = df_f[df_f['current_value'] > 0]
+        if len(df_val) > 0:
+            top = df_val.nlargest(20, 'current_value')
+            fig = px.bar(top, y='name', x='current_value', orientation='h',
+                        color='current_value', color_continuous_scale='YlOrRd',
+                        labels={'current_value': 'Valor (€)', 'name': 'Jugador'},
+                        hover_data=['team', 'position'])
             fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+            fig.update_xaxes(tickformat='.0s')
+        else:
+            fig = px.scatter(title="No hay datos de valor de mercado")
             
-        elif graph_type == 'top_assisters':
-            top = df_f.nlargest(20, 'asistencias_totales')
-            fig = px.bar(top, y='name', x='asistencias_totales', orientation='h',
-                        color='asistencias_totales', color_continuous_scale='Blues',
-                        labels={'asistencias_totales': 'Asistencias Totales', 'name': 'Jugador'},
+    elif graph_type == 'minutes_per_game':
+        top = df_f.nlargest(20, 'minutos_por_partido')
+        fig = px.bar(top, y='name', x='minutos_por_partido', orientation='h',
+                    color='minutos_por_partido', color_continuous_scale='Purples',
+                    labels={'minutos_por_partido': 'Minutos/Partido', 'name': 'Jugador'},
+                    hover_data=['team', 'position', 'minutes played'])
+        fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+        
+    elif graph_type == 'yellow_cards':
+        top = df_f.nlargest(20, 'yellow cards')
+        fig = px.bar(top, y='name', x='yellow cards', orientation='h',
+                    color='yellow cards', color_continuous_scale='YlOrRd',
+                    labels={'yellow cards': 'Tarjetas Amarillas', 'name': 'Jugador'},
+                    hover_data=['team', 'position', 'appearance'])
+        fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+        
+    elif graph_type == 'red_cards':
+        df_red = df_f[df_f['red cards'] > 0]
+        if len(df_red) > 0:
+            top = df_red.nlargest(20, 'red cards')
+            fig = px.bar(top, y='name', x='red cards', orientation='h',
+                        color='red cards', color_continuous_scale='Reds',
+                        labels={'red cards': 'Tarjetas Rojas', 'name': 'Jugador'},
                         hover_data=['team', 'position', 'appearance'])
             fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+        else:
+            fig = px.scatter(title="No hay jugadores con tarjetas rojas")
             
-        elif graph_type == 'contribution':
-            top = df_f.nlargest(20, 'contribucion_total')
-            fig = px.bar(top, y='name', x='contribucion_total', orientation='h',
-                        color='contribucion_total', color_continuous_scale='Greens',
-                        labels={'contribucion_total': 'Goles + Asistencias', 'name': 'Jugador'},
-                        hover_data=['team', 'position', 'appearance'])
+    elif graph_type == 'age_dist':
+        fig = px.histogram(df_f, x='age', nbins=15,
+                         labels={'age': 'Edad', 'count': 'Jugadores'},
+                         color_discrete_sequence=['steelblue'])
+        fig.update_layout(showlegend=False)
+        
+    elif graph_type == 'goals_assists_scatter':
+        fig = scatter(df_f, x='goles_totales', y='asistencias_totales',
+                       hover_name='name', hover_data=['team', 'position', 'appearance'],
+                       color='position', size='contribucion_total',
+                       labels={'goles_totales': 'Goles', 'asistencias_totales': 'Asistencias'})
+    
+    # Gráficos para porteros
+    elif graph_type == 'clean_sheets':
+        df_cs = df_f[df_f['clean sheets'] > 0]
+        if len(df_cs) > 0:
+            top = df_cs.nlargest(20, 'clean sheets')
+            fig = px.bar(top, y='name', x='clean sheets', orientation='h',
+                        color='clean sheets', color_continuous_scale='Greens',
+                        labels={'clean sheets': 'Porterías a Cero', 'name': 'Portero'},
+                        hover_data=['team', 'appearance'])
             fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+        else:
+            fig = px.scatter(title="No hay datos de porterías a cero")
             
-        elif graph_type == 'value_market':
-            df_val = df_f[df_f['current_value'] > 0]
-            if len(df_val) > 0:
-                top = df_val.nlargest(20, 'current_value')
-                fig = px.bar(top, y='name', x='current_value', orientation='h',
-                            color='current_value', color_continuous_scale='YlOrRd',
-                            labels={'current_value': 'Valor (€)', 'name': 'Jugador'},
-                            hover_data=['team', 'position'])
-                fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
-                fig.update_xaxes(tickformat='.0s')
-            else:
-                fig = px.scatter(title="No hay datos de valor de mercado")
-                
-        elif graph_type == 'minutes_per_game':
-            top = df_f.nlargest(20, 'minutos_por_partido')
-            fig = px.bar(top, y='name', x='minutos_por_partido', orientation='h',
-                        color='minutos_por_partido', color_continuous_scale='Purples',
-                        labels={'minutos_por_partido': 'Minutos/Partido', 'name': 'Jugador'},
-                        hover_data=['team', 'position', 'minutes played'])
-            fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+    elif graph_type == 'goals_conceded':
+        df_gc = df_f[df_f['goals conceded'] > 0]
+        if len(df_gc) > 0:
+            top = df_gc.nsmallest(20, 'goals conceded')  # Los MEJORES conceden MENOS
+            fig = px.bar(top, y='name', x='goals conceded', orientation='h',
+                        color='goals conceded', color_continuous_scale='Reds_r',
+                        labels={'goals conceded': 'Goles Concedidos', 'name': 'Portero'},
+                        hover_data=['team', 'appearance'])
+            fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total descending'})
+        else:
+            fig = px.scatter(title="No hay datos de goles concedidos")
             
-        elif graph_type == 'yellow_cards':
-            top = df_f.nlargest(20, 'yellow cards')
-            fig = px.bar(top, y='name', x='yellow cards', orientation='h',
-                        color='yellow cards', color_continuous_scale='YlOrRd',
-                        labels={'yellow cards': 'Tarjetas Amarillas', 'name': 'Jugador'},
-                        hover_data=['team', 'position', 'appearance'])
+    elif graph_type == 'clean_sheets_per_game':
+        df_cs = df_f[df_f['clean sheets'] > 0]
+        if len(df_cs) > 0:
+            df_cs = df_cs.copy()
+            df_cs['cs_per_game'] = df_cs['clean sheets'] / df_cs['appearance']
+            top = df_cs.nlargest(20, 'cs_per_game')
+            fig = px.bar(top, y='name', x='cs_per_game', orientation='h',
+                        color='cs_per_game', color_continuous_scale='Greens',
+                        labels={'cs_per_game': 'Porterías a Cero/Partido', 'name': 'Portero'},
+                        hover_data=['team', 'clean sheets', 'appearance'])
             fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
+        else:
+            fig = px.scatter(title="No hay datos de porterías a cero")
             
-        elif graph_type == 'red_cards':
-            df_red = df_f[df_f['red cards'] > 0]
-            if len(df_red) > 0:
-                top = df_red.nlargest(20, 'red cards')
-                fig = px.bar(top, y='name', x='red cards', orientation='h',
-                            color='red cards', color_continuous_scale='Reds',
-                            labels={'red cards': 'Tarjetas Rojas', 'name': 'Jugador'},
-                            hover_data=['team', 'position', 'appearance'])
-                fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
-            else:
-                fig = px.scatter(title="No hay jugadores con tarjetas rojas")
-                
-        elif graph_type == 'age_dist':
-            fig = px.histogram(df_f, x='age', nbins=15,
-                             labels={'age': 'Edad', 'count': 'Jugadores'},
-                             color_discrete_sequence=['steelblue'])
-            fig.update_layout(showlegend=False)
+    elif graph_type == 'goals_conceded_per_game':
+        df_gc = df_f[df_f['goals conceded'] > 0]
+        if len(df_gc) > 0:
+            df_gc = df_gc.copy()
+            df_gc['gc_per_game'] = df_gc['goals conceded'] / df_gc['appearance']
+            top = df_gc.nsmallest(20, 'gc_per_game')  # Los MEJORES conceden MENOS por partido
+            fig = px.bar(top, y='name', x='gc_per_game', orientation='h',
+                        color='gc_per_game', color_continuous_scale='Reds_r',
+                        labels={'gc_per_game': 'Goles Concedidos/Partido', 'name': 'Portero'},
+                        hover_data=['team', 'goals conceded', 'appearance'])
+            fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total descending'})
+        else:
+            fig = px.scatter(title="No hay datos de goles concedidos")
             
-        elif graph_type == 'goals_assists_scatter':
-            sample = df_f.sample(min(200, len(df_f)))
-            fig = px.scatter(sample, x='goles_totales', y='asistencias_totales',
-                           hover_name='name', hover_data=['team', 'position', 'appearance'],
-                           color='position', size='contribucion_total',
-                           labels={'goles_totales': 'Goles', 'asistencias_totales': 'Asistencias'})
-        
-        # Gráficos para porteros
-        elif graph_type == 'clean_sheets':
-            df_cs = df_f[df_f['clean sheets'] > 0]
-            if len(df_cs) > 0:
-                top = df_cs.nlargest(20, 'clean sheets')
-                fig = px.bar(top, y='name', x='clean sheets', orientation='h',
-                            color='clean sheets', color_continuous_scale='Greens',
-                            labels={'clean sheets': 'Porterías a Cero', 'name': 'Portero'},
-                            hover_data=['team', 'appearance'])
-                fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
-            else:
-                fig = px.scatter(title="No hay datos de porterías a cero")
-                
-        elif graph_type == 'goals_conceded':
-            df_gc = df_f[df_f['goals conceded'] > 0]
-            if len(df_gc) > 0:
-                top = df_gc.nsmallest(20, 'goals conceded')  # Los MEJORES conceden MENOS
-                fig = px.bar(top, y='name', x='goals conceded', orientation='h',
-                            color='goals conceded', color_continuous_scale='Reds_r',
-                            labels={'goals conceded': 'Goles Concedidos', 'name': 'Portero'},
-                            hover_data=['team', 'appearance'])
-                fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total descending'})
-            else:
-                fig = px.scatter(title="No hay datos de goles concedidos")
-                
-        elif graph_type == 'clean_sheets_per_game':
-            df_cs = df_f[df_f['clean sheets'] > 0]
-            if len(df_cs) > 0:
-                df_cs = df_cs.copy()
-                df_cs['cs_per_game'] = df_cs['clean sheets'] / df_cs['appearance']
-                top = df_cs.nlargest(20, 'cs_per_game')
-                fig = px.bar(top, y='name', x='cs_per_game', orientation='h',
-                            color='cs_per_game', color_continuous_scale='Greens',
-                            labels={'cs_per_game': 'Porterías a Cero/Partido', 'name': 'Portero'},
-                            hover_data=['team', 'clean sheets', 'appearance'])
-                fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'})
-            else:
-                fig = px.scatter(title="No hay datos de porterías a cero")
-                
-        elif graph_type == 'goals_conceded_per_game':
-            df_gc = df_f[df_f['goals conceded'] > 0]
-            if len(df_gc) > 0:
-                df_gc = df_gc.copy()
-                df_gc['gc_per_game'] = df_gc['goals conceded'] / df_gc['appearance']
-                top = df_gc.nsmallest(20, 'gc_per_game')  # Los MEJORES conceden MENOS por partido
-                fig = px.bar(top, y='name', x='gc_per_game', orientation='h',
-                            color='gc_per_game', color_continuous_scale='Reds_r',
-                            labels={'gc_per_game': 'Goles Concedidos/Partido', 'name': 'Portero'},
-                            hover_data=['team', 'goals conceded', 'appearance'])
-                fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total descending'})
-            else:
-                fig = px.scatter(title="No hay datos de goles concedidos")
-                
-        elif graph_type == 'clean_goals_scatter':
-            df_gk = df_f[(df_f['clean sheets'] > 0) | (df_f['goals conceded'] > 0)]
-            if len(df_gk) > 0:
-                fig = px.scatter(df_gk, x='clean sheets', y='goals conceded',
-                               hover_name='name', hover_data=['team', 'appearance'],
-                               size='appearance', color='team',
-                               labels={'clean sheets': 'Porterías a Cero', 'goals conceded': 'Goles Concedidos'})
-            else:
-                fig = px.scatter(title="No hay datos para comparar")
-        
+    elif graph_type == 'clean_goals_scatter':
+        df_gk = df_f[(df_f['clean sheets'] > 0) | (df_f['goals conceded'] > 0)]
+        if len(df_gk) > 0:
+            fig = px.scatter(df_gk, x='clean sheets', y='goals conceded',
+                           hover_name='name', hover_data=['team', 'appearance'],
+                           size='appearance', color='team',
+                           labels={'clean sheets': 'Porterías a Cero', 'goals conceded': 'Goles Concedidos'})
         else:
-            fig = px.scatter(title="Selecciona un tipo de gráfico")
-        
-        fig.update_layout(template='plotly_white', margin=dict(l=20, r=20, t=40, b=20))
-        return fig
+            fig = px.scatter(title="No hay datos para comparar")
+    
+    else:
+        fig = px.scatter(title="Selecciona un tipo de gráfico")
     
-    return create_perf_graph(g1_type), create_perf_graph(g2_type), create_perf_graph(g3_type), create_perf_graph(g4_type)
+    fig.update_layout(template='plotly_white', margin=dict(l=20, r=20, t=40, b=20))
+    return fig
+
+def update_perf_graph(team, position, min_matches, graph_type, shown_layout):
+    data = DATA
+    position = position if position in POSITION_BITS else 'all'
+    fig = FIGURES.get_or_build(('perf', team, position, min_matches, graph_type), data['version'],
+                               lambda: create_perf_graph(data, team, position, min_matches, graph_type))
+    return figure_update(fig, shown_layout)
+
+for i in range(1, 5):
+    app.callback(
+        [Output(f'perf-graph{i}', 'figure'), Output(f'perf-graph{i}-layout', 'data')],
+        [Input('perf-team', 'value'), Input('perf-position', 'value'),
+         Input('perf-matches', 'value'), Input(f'perf-graph{i}-type', 'value')],
+        State(f'perf-graph{i}-layout', 'data')
+    )(update_perf_graph)
 
 @app.callback(Output('val-result', 'children'), Input('val-player', 'value'))
 def predict_value(player_idx):
-    if player_idx is None or not ML_ENABLED:
+    if player_idx is None:
+        return ""
+    data = DATA
+    values = valuation_values(data)
+    if values is None:
         return ""
     
-    player = df.iloc[player_idx]
-    
-    # Preparar features
-    player_features = {}
-    for feat in ml_features:
-        if feat in player.index:
-            player_features[feat] = player[feat]
-        else:
-            player_features[feat] = 0
-    
-    X = pd.DataFrame([player_features])
-    X_scaled = ml_scaler.transform(X)
-    prediction = ml_model.predict(X_scaled)[0]
-    
+    # Predicción ya calculada para toda la tabla (valuation_values)
+    player = data['df'].iloc[player_idx]
+    prediction, diff, diff_pct = values.iloc[player_idx][['predicted_value', 'value_gap', 'value_gap_pct']]
     real_value = player['current_value']
-    diff = prediction - real_value
-    diff_pct = (diff / real_value * 100) if real_value > 0 else 0
     
     return html.Div([
         dbc.Alert([
@@ -1700,12 +2285,9 @@ def predict_value(player_idx):
         ], color="success" if abs(diff_pct) < 20 else "warning")
     ])
 
-@app.callback(
-    [Output('cluster-scatter', 'figure'), Output('cluster-table', 'children')],
-    [Input('cluster-filter', 'value'), Input('cluster-value', 'value')]
-)
 def update_clustering(cluster, value):
-    if not CLUSTERING_ENABLED:
+    clustering_model = clustering_state(DATA)
+    if clustering_model is None:
         return {}, ""
     
     data = clustering_model['data'].copy()
@@ -1716,7 +2298,7 @@ def update_clustering(cluster, value):
     if value < 100:
         data = data[data['current_value'] <= value * 1e6]
     
-    data['label'] = data['cluster'].map({i: labels[i] for i in range(6)})
+    data['label'] = data['cluster'].map({i: labels[i] for i in range(len(labels))})
     
     fig = px.scatter(data, x='pca_x', y='pca_y', color='label', hover_name='name',
                     hover_data={'team': True, 'goles_totales': True, 'current_value': '€:,.0f',
@@ -1733,35 +2315,107 @@ def update_clustering(cluster, value):
         striped=True, bordered=True, hover=True, size='sm'
     ) if len(data) > 0 else html.P("Sin jugadores")
     
-    return fig, table
+    return slim_figure(fig), table
 
-@app.callback(Output('bargains-chart', 'figure'), Input('url', 'pathname'))
-def update_bargains(path):
-    if path != '/bargains' or not ANOMALY_ENABLED:
-        return {}
+# Mismo resultado que update_clustering, calculado en el navegador con los
+# arrays de 'cluster-data' (CLUSTER_CLIENTSIDE=0 vuelve al callback de servidor)
+if CLUSTER_CLIENTSIDE:
+    app.clientside_callback(
+        ClientsideFunction(namespace='clustering', function_name='update'),
+        [Output('cluster-scatter', 'figure'), Output('cluster-table', 'children')],
+        [Input('cluster-filter', 'value'), Input('cluster-value', 'value')],
+        State('cluster-data', 'data')
+    )
+else:
+    app.callback(
+        [Output('cluster-scatter', 'figure'), Output('cluster-table', 'children')],
+        [Input('cluster-filter', 'value'), Input('cluster-value', 'value')]
+    )(update_clustering)
+
+@app.callback(
+    [Output('bargains-chart', 'figure'), Output('bargains-kpis', 'children'),
+     Output('bargains-lead', 'children'), Output('bargains-formula', 'children')],
+    [Input('url', 'pathname'), Input('bargains-position', 'value'), Input('bargains-budget', 'value'),
+     Input('bargains-w-goals', 'value'), Input('bargains-w-assists', 'value'),
+     Input('bargains-w-matches', 'value')]
+)
+def update_bargains(path, position='all', budget=100, goals_w=None, assists_w=None, matches_w=None):
+    if path != '/bargains':
+        return {}, dash.no_update, dash.no_update, dash.no_update
+    weights = weight_vector(goals_w, assists_w, matches_w)
+    data = DATA
+    scores = bargain_scores(data, weights)
+    if scores is None:
+        return {}, dash.no_update, dash.no_update, dash.no_update
+    
+    # El extremo del slider (100+ M€) no limita el presupuesto
+    gangas = bargain_ranking(data['df'], scores, position,
+                             max_value=budget * 1e6 if budget is not None and budget < 100 else None)
+    
+    formula = [html.Strong("Fórmula Rendimiento:"), html.Br(),
+               f"(Goles × {weights[0]:g}) + (Asist × {weights[1]:g}) + (Partidos × {weights[2]:g})"]
+    lead = f"{len(gangas)} jugadores infravalorados detectados"
+    if len(gangas) == 0:
+        kpis = [dbc.Col(dbc.Alert("Ningún jugador cumple los filtros: prueba con más presupuesto u otra posición",
+                                  color="warning"), width=12)]
+        return {}, kpis, lead, formula
+    
+    kpis = [
+        bargain_kpi("fa-gem", COLORS['accent'], f"{len(gangas)}", "Gangas Detectadas"),
+        bargain_kpi("fa-chart-line", COLORS['secondary'],
+                    f"€{gangas['current_value'].median()/1e6:.1f}M", "Precio Mediano"),
+        bargain_kpi("fa-star", COLORS['primary'], f"{gangas['ratio'].mean():.0f}x", "Ratio Promedio"),
+    ]
     
-    gangas = anomaly_model['gangas'].head(30)
-    fig = px.bar(gangas, x='ratio', y='name', orientation='h', color='ratio',
+    fig = px.bar(gangas.head(30), x='ratio', y='name', orientation='h', color='ratio',
                  color_continuous_scale='Viridis',
                  hover_data={'team': True, 'goles_totales': True, 'current_value': '€:,.0f'})
     fig.update_layout(showlegend=False, yaxis={'categoryorder': 'total ascending'}, height=700)
-    return fig
+    return slim_figure(fig), kpis, lead, formula
 
 @app.callback(
     Output('rec-results', 'children'),
     [Input('rec-btn', 'n_clicks')],
-    [State('rec-player', 'value')]
+    [State('rec-player', 'value'), State('rec-position', 'value'),
+     State('rec-max-value', 'value'), State('rec-max-age', 'value')]
 )
-def recommend(n_clicks, player_idx):
-    if not n_clicks or player_idx is None or not RECOMMENDATION_ENABLED:
+def recommend(n_clicks, player_idx, position='all', max_value=100, max_age=40):
+    recommendation_model = MODELS.get('recommendation')
+    if not n_clicks or player_idx is None or recommendation_model is None:
         return ""
     
     players = recommendation_model['players_data']
     selected = players.iloc[player_idx]
     
-    if 'top_indices' in recommendation_model:
+    # Los extremos de los sliders (100+ M€, 40+ años) no filtran
+    filtered = position not in (None, 'all') or max_value < 100 or max_age < 40
+    if filtered:
+        mask = filter_mask(recommendation_model['position_groups'],
+                           players['current_value'].to_numpy(), players['age'].to_numpy(),
+                           position=position,
+                           max_value=max_value * 1e6 if max_value < 100 else None,
+                           max_age=max_age if max_age < 40 else None)
+        mask[player_idx] = False
+        # Los 10 primeros vecinos precalculados que cumplen los filtros son los
+        # 10 mejores; si no llegan a 10, búsqueda sobre todos los jugadores
+        passing = []
+        if 'top_indices' in recommendation_model:
+            neighbours = np.asarray(recommendation_model['top_indices'][player_idx])
+            passing = np.flatnonzero(mask[neighbours])[:10]
+        if len(passing) == 10:
+            top_idx = neighbours[passing]
+            similarities = neighbour_scores(recommendation_model, player_idx)[passing]
+        elif 'neighbors' in recommendation_model:
+            index = recommendation_model['neighbors']
+            top_idx, similarities = index.search(index.vector(player_idx), k=10, mask=mask)
+        else:
+            sims = recommendation_model['similarity_matrix'][player_idx]
+            candidates = np.flatnonzero(mask)
+            top_idx = candidates[np.argsort(-sims[candidates], kind='stable')[:10]]
+            similarities = sims[top_idx]
+    elif 'top_indices' in recommendation_model:
         top_idx = recommendation_model['top_indices'][player_idx][1:11]
-        similarities = recommendation_model['top_scores'][player_idx][1:11]
+        similarities = neighbour_scores(recommendation_model, player_idx)[1:11]
     else:
         sim_matrix = recommendation_model['similarity_matrix']
         sims = sim_matrix[player_idx]
@@ -1806,6 +2460,9 @@ def recommend(n_clicks, player_idx):
         width=12, md=6, lg=4, xl=3, className="mb-3")
         similar_cards.append(card)
     
+    if not similar_cards:
+        similar_cards = [dbc.Col(dbc.Alert("Ningún jugador cumple los filtros", color="warning"), width=12)]
+    
     return html.Div([
         player_card,
         html.H3([html.I(className="fas fa-users me-2"), "Jugadores Similares"], className="mb-3 mt-4"),
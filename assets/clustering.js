@@ -0,0 +1,142 @@
+/* Football Analytics Pro - Filtro del explorador de estilos en el navegador
+ *
+ * Reproduce update_clustering (app.py) a partir del dcc.Store 'cluster-data':
+ * los arrays binarios se decodifican una vez y cada cambio de estilo o de
+ * valor máximo solo recorre los puntos en memoria, sin ir al servidor.
+ */
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    clustering: (function () {
+        var TYPES = {
+            int8: Int8Array, int16: Int16Array, int32: Int32Array,
+            uint8: Uint8Array, uint16: Uint16Array, uint32: Uint32Array,
+            float32: Float32Array, float64: Float64Array
+        };
+        var cache = {store: null, columns: null};
+
+        function decode(typed) {
+            var bin = atob(typed.bdata);
+            var bytes = new Uint8Array(bin.length);
+            for (var i = 0; i < bin.length; i++) {
+                bytes[i] = bin.charCodeAt(i);
+            }
+            return new TYPES[typed.dtype](bytes.buffer);
+        }
+
+        function columns(store) {
+            if (cache.store !== store) {
+                var cols = {};
+                Object.keys(store.arrays).forEach(function (key) {
+                    cols[key] = decode(store.arrays[key]);
+                });
+                cache = {store: store, columns: cols};
+            }
+            return cache.columns;
+        }
+
+        function html(type, children, props) {
+            return {
+                type: type,
+                namespace: 'dash_html_components',
+                props: Object.assign({children: children}, props || {})
+            };
+        }
+
+        // Una traza por estilo en orden de aparición, como px.scatter(color='label').
+        // Los clusters sin etiqueta consumen color pero no se dibujan (NaN en pandas).
+        function scatter(store, cols, rows) {
+            var traces = [];
+            var byLabel = {};
+            var colors = {};
+            var nColors = 0;
+            var type = rows.length > 1000 ? 'scattergl' : 'scatter';
+
+            rows.forEach(function (i) {
+                var label = store.labels[cols.cluster[i]];
+                var key = label === undefined ? '\u0000nan' : label;
+                if (!(key in colors)) {
+                    colors[key] = store.colorway[nColors++ % store.colorway.length];
+                }
+                if (label === undefined) {
+                    return;
+                }
+                var trace = byLabel[label];
+                if (!trace) {
+                    trace = byLabel[label] = {
+                        customdata: [], hovertemplate: store.hovertemplate, hovertext: [],
+                        legendgroup: label,
+                        marker: {color: colors[key], symbol: 'circle', opacity: 0.7, size: 8},
+                        mode: 'markers', name: label, showlegend: true,
+                        x: [], xaxis: 'x', y: [], yaxis: 'y', type: type
+                    };
+                    if (type === 'scatter') {
+                        trace.orientation = 'v';
+                    }
+                    traces.push(trace);
+                }
+                trace.customdata.push([store.teams[cols.team[i]], cols.goles[i], cols.value[i], label]);
+                trace.hovertext.push(store.name[i]);
+                trace.x.push(cols.x[i]);
+                trace.y.push(cols.y[i]);
+            });
+            // Copia del layout: Plotly escribe rangos calculados en el objeto que recibe
+            var layout = JSON.parse(JSON.stringify(store.layout));
+            if (rows.length === 0) {
+                delete layout.legend.title;  // px sin filas no titula la leyenda
+            }
+            return {data: traces, layout: layout};
+        }
+
+        // Top 30 por valor (desempate por orden de fila, como nlargest)
+        function table(store, cols, rows) {
+            if (rows.length === 0) {
+                return html('P', 'Sin jugadores');
+            }
+            var top = rows.slice().sort(function (a, b) {
+                return (cols.value[b] - cols.value[a]) || (a - b);
+            }).slice(0, 30);
+            var header = ['Jugador', 'Equipo', 'Pos', 'G', 'A', 'Valor (€)'].map(function (h) {
+                return html('Th', h, {colSpan: 1});
+            });
+            var body = top.map(function (i) {
+                return html('Tr', [
+                    html('Td', store.name[i]),
+                    html('Td', store.teams[cols.team[i]]),
+                    html('Td', store.positions[cols.position[i]]),
+                    html('Td', cols.goles[i]),
+                    html('Td', cols.asistencias[i]),
+                    html('Td', cols.value[i])
+                ]);
+            });
+            return {
+                type: 'Table',
+                namespace: 'dash_bootstrap_components',
+                props: {
+                    children: [html('Thead', [html('Tr', header)]), html('Tbody', body)],
+                    bordered: true, hover: true, size: 'sm', striped: true
+                }
+            };
+        }
+
+        return {
+            update: function (cluster, value, store) {
+                if (!store) {
+                    return [{}, ''];
+                }
+                var cols = columns(store);
+                var maxValue = value * 1e6;
+                var rows = [];
+                for (var i = 0; i < cols.x.length; i++) {
+                    if (cluster !== 'all' && cols.cluster[i] !== cluster) {
+                        continue;
+                    }
+                    if (value < 100 && cols.value[i] > maxValue) {
+                        continue;
+                    }
+                    rows.push(i);
+                }
+                return [scatter(store, cols, rows), table(store, cols, rows)];
+            }
+        };
+    })()
+});
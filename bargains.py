@@ -0,0 +1,99 @@
+# Football Analytics Pro - Motor de gangas con pesos ajustables
+#
+# model_anomaly.pkl trae una lista de gangas calculada una vez con la
+# fórmula fija (Goles × 3) + (Asist × 2) + (Partidos × 0.5). Aquí se puntúa
+# a todos los jugadores de una pasada vectorizada con los pesos que se
+# elijan: rendimiento (producto matriz-vector), ratio rendimiento / precio
+# y puntuación de anomalía del Isolation Forest del modelo. La tabla por
+# jugador depende solo de los pesos, así que se puede cachear por vector de
+# pesos; los filtros (posición, presupuesto) son máscaras sobre ella.
+
+import numpy as np
+import pandas as pd
+
+from indexes import POSITION_BITS
+
+# Pesos de la fórmula original, por columna del dataset
+DEFAULT_WEIGHTS = {'goles_totales': 3.0, 'asistencias_totales': 2.0, 'appearance': 0.5}
+
+# Features del Isolation Forest (si el modelo no guarda sus nombres)
+ANOMALY_FEATURES = ['rendimiento_score', 'current_value', 'age']
+
+# Mínimo de partidos para contar como ganga
+MIN_MATCHES = 10
+
+# Una ganga es un outlier del Isolation Forest con un ratio en el cuartil
+# superior del mercado (relativo: no depende de la escala de los pesos)
+RATIO_PERCENTILE = 75
+
+BARGAIN_COLUMNS = ['name', 'team', 'position', 'age', 'goles_totales', 'asistencias_totales',
+                   'appearance', 'current_value']
+
+
+def weight_vector(goals=None, assists=None, matches=None):
+    """Tupla de pesos (goles, asistencias, partidos) redondeada: sirve de clave de caché."""
+    defaults = list(DEFAULT_WEIGHTS.values())
+    given = [goals, assists, matches]
+    return tuple(round(float(d if w is None else w), 3) for w, d in zip(given, defaults))
+
+
+def performance_score(frame, weights=None):
+    """Rendimiento de cada jugador: goles, asistencias y partidos por el vector de pesos."""
+    weights = np.asarray(weights or weight_vector(), dtype=np.float64)
+    stats = np.column_stack([frame[col].to_numpy(dtype=np.float64) for col in DEFAULT_WEIGHTS])
+    return stats @ weights
+
+
+def score_table(model, frame, weights=None):
+    """rendimiento_score, ratio, anomaly_score y outlier de cada jugador de `frame`.
+
+    `model` es el dict de model_anomaly.pkl. El ratio es rendimiento por
+    millón de € (NaN sin valor de mercado); anomaly_score es el de
+    IsolationForest.score_samples (más bajo = más anómalo) y outlier
+    equivale a model.predict(...) == -1.
+    """
+    performance = performance_score(frame, weights)
+    value = frame['current_value'].to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(value > 0, performance / (value / 1e6), np.nan)
+
+    forest = model['model']
+    names = list(getattr(forest, 'feature_names_in_', ANOMALY_FEATURES))
+    X = pd.DataFrame({'rendimiento_score': performance, 'current_value': value,
+                      'age': frame['age'].to_numpy(dtype=np.float64)})[names]
+    # El Isolation Forest no admite NaN: esos jugadores quedan sin puntuar
+    finite = np.isfinite(X.to_numpy()).all(axis=1)
+    anomaly = np.full(len(X), np.nan)
+    if finite.any():
+        anomaly[finite] = forest.score_samples(X[finite])
+    return pd.DataFrame({
+        'rendimiento_score': performance,
+        'ratio': ratio,
+        'anomaly_score': anomaly,
+        'outlier': anomaly < forest.offset_,
+    }, index=frame.index)
+
+
+def bargain_ranking(frame, scores, position='all', max_value=None, min_matches=MIN_MATCHES,
+                    percentile=RATIO_PERCENTILE):
+    """Gangas de `frame` ordenadas por ratio, con los filtros de posición y presupuesto.
+
+    El umbral del ratio se calcula sobre todo el mercado (valor > 0 y
+    `min_matches` partidos), no sobre los filtrados: bajar el presupuesto
+    no convierte en ganga a quien antes no lo era.
+    """
+    ratio = scores['ratio'].to_numpy()
+    market = (frame['appearance'].to_numpy() >= min_matches) & np.isfinite(ratio)
+    if not market.any():
+        return frame.iloc[:0][BARGAIN_COLUMNS].join(scores.iloc[:0])
+    threshold = np.percentile(ratio[market], percentile)
+
+    mask = market & scores['outlier'].to_numpy() & (ratio >= threshold)
+    if position and position != 'all':
+        mask &= (frame['position_group'].to_numpy() & POSITION_BITS[position]) != 0
+    if max_value is not None:
+        mask &= frame['current_value'].to_numpy() <= max_value
+
+    candidates = np.flatnonzero(mask)
+    rows = candidates[np.argsort(-ratio[candidates], kind='stable')]
+    return frame.iloc[rows][BARGAIN_COLUMNS].join(scores.iloc[rows])
@@ -0,0 +1,330 @@
+# Football Analytics Pro - Snapshot columnar del dataset
+# Uso: python build_data.py
+#
+# Genera data/snapshot/ con las columnas numéricas agrupadas por tipo en bloques
+# .npy (una fila del bloque por columna), las de texto como UTF-8 separado por
+# líneas, las métricas derivadas ya calculadas y un manifest.json con el hash
+# SHA-256 del CSV de origen.
+# La app carga el snapshot directamente y solo vuelve al CSV si está obsoleto.
+#
+# Los bloques numéricos y las matrices de los modelos (top_indices/top_scores
+# del recomendador) se abren con mmap de solo lectura: todos los workers de
+# gunicorn comparten las mismas páginas de la caché del sistema operativo.
+# La tabla de jugadores del recomendador se guarda con el mismo formato
+# columnar, así que su .pkl no se deserializa nunca en el arranque.
+#
+# El dataset se compacta aquí (compact_table) antes de escribirlo: los
+# bloques mapeados ya tienen los tipos finales y los workers no copian las
+# columnas a su memoria privada al arrancar.
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from similarity_store import compact_recommendation
+
+CSV_PATH = 'data/final_data.csv'
+SNAPSHOT_DIR = 'data/snapshot'
+SNAPSHOT_VERSION = 3
+
+# Modelos cuyos arrays NumPy se exportan al snapshot para compartirlos con mmap
+SHARED_MODELS = {
+    'recommendation': 'data/model_recommendation_optimized.pkl',
+}
+
+# Transformación de cada modelo antes de guardarlo: (modelo, dataset) -> modelo
+MODEL_COMPACTORS = {
+    'recommendation': compact_recommendation,
+}
+
+# DATA_MMAP=0 desactiva el mmap y carga todo en memoria de cada worker
+USE_MMAP = os.environ.get('DATA_MMAP', '1') != '0'
+
+# COMPACT_TABLE=0 mantiene los tipos originales (object/int64/float64); se
+# aplica al construir el snapshot (y al cargar, solo si se lee el CSV)
+COMPACT_TABLE = os.environ.get('COMPACT_TABLE', '1') != '0'
+
+
+def file_hash(path):
+    """Hash SHA-256 del contenido de un fichero."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_stamp(path):
+    """(tamaño, mtime en ns) de un fichero: comprobación barata antes del hash."""
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def add_metrics(df):
+    """Añade las métricas derivadas (totales y por partido) al dataset."""
+    df['goles_totales'] = (df['goals'] * df['appearance']).round()
+    df['asistencias_totales'] = (df['assists'] * df['appearance']).round()
+    df['contribucion_total'] = df['goles_totales'] + df['asistencias_totales']
+    df['goles_por_partido'] = (df['goles_totales'] / df['appearance']).fillna(0).replace([np.inf, -np.inf], 0)
+    df['asistencias_por_partido'] = (df['asistencias_totales'] / df['appearance']).fillna(0).replace([np.inf, -np.inf], 0)
+    df['minutos_por_partido'] = (df['minutes played'] / df['appearance']).fillna(0).replace([np.inf, -np.inf], 0)
+    return df
+
+
+def read_csv(path=CSV_PATH):
+    """Lee el CSV original y calcula las métricas derivadas."""
+    df = pd.read_csv(path)
+    df.columns = df.columns.str.strip()
+    df = df.copy()  # Evitar ChainedAssignment warnings
+    return add_metrics(df)
+
+
+def split_model(model):
+    """Separa un modelo (dict) en arrays NumPy numéricos, DataFrames y resto."""
+    arrays = {k: v for k, v in model.items()
+              if isinstance(v, np.ndarray) and v.dtype != object}
+    frames = {k: v for k, v in model.items()
+              if isinstance(v, pd.DataFrame) and isinstance(v.index, pd.RangeIndex)
+              and v.index.start == 0 and v.index.step == 1}
+    rest = {k: v for k, v in model.items() if k not in arrays and k not in frames}
+    return arrays, frames, rest
+
+
+def compact_table(df, max_category_ratio=0.5):
+    """Versión compacta del dataset: categorías y enteros del menor tamaño.
+
+    - Texto con pocos valores distintos (team, position) → category.
+      Las columnas casi únicas (player, name) se dejan como texto: sus
+      códigos más las categorías ocuparían más que el original.
+    - Enteros → int8/int16/int32 según rango.
+    - Floats con valores enteros (goles_totales, ...) → entero pequeño.
+      El resto de floats se mantienen en float64 para no alterar valores.
+    """
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if s.dtype == object:
+            if s.nunique() <= max_category_ratio * len(s):
+                # Categorías en orden de aparición: value_counts() desempata igual
+                s = s.astype(pd.CategoricalDtype(s.unique()))
+        elif pd.api.types.is_integer_dtype(s):
+            s = pd.to_numeric(s, downcast='integer')
+        elif pd.api.types.is_float_dtype(s):
+            values = s.to_numpy()
+            if np.isfinite(values).all() and (values == np.round(values)).all():
+                s = pd.to_numeric(s.astype(np.int64), downcast='integer')
+        out[col] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def write_columns(df, path, prefix=''):
+    """Escribe las columnas de `df` en `path` y devuelve sus entradas del manifest.
+
+    Texto: un .txt UTF-8 por columna, una línea por fila. Numéricas: un único
+    .npy por tipo con una fila del bloque por columna (menos ficheros que
+    abrir y cabeceras que parsear). Categorías: los códigos van a los
+    bloques numéricos y las categorías, en orden, a un .txt aparte.
+    """
+    columns = []
+    blocks = {}
+    for i, col in enumerate(df.columns):
+        categories = None
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            categories = [str(c) for c in df[col].cat.categories]
+            if any('\n' in c for c in categories):
+                raise ValueError(f"La columna '{col}' contiene saltos de línea")
+            values = df[col].cat.codes.to_numpy()
+        else:
+            values = df[col].to_numpy()
+        if values.dtype == object:
+            # Texto: una línea por fila, se decodifica de golpe con split()
+            text = [str(v) for v in values]
+            if any('\n' in v for v in text):
+                raise ValueError(f"La columna '{col}' contiene saltos de línea")
+            fname = f"{prefix}col_{i:02d}.txt"
+            with open(os.path.join(path, fname), 'w', encoding='utf-8') as f:
+                f.write('\n'.join(text))
+            columns.append({'name': col, 'file': fname, 'dtype': 'str'})
+        else:
+            fname = f"{prefix}block_{values.dtype.name}.npy"
+            block = blocks.setdefault(fname, [])
+            entry = {'name': col, 'file': fname, 'row': len(block), 'dtype': values.dtype.str}
+            if categories is not None:
+                entry['categories'] = f"{prefix}col_{i:02d}.categories.txt"
+                with open(os.path.join(path, entry['categories']), 'w', encoding='utf-8') as f:
+                    f.write('\n'.join(categories))
+            columns.append(entry)
+            block.append(values)
+
+    for fname, arrays in blocks.items():
+        np.save(os.path.join(path, fname), np.vstack(arrays), allow_pickle=False)
+    return columns
+
+
+def write_snapshot(df, source_hash, path=SNAPSHOT_DIR, models=None, memory=None):
+    """Escribe el dataset en bloques columnares tipados más un manifest.
+
+    `memory` ({'csv_bytes', 'compact_bytes'}) es la memoria de la tabla
+    antes y después de compactarla; se guarda en el manifest.
+
+    `models` es un dict {nombre: (dict del modelo, ruta del .pkl)}: sus
+    arrays se guardan como .npy sueltos, sus DataFrames con el mismo formato
+    columnar que el dataset y el resto (scaler, lista de features) en un
+    .pkl pequeño.
+
+    Se escribe en un directorio temporal y se renombra al final para que
+    otro proceso nunca vea un snapshot a medio escribir.
+    """
+    tmp = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    columns = write_columns(df, tmp)
+
+    model_entries = {}
+    for name, (model, pkl_path) in (models or {}).items():
+        arrays, frames, rest = split_model(model)
+        entry = {'source_sha256': file_hash(pkl_path), 'source_stamp': file_stamp(pkl_path),
+                 'arrays': {}, 'frames': {}, 'rest': f"{name}.rest.pkl"}
+        for key, values in arrays.items():
+            fname = f"{name}.{key}.npy"
+            np.save(os.path.join(tmp, fname), np.ascontiguousarray(values), allow_pickle=False)
+            entry['arrays'][key] = fname
+        for key, frame in frames.items():
+            entry['frames'][key] = write_columns(frame, tmp, prefix=f"{name}.{key}.")
+        with open(os.path.join(tmp, entry['rest']), 'wb') as f:
+            pickle.dump(rest, f, protocol=pickle.HIGHEST_PROTOCOL)
+        model_entries[name] = entry
+
+    manifest = {
+        'version': SNAPSHOT_VERSION,
+        'source': os.path.basename(CSV_PATH),
+        'source_sha256': source_hash,
+        'rows': len(df),
+        'columns': columns,
+        'memory': memory,
+        'models': model_entries,
+    }
+    with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    return manifest
+
+
+def read_manifest(path=SNAPSHOT_DIR):
+    """Devuelve el manifest del snapshot o None si no existe."""
+    try:
+        with open(os.path.join(path, 'manifest.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_columns(path, columns, mmap=USE_MMAP):
+    """Reconstruye un DataFrame a partir de sus entradas del manifest.
+
+    Con `mmap` las columnas numéricas son vistas de solo lectura sobre los
+    bloques mapeados; las operaciones de pandas que las modifican copian.
+    """
+    blocks = {}
+    data = {}
+    for col in columns:
+        fpath = os.path.join(path, col['file'])
+        if col['dtype'] == 'str':
+            with open(fpath, encoding='utf-8') as f:
+                data[col['name']] = np.array(f.read().split('\n'), dtype=object)
+        else:
+            if col['file'] not in blocks:
+                blocks[col['file']] = np.load(fpath, mmap_mode='r' if mmap else None,
+                                              allow_pickle=False)
+            values = blocks[col['file']][col['row']]
+            if 'categories' in col:
+                with open(os.path.join(path, col['categories']), encoding='utf-8') as f:
+                    values = pd.Categorical.from_codes(values, f.read().split('\n'))
+            data[col['name']] = values
+    return pd.DataFrame(data, copy=False)
+
+
+def read_snapshot(path=SNAPSHOT_DIR, expected_hash=None, mmap=USE_MMAP):
+    """Carga el snapshot; devuelve None si falta o no coincide el hash."""
+    manifest = read_manifest(path)
+    if manifest is None or manifest.get('version') != SNAPSHOT_VERSION:
+        return None
+    if expected_hash is not None and manifest.get('source_sha256') != expected_hash:
+        return None
+    return read_columns(path, manifest['columns'], mmap)
+
+
+def load_dataset(csv_path=CSV_PATH, snapshot_path=SNAPSHOT_DIR):
+    """Carga el dataset desde el snapshot si está al día, si no desde el CSV.
+
+    Devuelve (df, origen) con origen 'snapshot' o 'csv'.
+    """
+    df = read_snapshot(snapshot_path, expected_hash=file_hash(csv_path))
+    if df is not None:
+        return df, 'snapshot'
+    return read_csv(csv_path), 'csv'
+
+
+def load_model(name, pkl_path, snapshot_path=SNAPSHOT_DIR, mmap=USE_MMAP):
+    """Carga un modelo compartido: arrays con mmap si el snapshot está al día.
+
+    Si el snapshot no tiene el modelo o el .pkl ha cambiado, lo deserializa
+    completo desde `pkl_path` como antes. Si tamaño y mtime del .pkl
+    coinciden con los del build no se recalcula el hash: el arranque no
+    depende del tamaño del .pkl.
+    """
+    manifest = read_manifest(snapshot_path)
+    if manifest is None or manifest.get('version') != SNAPSHOT_VERSION:
+        manifest = None
+    entry = (manifest or {}).get('models', {}).get(name)
+    if entry is None or (entry.get('source_stamp') != file_stamp(pkl_path)
+                         and entry['source_sha256'] != file_hash(pkl_path)):
+        with open(pkl_path, 'rb') as f:
+            return pickle.load(f)
+
+    with open(os.path.join(snapshot_path, entry['rest']), 'rb') as f:
+        model = pickle.load(f)
+    for key, fname in entry['arrays'].items():
+        model[key] = np.load(os.path.join(snapshot_path, fname),
+                             mmap_mode='r' if mmap else None, allow_pickle=False)
+    for key, columns in entry['frames'].items():
+        model[key] = read_columns(snapshot_path, columns, mmap)
+    return model
+
+
+def main():
+    start = time.perf_counter()
+    source_hash = file_hash(CSV_PATH)
+    df = read_csv(CSV_PATH)
+
+    models = {}
+    for name, pkl_path in SHARED_MODELS.items():
+        if os.path.exists(pkl_path):
+            with open(pkl_path, 'rb') as f:
+                model = pickle.load(f)
+            if name in MODEL_COMPACTORS:
+                model = MODEL_COMPACTORS[name](model, df)
+            models[name] = (model, pkl_path)
+
+    memory = None
+    if COMPACT_TABLE:
+        csv_bytes = int(df.memory_usage(deep=True).sum())
+        df = compact_table(df)
+        memory = {'csv_bytes': csv_bytes, 'compact_bytes': int(df.memory_usage(deep=True).sum())}
+        print(f"💾 Tabla compacta: {memory['csv_bytes']/1e6:.1f} MB → {memory['compact_bytes']/1e6:.1f} MB")
+    manifest = write_snapshot(df, source_hash, models=models, memory=memory)
+    print(f"✅ Snapshot: {manifest['rows']} filas, {len(manifest['columns'])} columnas, "
+          f"{len(models)} modelos → {SNAPSHOT_DIR} ({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+# Football Analytics Pro - Clustering incremental de estilos de juego
+#
+# El modelo de clustering trae su scaler, su PCA, los centroides de K-Means
+# y una foto fija de los jugadores con los que se entrenó (model['data']).
+# Aquí se recalculan las features de estilo a partir del dataset actual y,
+# en una sola pasada vectorizada, cada jugador se escala, se proyecta al
+# plano 2D y se asigna al centroide más cercano: los jugadores nuevos o con
+# estadísticas cambiadas aparecen en /clustering sin reentrenar.
+#
+# Cuando cambia el dataset, un hilo reajusta los centroides con K-Means
+# por mini-lotes partiendo de los actuales (cada uno conserva su identidad
+# y su etiqueta de estilo); el scaler y el PCA no cambian, así que el mapa
+# 2D sigue siendo comparable.
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# Jugadores que entran en el clustering (los mismos del entrenamiento)
+MIN_APPEARANCES = 15
+
+# Línea de cada posición (de defensa a ataque); el resto cuenta como 3
+POSITION_LINE = {
+    'Defender Centre-Back': 1,
+    'Defender Left-Back': 1,
+    'Defender Right-Back': 1,
+    'midfield-DefensiveMidfield': 2,
+    'midfield-CentralMidfield': 3,
+    'midfield-AttackingMidfield': 4,
+    'Attack Centre-Forward': 6,
+}
+DEFAULT_LINE = 3
+
+# Un jugador cuya proyección no se mueve más que esto se considera sin cambios
+UNCHANGED_TOLERANCE = 1e-9
+
+
+def eligible_rows(frame):
+    """Filas de `frame` que se agrupan: jugadores de campo con MIN_APPEARANCES partidos."""
+    outfield = ~frame['position'].astype(str).str.contains('Goalkeeper').to_numpy()
+    return np.flatnonzero((frame['appearance'].to_numpy() >= MIN_APPEARANCES) & outfield)
+
+
+def style_features(frame):
+    """Features de estilo del modelo (por 90 minutos, reparto goles/asistencias, línea)."""
+    minutes = frame['minutes played'].to_numpy(dtype=np.float64)
+    goals = frame['goles_totales'].to_numpy(dtype=np.float64)
+    assists = frame['asistencias_totales'].to_numpy(dtype=np.float64)
+    cards = (frame['yellow cards'].to_numpy(dtype=np.float64)
+             + 3 * frame['red cards'].to_numpy(dtype=np.float64))
+    return pd.DataFrame({
+        'goles_por_90': goals / minutes * 90,
+        'asist_por_90': assists / minutes * 90,
+        'ratio_goleador': goals / (goals + assists + 0.01),
+        'ratio_asistente': assists / (goals + assists + 0.01),
+        'tarjetas_por_90': cards / minutes * 90,
+        'linea_posicion': frame['position'].astype(str).map(POSITION_LINE).fillna(DEFAULT_LINE).to_numpy(),
+    }, index=frame.index)
+
+
+def nearest_centers(X, centers):
+    """Centroide más cercano (distancia euclídea) de cada fila, como KMeans.predict."""
+    return np.argmin(((X[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2), axis=1)
+
+
+def scaled_features(model, frame):
+    """Features de estilo de `frame` escaladas con el scaler del modelo."""
+    features = style_features(frame)[list(model['features'])]
+    return model['scaler'].transform(features)
+
+
+def sync_clusters(model, frame, centers=None):
+    """Modelo con model['data'] al día con `frame`, en una sola pasada.
+
+    Los jugadores que ya estaban y cuya proyección no ha cambiado conservan
+    sus coordenadas guardadas; los nuevos y los cambiados se proyectan con
+    el PCA del modelo. Todos se asignan a `centers` (por defecto los del
+    modelo). model['sync'] resume cuántos son nuevos, cambiados o bajas.
+    """
+    stored = model['data']
+    sub = frame.iloc[eligible_rows(frame)]
+    X = scaled_features(model, sub)
+    xy = model['pca'].transform(X)
+    centers = model['model'].cluster_centers_ if centers is None else centers
+
+    fresh = pd.DataFrame({col: sub[col].to_numpy() for col in stored.columns if col in sub.columns})
+    fresh['cluster'] = nearest_centers(X, centers)
+    fresh['pca_x'], fresh['pca_y'] = xy[:, 0], xy[:, 1]
+    fresh = fresh[stored.columns].astype(stored.dtypes.to_dict())
+
+    # Un nombre y equipo repetido se compara con su primera fila guardada
+    keys = pd.Index(stored['name'].astype(str) + '|' + stored['team'].astype(str))
+    fresh_keys = fresh['name'].astype(str) + '|' + fresh['team'].astype(str)
+    first = np.flatnonzero(~keys.duplicated(keep='first'))
+    previous = keys[first].get_indexer(fresh_keys)
+    known = previous >= 0
+    previous[known] = first[previous[known]]
+    old_xy = np.full_like(xy, np.nan)
+    old_xy[known] = stored[['pca_x', 'pca_y']].to_numpy()[previous[known]]
+    unchanged = known & (np.abs(xy - old_xy) <= UNCHANGED_TOLERANCE).all(axis=1)
+    fresh.loc[unchanged, ['pca_x', 'pca_y']] = old_xy[unchanged]
+
+    synced = dict(model)
+    synced['data'] = fresh
+    synced['centers'] = centers
+    synced['sync'] = {
+        'players': len(fresh),
+        'new': int((~known).sum()),
+        'changed': int((known & ~unchanged).sum()),
+        'removed': int((~keys.isin(fresh_keys)).sum()),
+    }
+    return synced
+
+
+def minibatch_refit(centers, X, batch_size=1024, epochs=1, seed=0):
+    """Centroides reajustados con K-Means por mini-lotes a partir de `centers`.
+
+    Cada centroide empieza con el peso de los jugadores que tiene asignados,
+    así que se desplaza hacia los datos actuales sin olvidar el ajuste
+    anterior ni cambiar de índice (las etiquetas de estilo siguen valiendo).
+    """
+    centers = np.array(centers, dtype=np.float64)
+    weights = np.bincount(nearest_centers(X, centers), minlength=len(centers)).astype(np.float64)
+    rng = np.random.default_rng(seed)
+    n_batches = max(1, int(np.ceil(len(X) / batch_size)))
+    for _ in range(epochs):
+        for batch in np.array_split(rng.permutation(len(X)), n_batches):
+            points = X[batch]
+            nearest = nearest_centers(points, centers)
+            counts = np.bincount(nearest, minlength=len(centers))
+            sums = np.zeros_like(centers)
+            np.add.at(sums, nearest, points)
+            weights += counts
+            moved = counts > 0
+            centers[moved] += (sums[moved] - counts[moved, None] * centers[moved]) / weights[moved, None]
+    return centers
+
+
+class ClusterService:
+    """Centroides vigentes del clustering y su reajuste en segundo plano.
+
+    `generation` cambia con cada reajuste: quien guarde asignaciones debe
+    rehacerlas cuando cambie.
+    """
+
+    def __init__(self, interval=3600):
+        self.interval = interval
+        self.generation = 0
+        self.refits = 0
+        self.last_refit = None
+        self.last_seconds = None
+        self.last_error = None
+        self._base = None
+        self._centers = None
+        self._fitted_version = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def centers(self, model):
+        """Centroides reajustados si son de este modelo; si no, los del modelo."""
+        with self._lock:
+            if self._base is model['model']:
+                return self._centers
+        return model['model'].cluster_centers_
+
+    def refit(self, model, frame):
+        start = time.perf_counter()
+        X = scaled_features(model, frame.iloc[eligible_rows(frame)])
+        centers = minibatch_refit(self.centers(model), X)
+        with self._lock:
+            self._base, self._centers = model['model'], centers
+            self.generation += 1
+            self.refits += 1
+            self.last_refit = time.time()
+            self.last_seconds = time.perf_counter() - start
+        print(f"🎨 Centroides de estilos reajustados con {len(X)} jugadores ({self.last_seconds:.2f}s)")
+
+    def check(self, source):
+        """Reajusta si el dataset ha cambiado desde el último ajuste.
+
+        `source()` devuelve (modelo, dataset, versión del dataset) o None si
+        el modelo aún no está cargado. La primera versión vista es la del
+        entrenamiento y no se reajusta.
+        """
+        current = source()
+        if current is None:
+            return False
+        model, frame, version = current
+        if self._fitted_version is None:
+            self._fitted_version = version
+        if version == self._fitted_version:
+            return False
+        try:
+            self.refit(model, frame)
+            self._fitted_version = version
+            self.last_error = None
+        except Exception as e:
+            self.last_error = repr(e)
+            print(f"⚠️ Reajuste de estilos fallido: {e!r}")
+        return True
+
+    def _run(self, source):
+        while True:
+            self.check(source)
+            time.sleep(self.interval)
+
+    def start(self, source):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(source,),
+                                            name='cluster-refit', daemon=True)
+            self._thread.start()
+
+    def status(self):
+        return {'interval': self.interval, 'generation': self.generation, 'refits': self.refits,
+                'last_refit': self.last_refit, 'last_seconds': self.last_seconds,
+                'last_error': self.last_error}
@@ -0,0 +1,177 @@
+# Football Analytics Pro - Compresión de respuestas y estáticos precomprimidos
+#
+# Las respuestas de los callbacks son JSON muy repetitivo (nombres de
+# equipos, posiciones, plantillas) y se comprimen con brotli o gzip según
+# lo que acepte el navegador. Los estáticos (assets/ y los bundles JS de
+# Dash, Plotly incluido) se comprimen una vez en el build, al máximo nivel,
+# y se guardan en data/compressed/ con el hash de su contenido como nombre.
+#
+# Uso en el build:  python compression.py
+
+import gzip
+import hashlib
+import os
+import pkgutil
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # sin brotli solo se sirve gzip
+    brotli = None
+
+COMPRESSED_DIR = 'data/compressed'
+MIN_BYTES = 1024
+
+COMPRESSIBLE = ('application/json', 'application/javascript', 'text/javascript',
+                'text/html', 'text/css', 'text/plain', 'image/svg+xml')
+
+# Niveles: rápidos para respuestas dinámicas, máximos para estáticos (build)
+DYNAMIC_LEVEL = {'br': 5, 'gzip': 6}
+STATIC_LEVEL = {'br': 11, 'gzip': 9}
+EXTENSIONS = {'br': 'br', 'gzip': 'gz'}
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def accepted_encoding(header):
+    """Mejor codificación de la cabecera Accept-Encoding que se puede servir (o None)."""
+    accepted = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in available_encodings():
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding, level=None):
+    level = DYNAMIC_LEVEL[encoding] if level is None else level
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def is_compressible(mimetype):
+    return mimetype in COMPRESSIBLE or (mimetype or '').startswith('text/')
+
+
+class StaticCompressor:
+    """Versiones comprimidas de los estáticos, por contenido.
+
+    Se buscan en `directory` (generadas en el build con `precompress`); si
+    falta alguna se comprime al vuelo con el nivel rápido. En ambos casos
+    queda en memoria por hash del contenido y codificación (no por URL: un
+    query string nuevo no crea otra copia), en una LRU de `max_bytes`.
+    """
+
+    def __init__(self, directory=COMPRESSED_DIR, max_bytes=32 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, digest, encoding):
+        return os.path.join(self.directory, f"{digest}.{EXTENSIONS[encoding]}")
+
+    def get(self, body, encoding):
+        digest = hashlib.sha1(body).hexdigest()
+        key = (digest, encoding)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        try:
+            with open(self._path(digest, encoding), 'rb') as f:
+                data = f.read()
+            self.hits += 1
+        except OSError:
+            data = compress(body, encoding)
+            self.misses += 1
+        self._put(key, data)
+        return data
+
+    def _put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                return
+            self._memory[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, old = self._memory.popitem(last=False)
+                self._bytes -= len(old)
+                self.evictions += 1
+
+    def precompress(self, body):
+        """Escribe las versiones comprimidas de `body` (nivel máximo); devuelve los bytes ahorrados."""
+        os.makedirs(self.directory, exist_ok=True)
+        digest = hashlib.sha1(body).hexdigest()
+        saved = 0
+        for encoding in available_encodings():
+            path = self._path(digest, encoding)
+            if not os.path.exists(path):
+                data = compress(body, encoding, STATIC_LEVEL[encoding])
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(data)
+                os.replace(path + '.tmp', path)
+            saved = max(saved, len(body) - os.path.getsize(path))
+        return saved
+
+    def status(self):
+        return {'encodings': list(available_encodings()), 'files': len(self._memory),
+                'bytes': self._bytes, 'max_bytes': self.max_bytes, 'evictions': self.evictions,
+                'precompressed_hits': self.hits, 'compressed_on_the_fly': self.misses}
+
+
+def static_files(dash_app):
+    """(nombre, contenido) de los assets y de todos los bundles que Dash puede servir."""
+    client = dash_app.server.test_client()
+    client.get('/')  # registra los recursos de todos los componentes (también los asíncronos)
+
+    for namespace, paths in dash_app.registered_paths.items():
+        for rel_path in sorted(paths):
+            if rel_path.endswith(('.js', '.css')):
+                yield f"{namespace}/{rel_path}", pkgutil.get_data(namespace, rel_path)
+
+    folder = dash_app.config.assets_folder
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if name.endswith(('.js', '.css')):
+                path = os.path.join(root, name)
+                with open(path, 'rb') as f:
+                    yield os.path.relpath(path, folder), f.read()
+
+
+def main():
+    # El build solo necesita el layout: sin precarga de modelos ni vigilancia de ficheros
+    os.environ.setdefault('MODEL_WARMUP', '0')
+    os.environ.setdefault('DATA_WATCH_INTERVAL', '0')
+    import app
+
+    print("🗜️ Precomprimiendo estáticos...")
+    compressor = StaticCompressor()
+    total = saved = 0
+    for name, body in static_files(app.app):
+        total += len(body)
+        saved += compressor.precompress(body)
+    print(f"✅ {total / 1e6:.1f} MB → {(total - saved) / 1e6:.1f} MB en {compressor.directory}/")
+
+
+if __name__ == '__main__':
+    main()
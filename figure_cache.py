@@ -0,0 +1,87 @@
+# Football Analytics Pro - Caché LRU de figuras ya serializadas
+#
+# Las gráficas del dashboard y de rendimiento dependen solo de unos pocos
+# inputs (tipo de gráfico, equipo, posición, mínimo de partidos), así que
+# se guardan como JSON de Plotly y una vista repetida no vuelve a pasar
+# por Plotly Express. Las entradas llevan la versión del dataset: al
+# recargar los datos la caché se vacía sola.
+
+import json
+import threading
+from collections import OrderedDict
+
+
+class FigureCache:
+    """LRU de figuras serializadas, limitada por bytes totales."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, serialize=None, deserialize=None):
+        self.max_bytes = max_bytes
+        # Cómo se guarda la figura (por defecto el JSON de Plotly) y cómo se recupera
+        self.serialize = serialize or (lambda fig: fig.to_json())
+        self.deserialize = deserialize or json.loads
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, version, build):
+        """Figura (dict) de `key`; si no está, `build()` la crea y se guarda.
+
+        `version` es la versión del dataset con la que se construye: si
+        es más nueva, todas las entradas anteriores se descartan; si es más
+        antigua (callback iniciado antes de una recarga) no se usa la caché.
+        """
+        with self._lock:
+            if self._version is None or version > self._version:
+                self._clear()
+                self._version = version
+            fig_json = self._entries.get(key) if version == self._version else None
+            if fig_json is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if fig_json is None:
+            fig_json = self.serialize(build())
+            self._put(key, version, fig_json)
+        return self.deserialize(fig_json)
+
+    def _put(self, key, version, fig_json):
+        size = len(fig_json)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            # Otra versión del dataset llegó mientras se construía la figura
+            if version != self._version or key in self._entries:
+                return
+            self._entries[key] = fig_json
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, old = self._entries.popitem(last=False)
+                self._bytes -= len(old)
+                self.evictions += 1
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / total, 3) if total else None,
+            'version': self._version,
+        }
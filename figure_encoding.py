@@ -0,0 +1,262 @@
+# Football Analytics Pro - Serialización compacta de figuras
+#
+# Las figuras de Plotly Express llevan mucho peso que el navegador no
+# necesita: arrays numéricos en float64 como texto, columnas de hover
+# repetidas en cada punto, atributos con su valor por defecto y la
+# plantilla completa (~7.5 KB) en cada gráfica. slim_figure() devuelve el
+# dict que se envía al navegador sin nada de eso; la gráfica se ve igual.
+# La plantilla no se puede quitar (Plotly.js no tiene una por defecto que
+# se fije una vez para toda la app): cada figura lleva una copia recortada
+# a sus tipos de traza (~2 KB).
+
+import base64
+import json
+import re
+import threading
+from functools import lru_cache
+
+import numpy as np
+import plotly.io as pio
+
+from plotly.utils import PlotlyJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # sin orjson se serializa con el json estándar
+    orjson = None
+
+# Arrays más cortos no compensan la codificación binaria
+TYPED_MIN_LENGTH = 16
+
+# Atributos de traza que Plotly.js ya toma por defecto
+TRACE_DEFAULTS = {'xaxis': 'x', 'yaxis': 'y', 'showlegend': True}
+MARKER_DEFAULTS = {'symbol': 'circle'}
+DATA_ATTRS = ('x', 'y', 'z', 'values', 'customdata')
+
+# Plantillas que se reconocen y se recortan; las secciones de mapas, 3D y
+# ejes polares no afectan a ninguna gráfica de la app
+TEMPLATES = ('plotly_white', 'plotly')
+TEMPLATE_UNUSED_LAYOUT = ('geo', 'mapbox', 'polar', 'scene', 'ternary')
+
+INT_TYPES = [(np.int8, 'int8'), (np.uint8, 'uint8'), (np.int16, 'int16'),
+             (np.uint16, 'uint16'), (np.int32, 'int32'), (np.uint32, 'uint32')]
+
+CUSTOMDATA_REF = re.compile(r'%\{customdata\[(\d+)\]([^}]*)\}')
+
+
+def _numeric_array(values):
+    """`values` como array float64 si es una lista numérica (None → NaN); si no, None."""
+    try:
+        arr = np.asarray(values)
+    except ValueError:  # listas de distinta longitud
+        return None
+    if arr.dtype.kind in 'iuf':
+        return arr.astype(np.float64)
+    if arr.dtype.kind == 'O' and all(v is None or (isinstance(v, (int, float)) and not isinstance(v, bool))
+                                     for v in arr.flat):
+        return np.where(arr == None, np.nan, arr).astype(np.float64)  # noqa: E711
+    return None
+
+
+def typed_array(values):
+    """Lista numérica como {'dtype', 'bdata'} (typed array de Plotly.js), o None.
+
+    Los enteros van en el tipo más pequeño que los contiene y el resto en
+    float32, que basta para dibujar y para el hover. En 2D añade 'shape'.
+    """
+    arr = _numeric_array(values)
+    if arr is None or arr.ndim not in (1, 2) or arr.size < TYPED_MIN_LENGTH:
+        return None
+
+    name = 'float32'
+    if np.isfinite(arr).all() and (arr == np.round(arr)).all():
+        lo, hi = arr.min(), arr.max()
+        name = next((n for t, n in INT_TYPES if np.iinfo(t).min <= lo and hi <= np.iinfo(t).max), 'float64')
+    arr = np.ascontiguousarray(arr.astype(name))
+
+    encoded = {'dtype': name, 'bdata': base64.b64encode(arr.tobytes()).decode()}
+    if arr.ndim == 2:
+        encoded['shape'] = f"{arr.shape[0]},{arr.shape[1]}"
+    return encoded
+
+
+def inline_constant_customdata(trace):
+    """Columnas de customdata con el mismo texto en todos los puntos → hovertemplate.
+
+    Plotly Express repite p. ej. la posición en cada punto aunque ya es el
+    nombre de la traza; aquí se escribe una sola vez en la plantilla del hover.
+    """
+    template = trace.get('hovertemplate')
+    if not template or trace.get('customdata') is None:
+        return
+    custom = np.asarray(trace['customdata'], dtype=object)
+    if custom.ndim != 2 or len(custom) == 0:
+        return
+
+    constant = {}
+    for col in range(custom.shape[1]):
+        first = custom[0, col]
+        if isinstance(first, str) and (custom[:, col] == first).all():
+            constant[col] = first
+    # Solo se sustituyen referencias sin formato (%{customdata[1]}, no %{customdata[1]:.2f})
+    for ref in CUSTOMDATA_REF.finditer(template):
+        if ref.group(2):
+            constant.pop(int(ref.group(1)), None)
+    if not constant:
+        return
+
+    keep = [col for col in range(custom.shape[1]) if col not in constant]
+    renumber = {old: new for new, old in enumerate(keep)}
+
+    def replace(ref):
+        col = int(ref.group(1))
+        if col in constant:
+            return constant[col]
+        return f'%{{customdata[{renumber[col]}]{ref.group(2)}}}'
+
+    trace['hovertemplate'] = CUSTOMDATA_REF.sub(replace, template)
+    if keep:
+        trace['customdata'] = custom[:, keep]
+    else:
+        del trace['customdata']
+
+
+def slim_trace(trace, shared_groups=()):
+    """Copia de la traza sin lo que Plotly.js no necesita y con sus arrays numéricos codificados."""
+    trace = dict(trace)
+    inline_constant_customdata(trace)
+    for attr, default in TRACE_DEFAULTS.items():
+        if trace.get(attr) == default:
+            del trace[attr]
+    # Un grupo de leyenda con una sola traza no agrupa nada
+    if 'legendgroup' in trace and trace['legendgroup'] not in shared_groups:
+        del trace['legendgroup']
+    if trace.get('type') == 'scatter' and trace.get('orientation') == 'v' and 'stackgroup' not in trace:
+        del trace['orientation']
+
+    marker = trace.get('marker')
+    if isinstance(marker, dict):
+        marker = trace['marker'] = dict(marker)
+        for attr, default in MARKER_DEFAULTS.items():
+            if marker.get(attr) == default:
+                del marker[attr]
+        for attr in ('size', 'color'):
+            if attr in marker:
+                marker[attr] = typed_array(marker[attr]) or marker[attr]
+    for attr in DATA_ATTRS:
+        if attr in trace:
+            trace[attr] = typed_array(trace[attr]) or trace[attr]
+    return trace
+
+
+@lru_cache(maxsize=None)
+def _template(name):
+    """Plantilla `name` tal como aparece en una figura ya serializada."""
+    return pio.json.from_json_plotly(pio.json.to_json_plotly(pio.templates[name]))
+
+
+@lru_cache(maxsize=64)
+def _slim_template_json(name, trace_types):
+    template = dict(_template(name))
+    data = template.get('data', {})
+    template['data'] = {t: data[t] for t in trace_types if t in data}
+    template['layout'] = {k: v for k, v in template.get('layout', {}).items()
+                          if k not in TEMPLATE_UNUSED_LAYOUT}
+    return pio.json.to_json_plotly(template)
+
+
+def slim_template(template, trace_types):
+    """Plantilla conocida recortada a los tipos de traza de la figura.
+
+    El recorte se serializa una vez por plantilla y combinación de tipos;
+    cada figura recibe su propia copia.
+    """
+    for name in TEMPLATES:
+        if template == _template(name):
+            return pio.json.from_json_plotly(_slim_template_json(name, tuple(sorted(trace_types))))
+    return template
+
+
+def slim_figure(fig):
+    """Dict listo para enviar de `fig` (go.Figure o dict), sin peso innecesario.
+
+    No modifica `fig`: las trazas y el layout se copian antes de tocarlos.
+    """
+    if isinstance(fig, dict):
+        traces, layout = fig.get('data', []), fig.get('layout', {})
+    else:
+        # Propiedades ya validadas de la figura, sin la copia profunda de to_dict()
+        traces, layout = fig._data, fig._layout
+
+    groups = [t['legendgroup'] for t in traces if t.get('legendgroup')]
+    shared_groups = {g for g in groups if groups.count(g) > 1}
+    traces = [slim_trace(trace, shared_groups) for trace in traces]
+
+    layout = dict(layout)
+    if 'template' in layout:
+        layout['template'] = slim_template(layout['template'], {t.get('type', 'scatter') for t in traces})
+    return {'data': traces, 'layout': layout}
+
+
+def _to_builtin(obj):
+    """Lo que orjson no serializa por sí mismo (arrays de objetos, fechas...)."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return PlotlyJSONEncoder().default(obj)
+
+
+def dumps(obj):
+    """JSON (str) de `obj`: orjson directo si está instalado, si no el encoder de Plotly.
+
+    Se evita el motor 'orjson' de plotly.io, que antes recorre todo el
+    objeto en Python para limpiarlo y con figuras grandes es más lento.
+    """
+    if orjson is None:
+        return json.dumps(obj, cls=PlotlyJSONEncoder)
+    return orjson.dumps(obj, default=_to_builtin,
+                        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+
+
+def loads(text):
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def figure_json(fig):
+    """JSON (str) de la figura reducida (lo que guarda la caché de figuras)."""
+    return dumps(slim_figure(fig))
+
+
+class PayloadStats:
+    """Bytes y tiempo en servidor de cada callback, agrupados por su output."""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, output, size, seconds, wire_size=None):
+        """`size` es el JSON generado; `wire_size` lo que se envía (comprimido)."""
+        with self._lock:
+            entry = self._stats.setdefault(output, {'calls': 0, 'bytes': 0, 'wire_bytes': 0,
+                                                    'max_bytes': 0, 'seconds': 0.0})
+            entry['calls'] += 1
+            entry['bytes'] += size
+            entry['wire_bytes'] += size if wire_size is None else wire_size
+            entry['max_bytes'] = max(entry['max_bytes'], size)
+            entry['seconds'] += seconds
+
+    def stats(self):
+        with self._lock:
+            entries = sorted(self._stats.items(), key=lambda kv: -kv[1]['bytes'])
+            return {
+                output: {
+                    'calls': e['calls'],
+                    'avg_bytes': round(e['bytes'] / e['calls']),
+                    'avg_wire_bytes': round(e['wire_bytes'] / e['calls']),
+                    'max_bytes': e['max_bytes'],
+                    'total_bytes': e['bytes'],
+                    'avg_ms': round(e['seconds'] / e['calls'] * 1000, 1),
+                }
+                for output, e in entries
+            }
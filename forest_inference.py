@@ -0,0 +1,254 @@
+# Football Analytics Pro - Random Forest de valoración en arrays planos
+# Uso: python forest_inference.py
+#
+# RandomForestRegressor.predict paga por llamada la validación de la
+# entrada, el reparto con joblib y un bucle en Python por árbol: predecir un
+# jugador cuesta milisegundos. Aquí el bosque se exporta a arrays NumPy
+# contiguos (feature, umbral, hijos y valor de cada nodo de todos los
+# árboles) y se recorre de forma vectorizada: todos los árboles y todas las
+# filas avanzan un nivel por iteración.
+#
+# El fichero (data/model_valuation.npz) ocupa una fracción del .pkl y da las
+# mismas predicciones: al exportarlo se comprueba contra sklearn.
+
+import os
+import pickle
+import time
+
+import numpy as np
+
+from build_data import file_hash, file_stamp
+
+FOREST_PKL = 'data/model_valuation.pkl'
+FOREST_FLAT = 'data/model_valuation.npz'
+FLAT_VERSION = 1
+
+# Máximo de celdas (filas × árboles) por bloque al recorrer el bosque
+CHUNK_CELLS = 1 << 20
+
+# Diferencia relativa máxima admitida frente a sklearn al exportar
+EQUIVALENCE_RTOL = 1e-12
+
+
+def floor_float32(values):
+    """Mayor float32 <= cada valor.
+
+    sklearn compara la entrada en float32 con umbrales float64; para un x
+    float32, x <= t equivale exactamente a x <= floor_float32(t).
+    """
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def export_forest(model):
+    """Arrays planos de un RandomForestRegressor (o cualquier bosque de regresión de una salida).
+
+    Los nodos de todos los árboles van seguidos; `children` alterna hijo
+    izquierdo y derecho de cada nodo y las hojas apuntan a sí mismas, así
+    que el recorrido puede dar siempre `max_depth` pasos sin ramas.
+    """
+    if getattr(model, 'n_outputs_', 1) != 1:
+        raise ValueError("Solo se exportan bosques de regresión con una salida")
+
+    trees = [est.tree_ for est in model.estimators_]
+    sizes = np.array([t.node_count for t in trees])
+    offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+
+    feature, threshold, children, value, missing_left = [], [], [], [], []
+    for tree, offset in zip(trees, offsets):
+        nodes = np.arange(tree.node_count)
+        leaf = tree.children_left == -1
+        left = np.where(leaf, nodes, tree.children_left) + offset
+        right = np.where(leaf, nodes, tree.children_right) + offset
+        feature.append(np.where(leaf, 0, tree.feature))
+        threshold.append(np.where(leaf, np.inf, tree.threshold))
+        children.append(np.stack([left, right], axis=1).ravel())
+        value.append(np.where(leaf, tree.value[:, 0, 0], 0.0))
+        # sklearn >= 1.3: a qué lado van los NaN en cada nodo
+        state = tree.__getstate__()['nodes']
+        if 'missing_go_to_left' in state.dtype.names:
+            missing_left.append(state['missing_go_to_left'].astype(bool) & ~leaf)
+
+    n_features = model.n_features_in_
+    arrays = {
+        'feature': np.concatenate(feature).astype(np.int32),
+        'threshold': floor_float32(np.concatenate(threshold)),
+        'children': np.concatenate(children).astype(np.int32),
+        'value': np.concatenate(value),
+        'roots': offsets.astype(np.int32),
+        'max_depth': np.array(max(t.max_depth for t in trees)),
+        'n_features': np.array(n_features),
+        'version': np.array(FLAT_VERSION),
+    }
+    if missing_left:
+        arrays['missing_left'] = np.concatenate(missing_left)
+    return arrays
+
+
+class FlatForest:
+    """Bosque exportado con `export_forest`; `predict` equivale al de sklearn."""
+
+    def __init__(self, arrays):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.children = arrays['children']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.missing_left = arrays.get('missing_left')
+        self.max_depth = int(arrays['max_depth'])
+        self.n_features_in_ = int(arrays['n_features'])
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def _predict_chunk(self, X):
+        # Nodos en forma (árboles, filas) y X por columnas: cada paso son
+        # lecturas planas (np.take) sobre arrays contiguos
+        n = len(X)
+        columns = np.ascontiguousarray(X.T).ravel()
+        row = np.arange(n)
+        nodes = np.repeat(self.roots[:, None], n, axis=1)
+        has_nan = self.missing_left is not None and np.isnan(columns).any()
+        for _ in range(self.max_depth):
+            feature = np.take(self.feature, nodes)
+            x = np.take(columns, feature * n + row if n > 1 else feature)
+            right = x > np.take(self.threshold, nodes)
+            if has_nan:
+                right |= np.isnan(x) & ~np.take(self.missing_left, nodes)
+            nodes = np.take(self.children, 2 * nodes + right)
+
+        # Misma suma que sklearn (árbol a árbol, en orden) y luego la media.
+        # cumsum siempre acumula en orden; sum() usa suma por pares con una
+        # sola fila y el resultado puede cambiar en el último bit
+        return np.cumsum(np.take(self.value, nodes), axis=0)[-1] / len(self.roots)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X tiene {X.shape[1]} features; el modelo espera {self.n_features_in_}")
+        step = max(1, CHUNK_CELLS // len(self.roots))
+        return np.concatenate([self._predict_chunk(X[start:start + step])
+                               for start in range(0, len(X), step)] or [np.empty(0)])
+
+
+def save_forest(model, path=FOREST_FLAT, source_path=None):
+    """Guarda el bosque exportado (.npz comprimido), con la huella del .pkl de origen."""
+    arrays = export_forest(model)
+    if source_path is not None:
+        arrays['source_sha256'] = np.array(file_hash(source_path))
+        arrays['source_stamp'] = np.array(file_stamp(source_path))
+    tmp = f"{path}.tmp-{os.getpid()}.npz"
+    np.savez_compressed(tmp, **arrays)
+    os.replace(tmp, path)
+    return path
+
+
+def read_forest(path=FOREST_FLAT):
+    """FlatForest desde un .npz de `save_forest` (None si falta o es de otra versión)."""
+    try:
+        with np.load(path, allow_pickle=False) as f:
+            arrays = {key: f[key] for key in f.files}
+    except OSError:
+        return None
+    if int(arrays.get('version', -1)) != FLAT_VERSION:
+        return None
+    forest = FlatForest(arrays)
+    forest.source_sha256 = str(arrays['source_sha256']) if 'source_sha256' in arrays else None
+    forest.source_stamp = arrays['source_stamp'].tolist() if 'source_stamp' in arrays else None
+    return forest
+
+
+def load_forest(pkl_path=FOREST_PKL, flat_path=FOREST_FLAT):
+    """Bosque listo para predecir: el exportado si está al día, si no el .pkl.
+
+    El .npz se usa si no hay .pkl (se distribuye solo el exportado) o si
+    se exportó de ese mismo .pkl; si el .pkl ha cambiado se deserializa
+    el .pkl como antes.
+    """
+    forest = read_forest(flat_path)
+    if forest is not None:
+        if not os.path.exists(pkl_path):
+            return forest
+        if forest.source_stamp == file_stamp(pkl_path) or forest.source_sha256 == file_hash(pkl_path):
+            return forest
+    with open(pkl_path, 'rb') as f:
+        return pickle.load(f)
+
+
+def max_difference(model, forest, X, single_rows=200):
+    """Mayor diferencia absoluta entre las predicciones de sklearn y las del bosque exportado.
+
+    Se compara el lote completo y además las primeras `single_rows` filas
+    de una en una, que es como se predice un jugador suelto.
+    """
+    if len(X) == 0:
+        return 0.0
+    reference = model.predict(X)
+    single = np.array([forest.predict(X[i:i + 1])[0] for i in range(min(single_rows, len(X)))])
+    return float(max(np.max(np.abs(reference - forest.predict(X))),
+                     np.max(np.abs(reference[:len(single)] - single))))
+
+
+def equivalence_inputs(model, n_random=2000, seed=0):
+    """Filas para comparar: el dataset escalado (si está) y puntos sobre los umbrales de los árboles."""
+    samples = []
+    try:
+        from build_data import load_dataset
+        from valuation import feature_matrix
+        with open('data/scaler_valuation.pkl', 'rb') as f:
+            scaler = pickle.load(f)
+        with open('data/features_valuation.pkl', 'rb') as f:
+            features = pickle.load(f)
+        df, _ = load_dataset()
+        samples.append(scaler.transform(feature_matrix(df, features)))
+    except (OSError, KeyError, ValueError):
+        pass
+
+    # Valores justo en los umbrales y a cada lado: los casos límite de las comparaciones
+    rng = np.random.default_rng(seed)
+    n_features = model.n_features_in_
+    X = rng.normal(size=(n_random, n_features))
+    for est in model.estimators_[:10]:
+        tree = est.tree_
+        internal = tree.children_left != -1
+        for feat in range(n_features):
+            cuts = tree.threshold[internal & (tree.feature == feat)]
+            if len(cuts):
+                picks = rng.choice(cuts, size=n_random // 10)
+                jitter = rng.choice([-1e-7, 0.0, 1e-7], size=len(picks))
+                rows = rng.integers(0, n_random, size=len(picks))
+                X[rows, feat] = picks + jitter
+    samples.append(X)
+    return np.vstack(samples)
+
+
+def main():
+    if not os.path.exists(FOREST_PKL):
+        print(f"⚠️ {FOREST_PKL} no existe: nada que exportar")
+        return
+
+    start = time.perf_counter()
+    with open(FOREST_PKL, 'rb') as f:
+        model = pickle.load(f)
+    save_forest(model, FOREST_FLAT, source_path=FOREST_PKL)
+    forest = read_forest(FOREST_FLAT)
+
+    X = equivalence_inputs(model)
+    diff = max_difference(model, forest, X)
+    # Las predicciones están acotadas por el mayor valor de hoja
+    if diff > EQUIVALENCE_RTOL * max(1.0, float(np.max(np.abs(forest.value)))):
+        os.remove(FOREST_FLAT)
+        raise SystemExit(f"❌ El bosque exportado no coincide con sklearn (diferencia máxima {diff:g})")
+
+    print(f"✅ Bosque exportado: {forest.n_estimators} árboles, {len(forest.value)} nodos, "
+          f"{os.path.getsize(FOREST_PKL) / 1e6:.1f} MB → {os.path.getsize(FOREST_FLAT) / 1e6:.1f} MB "
+          f"({len(X)} filas comprobadas, diferencia máxima {diff:g}, {time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
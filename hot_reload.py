@@ -0,0 +1,92 @@
+# Football Analytics Pro - Recarga en caliente de datos y modelos
+#
+# Un hilo vigila el tamaño y la fecha de modificación de los ficheros de
+# data/ y, cuando alguno cambia, llama a `on_change` con las rutas
+# modificadas. La recarga se hace en ese hilo: los callbacks siguen
+# atendiendo con los datos anteriores hasta que se sustituyen.
+
+import os
+import threading
+import time
+
+
+def file_stamps(paths):
+    """{ruta: (tamaño, mtime en ns)}; None si el fichero no existe."""
+    stamps = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stamps[path] = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            stamps[path] = None
+    return stamps
+
+
+class Reloader:
+    """Vigila una lista de ficheros y dispara una recarga cuando cambian."""
+
+    def __init__(self, paths, on_change, interval=30):
+        self.paths = list(paths)
+        self.on_change = on_change
+        self.interval = interval
+        self.reloads = 0
+        self.last_reload = None
+        self.last_error = None
+        self._stamps = file_stamps(self.paths)
+        self._lock = threading.Lock()
+
+    def check(self, force=False):
+        """Recarga si algún fichero ha cambiado (o siempre con `force`).
+
+        Devuelve la lista de rutas modificadas. Si ya hay una recarga en
+        curso no hace nada: la siguiente comprobación verá los cambios que
+        queden pendientes.
+        """
+        if not self._lock.acquire(blocking=False):
+            return []
+        try:
+            stamps = file_stamps(self.paths)
+            changed = [p for p in self.paths if stamps[p] != self._stamps[p]]
+            if force:
+                changed = self.paths
+            if not changed:
+                return []
+            try:
+                self.on_change(changed)
+                self.last_error = None
+            except Exception as e:
+                # Se mantiene la versión anterior; se reintenta en el próximo cambio
+                self.last_error = repr(e)
+                print(f"⚠️ Recarga fallida: {e!r}")
+            self._stamps = stamps
+            self.reloads += 1
+            self.last_reload = time.time()
+            return changed
+        finally:
+            self._lock.release()
+
+    def trigger(self, force=True):
+        """Lanza `check()` en un hilo aparte (para el endpoint de admin)."""
+        thread = threading.Thread(target=self.check, kwargs={'force': force},
+                                  name='data-reload', daemon=True)
+        thread.start()
+        return thread
+
+    def start(self):
+        """Arranca el hilo que comprueba los ficheros cada `interval` segundos."""
+        def loop():
+            while True:
+                time.sleep(self.interval)
+                self.check()
+
+        thread = threading.Thread(target=loop, name='data-watch', daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        return {
+            'reloads': self.reloads,
+            'last_reload': self.last_reload,
+            'last_error': self.last_error,
+            'interval': self.interval,
+        }
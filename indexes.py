@@ -0,0 +1,152 @@
+# Football Analytics Pro - Índices precalculados sobre el dataset
+#
+# Se construyen una vez al cargar los datos para que los callbacks filtren
+# con máscaras enteras o listas de filas en lugar de recorrer la tabla.
+
+import re
+
+import numpy as np
+
+# ==================== GRUPOS DE POSICIÓN ====================
+# Cada grupo es un bit: una posición puede pertenecer a dos grupos
+# ('midfield-AttackingMidfield' cuenta como Medio y como Ataque)
+POSITION_BITS = {
+    'Goalkeeper': 1,
+    'Defender': 2,
+    'Midfield': 4,
+    'Attack': 8,
+}
+
+POSITION_PATTERNS = {
+    'Goalkeeper': 'Goalkeeper',
+    'Defender': 'Defender',
+    'Midfield': 'Midfield|midfield',
+    'Attack': 'Attack|Forward|Striker',
+}
+
+
+def position_bits(position):
+    """Máscara de grupos de una posición (mismo criterio que str.contains)."""
+    bits = 0
+    for group, pattern in POSITION_PATTERNS.items():
+        if re.search(pattern, str(position), flags=re.IGNORECASE):
+            bits |= POSITION_BITS[group]
+    return bits
+
+
+def build_position_index(df):
+    """Devuelve (código de grupo por fila, filas de cada grupo).
+
+    Las expresiones regulares solo se evalúan sobre las posiciones
+    distintas (16), no sobre cada jugador.
+    """
+    codes = {p: position_bits(p) for p in df['position'].unique()}
+    groups = df['position'].map(codes).to_numpy(dtype=np.uint8)
+    rows = {group: np.flatnonzero(groups & bit) for group, bit in POSITION_BITS.items()}
+    return groups, rows
+
+
+def in_position_group(frame, group):
+    """Máscara booleana de las filas de `frame` que pertenecen a `group`."""
+    return (frame['position_group'].to_numpy() & POSITION_BITS[group]) != 0
+
+
+# ==================== EQUIPOS ====================
+# Métrica con la que se elige al mejor jugador de cada grupo de posición
+# (el portero usa 'clean sheets' si el equipo tiene alguna, si no 'appearance')
+BEST_BY_GROUP = {
+    'Defender': 'appearance',
+    'Midfield': 'contribucion_total',
+    'Attack': 'goles_totales',
+}
+
+TEAM_TOP_METRICS = ['goles_totales', 'asistencias_totales', 'current_value', 'appearance']
+
+
+def build_team_index(df):
+    """Filas (posiciones) de cada equipo: {team: array de filas}."""
+    return df.groupby('team', observed=True, sort=False).indices
+
+
+def build_team_stats(df):
+    """Tabla de agregados por equipo, calculada una sola vez.
+
+    Incluye totales, medias, tarjetas y, como posición de fila en `df`
+    (-1 si no hay), el mejor jugador por métrica y por grupo de posición.
+    """
+    g = df.groupby('team', observed=True, sort=False)
+    stats = g.agg(
+        jugadores=('team', 'size'),
+        goles=('goles_totales', 'sum'),
+        asistencias=('asistencias_totales', 'sum'),
+        contribucion=('contribucion_total', 'sum'),
+        edad_media=('age', 'mean'),
+        partidos=('appearance', 'sum'),
+        amarillas=('yellow cards', 'sum'),
+        rojas=('red cards', 'sum'),
+    )
+    # current_value puede venir como int32 (tabla compacta): sumar en int64
+    by_team = df['team']
+    stats['valor'] = df['current_value'].astype(np.int64).groupby(by_team, observed=True).sum()
+    stats['con_valor'] = (df['current_value'] > 0).groupby(by_team, observed=True).sum()
+
+    # nlargest(1, ...) == primera fila con el máximo == idxmax (RangeIndex)
+    for metric in TEAM_TOP_METRICS:
+        stats[f'top_{metric}'] = g[metric].idxmax()
+
+    gk = df[in_position_group(df, 'Goalkeeper')].groupby('team', observed=True)
+    has_cs = (gk['clean sheets'].sum() > 0).reindex(stats.index, fill_value=False)
+    stats['gk_metric'] = np.where(has_cs, 'clean sheets', 'appearance')
+    stats['best_Goalkeeper'] = gk['clean sheets'].idxmax().where(has_cs, gk['appearance'].idxmax())
+
+    for group, metric in BEST_BY_GROUP.items():
+        grouped = df[in_position_group(df, group)].groupby('team', observed=True)
+        stats[f'best_{group}'] = grouped[metric].idxmax()
+
+    best_cols = [f'best_{group}' for group in POSITION_BITS]
+    stats[best_cols] = stats[best_cols].fillna(-1).astype(np.int64)
+    return stats
+
+
+# ==================== TOP-K DEL DASHBOARD ====================
+# Métricas de los rankings del dashboard; True = solo filas con valor > 0
+TOPK_METRICS = {
+    'goles_totales': False,
+    'asistencias_totales': False,
+    'contribucion_total': False,
+    'minutes played': False,
+    'goles_por_partido': False,
+    'current_value': True,
+    'appearance': False,
+}
+
+
+def build_topk_index(df, k=15, metrics=TOPK_METRICS):
+    """Top-k precalculado por métrica y mínimo de partidos.
+
+    El conjunto de jugadores con appearance >= t solo cambia en los valores
+    distintos de appearance, así que se guarda el top-k para cada uno de
+    ellos (~100) y cualquier umbral se resuelve con una búsqueda binaria
+    sobre esos valores ordenados. El orden reproduce nlargest(k) (empates
+    por orden de fila); con menos de k candidatos nlargest no garantiza el
+    orden de los empates y aquí siguen por fila.
+    """
+    appearance = df['appearance'].to_numpy()
+    thresholds = np.unique(appearance)
+    rows = {}
+    for metric, positive_only in metrics.items():
+        values = df[metric].to_numpy().astype(np.float64)
+        order = np.argsort(-values, kind='stable')
+        if positive_only:
+            order = order[values[order] > 0]
+        app_in_order = appearance[order]
+        rows[metric] = [order[np.flatnonzero(app_in_order >= t)[:k]] for t in thresholds]
+    return {'k': k, 'thresholds': thresholds, 'rows': rows}
+
+
+def topk_rows(index, metric, min_matches):
+    """Filas del top-k de `metric` entre jugadores con appearance >= min_matches."""
+    i = np.searchsorted(index['thresholds'], min_matches, side='left')
+    if i == len(index['thresholds']):
+        return np.empty(0, dtype=np.intp)
+    return index['rows'][metric][i]
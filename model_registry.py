@@ -0,0 +1,138 @@
+# Football Analytics Pro - Registro de modelos ML con carga perezosa
+#
+# Cada modelo se deserializa la primera vez que se pide o, si se activa el
+# calentamiento, en un hilo en segundo plano justo después del arranque.
+# Así gunicorn responde al health check sin esperar a los .pkl.
+
+import threading
+import time
+
+PENDING, LOADING, READY, ERROR = 'pending', 'loading', 'ready', 'error'
+
+
+class ModelRegistry:
+    """Registro de modelos: estado de carga, tiempos y acceso perezoso."""
+
+    def __init__(self):
+        self._loaders = {}
+        self._labels = {}
+        self._models = {}
+        self._state = {}
+        self._seconds = {}
+        self._errors = {}
+        self._done = {}
+        self._paths = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader, label=None, paths=()):
+        """Registra `loader()` (sin argumentos) como cargador del modelo `name`.
+
+        `paths` son los ficheros de los que depende: si cambian, el modelo
+        se recarga en caliente (ver hot_reload.py).
+        """
+        self._loaders[name] = loader
+        self._labels[name] = label or name
+        self._paths[name] = list(paths)
+        self._versions[name] = 0
+        self._state[name] = PENDING
+        self._done[name] = threading.Event()
+
+    def _load(self, name):
+        with self._lock:
+            if self._state[name] != PENDING:
+                return
+            self._state[name] = LOADING
+
+        start = time.perf_counter()
+        try:
+            model, state = self._loaders[name](), READY
+            print(f"✅ {self._labels[name]} ({time.perf_counter() - start:.2f}s)")
+        except Exception as e:
+            model, state = None, ERROR
+            self._errors[name] = repr(e)
+            print(f"⚠️ {self._labels[name]} no disponible")
+
+        self._seconds[name] = time.perf_counter() - start
+        self._models[name] = model
+        self._state[name] = state
+        self._versions[name] += 1
+        self._done[name].set()
+
+    def get(self, name, wait=True):
+        """Devuelve el modelo (None si no se pudo cargar).
+
+        Con `wait=False` no bloquea: si aún no está listo lanza la carga en
+        segundo plano y devuelve None; consultar `state()` para distinguir
+        "cargando" de "no disponible".
+        """
+        if not wait:
+            if self._state[name] == PENDING:
+                self.load_async([name])
+            return self._models.get(name)
+        self._load(name)
+        self._done[name].wait()
+        return self._models.get(name)
+
+    def reload(self, name):
+        """Vuelve a cargar `name` y sustituye la versión en uso.
+
+        Si aún no se había pedido no hace nada (se cargará la versión nueva
+        al primer uso). Si la carga falla se mantiene el modelo anterior.
+        """
+        if self._state[name] == PENDING:
+            return
+        self._done[name].wait()
+
+        start = time.perf_counter()
+        try:
+            model = self._loaders[name]()
+        except Exception as e:
+            self._errors[name] = repr(e)
+            print(f"⚠️ {self._labels[name]}: recarga fallida, se mantiene la versión anterior")
+            return
+
+        with self._lock:
+            self._models[name] = model
+            self._state[name] = READY
+            self._seconds[name] = time.perf_counter() - start
+            self._errors.pop(name, None)
+            self._versions[name] += 1
+        print(f"🔄 {self._labels[name]} recargado ({self._seconds[name]:.2f}s)")
+
+    def watched_paths(self):
+        """{ruta: [modelos que dependen de ella]}."""
+        watched = {}
+        for name, paths in self._paths.items():
+            for path in paths:
+                watched.setdefault(path, []).append(name)
+        return watched
+
+    def version(self, name):
+        """Número de cargas de `name`: cambia cada vez que se sustituye el modelo."""
+        return self._versions[name]
+
+    def state(self, name):
+        return self._state[name]
+
+    def is_loading(self, name):
+        return self._state[name] in (PENDING, LOADING)
+
+    def status(self):
+        """Estado, tiempo de carga y error de cada modelo (para /models/status)."""
+        return {
+            name: {
+                'state': self._state[name],
+                'seconds': round(self._seconds[name], 3) if name in self._seconds else None,
+                'error': self._errors.get(name),
+            }
+            for name in self._loaders
+        }
+
+    def load_async(self, names=None):
+        """Carga los modelos indicados (todos por defecto) en un hilo aparte."""
+        names = list(names or self._loaders)
+        thread = threading.Thread(target=lambda: [self._load(n) for n in names],
+                                  name='model-warmup', daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,129 @@
+# Football Analytics Pro - Búsqueda de jugadores en el servidor
+#
+# Los desplegables de jugadores ya no reciben las ~10.000 opciones en el
+# layout: el navegador envía el texto tecleado (search_value) y el servidor
+# devuelve solo las mejores coincidencias. El índice se construye una vez
+# con nombre y equipo sin acentos ni mayúsculas, partidos en palabras.
+
+import bisect
+import re
+import unicodedata
+
+import numpy as np
+
+SEARCH_LIMIT = 20
+
+
+# Letras que NFKD no descompone en letra base + acento
+FOLD_TABLE = str.maketrans({'ø': 'o', 'ł': 'l', 'đ': 'd', 'ð': 'd', 'þ': 'th',
+                            'æ': 'ae', 'œ': 'oe', 'ı': 'i'})
+
+
+def fold(text):
+    """Texto en minúsculas, sin acentos y con solo letras/dígitos ('Müller' → 'muller')."""
+    text = unicodedata.normalize('NFKD', str(text).casefold().translate(FOLD_TABLE))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r'[^0-9a-z]+', ' ', text).strip()
+
+
+def player_label(name, team, position):
+    return f"{name} ({team}) - {position}"
+
+
+def build_search_index(frame, rows=None):
+    """Índice de prefijos sobre nombre y equipo de las filas `rows` de `frame`.
+
+    Cada palabra normalizada apunta a las filas que la contienen; las
+    palabras se guardan ordenadas para resolver un prefijo con dos
+    búsquedas binarias. Las filas se ordenan por valor de mercado para
+    que, a igualdad de coincidencia, salgan primero los más conocidos.
+    """
+    if rows is None:
+        rows = np.arange(len(frame))
+    names = frame['name'].to_numpy()[rows]
+    teams = frame['team'].to_numpy()[rows]
+    positions = frame['position'].to_numpy()[rows]
+    value = frame['current_value'].to_numpy()[rows].astype(np.float64)
+
+    # Orden de popularidad: valor de mercado desc, luego posición en el dataset
+    order = np.lexsort((rows, -value))
+    rank = np.empty(len(rows), dtype=np.int64)
+    rank[order] = np.arange(len(rows))
+
+    # Los equipos se repiten: se normalizan una sola vez cada uno
+    team_tokens = {team: set(fold(team).split()) for team in set(teams)}
+    labels = [player_label(*row) for row in zip(names, teams, positions)]
+    folded_names = [fold(name) for name in names]
+    postings = {}
+    for i, (folded_name, team) in enumerate(zip(folded_names, teams)):
+        for token in set(folded_name.split()) | team_tokens[team]:
+            postings.setdefault(token, []).append(i)
+
+    tokens = sorted(postings)
+    return {
+        'rows': np.asarray(rows),
+        'labels': labels,
+        'folded_names': folded_names,
+        'rank': rank,
+        'order': order,
+        'tokens': tokens,
+        'postings': [np.array(postings[t], dtype=np.int64) for t in tokens],
+    }
+
+
+def _prefix_matches(index, prefix):
+    """Posiciones (en el índice) con alguna palabra que empieza por `prefix`."""
+    tokens = index['tokens']
+    lo = bisect.bisect_left(tokens, prefix)
+    hi = bisect.bisect_left(tokens, prefix + '\uffff')
+    if lo == hi:
+        return np.empty(0, dtype=np.int64)
+    return np.unique(np.concatenate(index['postings'][lo:hi]))
+
+
+def search_players(index, query, limit=SEARCH_LIMIT):
+    """Filas de `frame` que coinciden con `query` (todas sus palabras como prefijo).
+
+    Sin texto devuelve las `limit` más populares. Primero van los jugadores
+    con todas las palabras buscadas completas en el nombre ('messi' →
+    Lionel Messi), después aquellos cuyo nombre empieza por la búsqueda
+    (Messias) y luego el resto; dentro de cada grupo, por valor de mercado.
+    """
+    query = fold(query or '')
+    if not query:
+        return index['rows'][index['order'][:limit]]
+
+    hits = None
+    for token in query.split():
+        matches = _prefix_matches(index, token)
+        hits = matches if hits is None else np.intersect1d(hits, matches, assume_unique=True)
+        if len(hits) == 0:
+            return np.empty(0, dtype=np.int64)
+
+    # Palabras de una letra ('a') no cuentan como coincidencia exacta
+    tokens = {t for t in query.split() if len(t) > 1}
+    names = [index['folded_names'][i] for i in hits]
+    tier = np.array([0 if tokens and tokens <= set(name.split()) else 1 if name.startswith(query) else 2
+                     for name in names])
+    best = hits[np.lexsort((index['rank'][hits], tier))[:limit]]
+    return index['rows'][best]
+
+
+def player_options(index, query, selected=None, limit=SEARCH_LIMIT):
+    """Opciones de dcc.Dropdown para `query`, conservando el jugador seleccionado.
+
+    `search` lleva también la etiqueta sin acentos para que el filtro del
+    propio desplegable no oculte 'Müller' al buscar 'muller'.
+    """
+    rows = list(search_players(index, query, limit))
+    if selected is not None and selected not in rows:
+        rows.append(selected)
+
+    positions = np.searchsorted(index['rows'], rows)
+    options = []
+    for row, i in zip(rows, positions):
+        if i >= len(index['rows']) or index['rows'][i] != row:
+            continue
+        label = index['labels'][i]
+        options.append({'label': label, 'value': int(row), 'search': f"{label} {fold(label)}"})
+    return options
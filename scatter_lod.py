@@ -0,0 +1,90 @@
+# Football Analytics Pro - Scatter con WebGL y nivel de detalle
+#
+# Los gráficos de dispersión dibujan todos los jugadores filtrados con
+# trazas WebGL (scattergl) en lugar de una muestra aleatoria en SVG. Si hay
+# muchos puntos se añade debajo una capa de densidad (conteos por celda)
+# para que se lea dónde se concentran; solo cuando se supera el máximo de
+# puntos se muestrea, de forma estratificada y siempre con las mismas filas.
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+MAX_POINTS = 20000
+DENSITY_THRESHOLD = 2000
+DENSITY_BINS = 40
+
+
+def stable_keys(index):
+    """Clave pseudoaleatoria fija por fila (hash multiplicativo de su posición en el dataset)."""
+    return (np.asarray(index, dtype=np.uint64) * np.uint64(2654435761)) % np.uint64(2 ** 32)
+
+
+def stratified_sample(frame, n, by):
+    """`n` filas de `frame` repartidas entre los grupos de `by` según su tamaño.
+
+    El reparto es proporcional (restos mayores) y cada grupo con filas
+    conserva al menos una, para que ninguna posición desaparezca del
+    gráfico. Dentro de cada grupo se toman las filas de menor clave
+    estable: la misma consulta devuelve siempre la misma muestra y, al
+    afinar el filtro, los jugadores ya mostrados siguen apareciendo.
+    """
+    if len(frame) <= n:
+        return frame
+    groups = frame[by].astype(str).to_numpy()
+    names, codes, counts = np.unique(groups, return_inverse=True, return_counts=True)
+
+    quota = counts * n / len(frame)
+    take = np.floor(quota).astype(np.int64)
+    if n >= len(names):
+        take = np.maximum(take, 1)
+    # Los huecos que quedan van a los grupos con mayor resto
+    rest = n - take.sum()
+    if rest > 0:
+        take[np.argsort(-(quota - take), kind='stable')[:rest]] += 1
+    take = np.minimum(take, counts)
+
+    order = np.lexsort((stable_keys(frame.index), codes))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    keep = np.concatenate([order[s:s + t] for s, t in zip(starts, take)])
+    return frame.iloc[np.sort(keep)]
+
+
+def density_layer(x, y, bins=DENSITY_BINS):
+    """Heatmap con el número de jugadores por celda (vacías transparentes)."""
+    x = pd.to_numeric(x, errors='coerce').to_numpy(dtype=np.float64)
+    y = pd.to_numeric(y, errors='coerce').to_numpy(dtype=np.float64)
+    ok = np.isfinite(x) & np.isfinite(y)
+    counts, x_edges, y_edges = np.histogram2d(x[ok], y[ok], bins=bins)
+    z = np.where(counts > 0, counts, np.nan).T
+    return go.Heatmap(
+        x=(x_edges[:-1] + x_edges[1:]) / 2, y=(y_edges[:-1] + y_edges[1:]) / 2, z=z,
+        colorscale='Greys', opacity=0.35, showscale=False, hoverongaps=False,
+        name='Densidad', hovertemplate='%{z:.0f} jugadores<extra></extra>',
+    )
+
+
+def lod_scatter(frame, x, y, color, size, max_points=MAX_POINTS,
+                density_threshold=DENSITY_THRESHOLD, **kwargs):
+    """px.scatter de `frame` en WebGL con nivel de detalle según el número de filas.
+
+    - Hasta `density_threshold`: todos los puntos, como antes.
+    - Por encima: capa de densidad de todas las filas y puntos más pequeños.
+    - Por encima de `max_points`: muestra estratificada por `color`.
+    """
+    total = len(frame)
+    shown = stratified_sample(frame, max_points, color) if total > max_points else frame
+    dense = total > density_threshold
+
+    fig = px.scatter(shown, x=x, y=y, color=color, size=size, render_mode='webgl',
+                     size_max=12 if dense else 20, **kwargs)
+    if dense:
+        fig.add_trace(density_layer(frame[x], frame[y]))
+        fig.data = fig.data[-1:] + fig.data[:-1]  # la densidad queda debajo de los puntos
+        fig.update_traces(marker_opacity=0.6, selector=dict(type='scattergl'))
+    if len(shown) < total:
+        fig.add_annotation(text=f"Muestra estratificada: {len(shown):,} de {total:,} jugadores",
+                           xref='paper', yref='paper', x=1, y=1.06, showarrow=False,
+                           xanchor='right', font=dict(size=11, color='gray'))
+    return fig
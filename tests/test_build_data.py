@@ -0,0 +1,103 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from build_data import compact_table, load_model, read_manifest, read_snapshot, write_snapshot
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    n = 200
+    return pd.DataFrame({
+        'name': [f'Jugador {i}' for i in range(n)],
+        'team': rng.choice(['Rojo', 'Azul', 'Verde'], size=n),
+        'position': rng.choice(['Goalkeeper', 'Defender Centre-Back', 'Attack Centre-Forward'], size=n),
+        'appearance': rng.integers(0, 60, size=n),
+        'current_value': rng.integers(0, 10**8, size=n).astype(np.int64),
+        'goles_totales': rng.integers(0, 30, size=n).astype(np.float64),
+        'minutes played': rng.random(n) * 3000,
+        'days_injured': np.where(rng.random(n) < 0.1, np.nan, 5.0),
+    })
+
+
+def test_compact_table_dtypes(frame):
+    compact = compact_table(frame)
+    assert compact['team'].dtype == 'category'
+    assert compact['position'].dtype == 'category'
+    # Casi únicos: se quedan como texto
+    assert compact['name'].dtype == object
+    assert compact['appearance'].dtype == np.int8
+    assert compact['current_value'].dtype == np.int32
+    # Floats con valores enteros → entero pequeño; el resto no se toca
+    assert compact['goles_totales'].dtype == np.int8
+    assert compact['minutes played'].dtype == np.float64
+    assert compact['days_injured'].dtype == np.float64
+    # Mismos valores y orden de categorías por aparición
+    pd.testing.assert_frame_equal(compact.astype(frame.dtypes.to_dict()), frame)
+    assert list(compact['team'].cat.categories) == list(frame['team'].unique())
+    assert compact.memory_usage(deep=True).sum() < frame.memory_usage(deep=True).sum()
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_snapshot_roundtrip(frame, tmp_path, mmap):
+    compact = compact_table(frame)
+    path = str(tmp_path / 'snapshot')
+    memory = {'csv_bytes': 2, 'compact_bytes': 1}
+    write_snapshot(compact, 'hash', path=path, memory=memory)
+
+    loaded = read_snapshot(path, expected_hash='hash', mmap=mmap)
+    # copy(): assert_frame_equal distingue np.memmap de ndarray
+    pd.testing.assert_frame_equal(loaded.copy(), compact)
+    assert read_manifest(path)['memory'] == memory
+    if mmap:
+        # Las columnas numéricas siguen mapeadas (compartidas entre workers)
+        for col in ['appearance', 'current_value', 'minutes played']:
+            base = loaded[col].to_numpy()
+            while base.base is not None and not isinstance(base, np.memmap):
+                base = base.base
+            assert isinstance(base, np.memmap), col
+
+
+def test_snapshot_hash_mismatch(frame, tmp_path):
+    path = str(tmp_path / 'snapshot')
+    write_snapshot(compact_table(frame), 'hash', path=path)
+    assert read_snapshot(path, expected_hash='otro') is None
+    assert read_snapshot(str(tmp_path / 'falta')) is None
+
+
+# ==================== MODELOS COMPARTIDOS ====================
+
+def make_model(n=50):
+    rng = np.random.default_rng(1)
+    return {
+        'top_indices': rng.integers(0, n, size=(n, 10)).astype(np.int32),
+        'top_scores': rng.random((n, 10)).astype(np.float32),
+        'players_data': pd.DataFrame({'name': [f'Jugador {i}' for i in range(n)],
+                                      'current_value': rng.integers(0, 10**7, size=n)}),
+        'features': ['goles', 'asistencias'],
+    }
+
+
+def test_model_snapshot_roundtrip(tmp_path):
+    model = make_model()
+    pkl_path = str(tmp_path / 'model.pkl')
+    with open(pkl_path, 'wb') as f:
+        pickle.dump(model, f)
+    path = str(tmp_path / 'snapshot')
+    write_snapshot(pd.DataFrame({'x': [1]}), 'hash', path=path, models={'rec': (model, pkl_path)})
+
+    loaded = load_model('rec', pkl_path, snapshot_path=path, mmap=True)
+    assert isinstance(loaded['top_indices'], np.memmap)
+    np.testing.assert_array_equal(loaded['top_indices'], model['top_indices'])
+    np.testing.assert_array_equal(loaded['top_scores'], model['top_scores'])
+    pd.testing.assert_frame_equal(loaded['players_data'].copy(), model['players_data'])
+    assert loaded['features'] == model['features']
+
+    # Si el .pkl cambia se carga el .pkl, no el snapshot antiguo
+    changed = dict(model, features=['goles'])
+    with open(pkl_path, 'wb') as f:
+        pickle.dump(changed, f)
+    assert load_model('rec', pkl_path, snapshot_path=path)['features'] == ['goles']
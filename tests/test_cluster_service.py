@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.cluster import KMeans
+from sklearn.decomposition import PCA
+from sklearn.preprocessing import StandardScaler
+
+from cluster_service import eligible_rows, style_features, sync_clusters
+
+
+def make_frame(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'name': [f'Jugador {i}' for i in range(n)],
+        'team': [f'Equipo {i % 5}' for i in range(n)],
+        'position': rng.choice(['Defender Centre-Back', 'midfield-CentralMidfield',
+                                'Attack Centre-Forward'], size=n),
+        'appearance': rng.integers(15, 40, size=n),
+        'minutes played': rng.integers(1000, 3000, size=n).astype(float),
+        'goles_totales': rng.integers(0, 20, size=n).astype(float),
+        'asistencias_totales': rng.integers(0, 15, size=n).astype(float),
+        'yellow cards': rng.integers(0, 10, size=n).astype(float),
+        'red cards': rng.integers(0, 2, size=n).astype(float),
+    })
+
+
+@pytest.fixture(scope='module')
+def model():
+    frame = make_frame()
+    features = style_features(frame)
+    scaler = StandardScaler().fit(features)
+    X = scaler.transform(features)
+    pca = PCA(n_components=2).fit(X)
+    kmeans = KMeans(n_clusters=3, n_init=1, random_state=0).fit(X)
+    xy = pca.transform(X)
+    data = frame[['name', 'team', 'position']].assign(cluster=kmeans.labels_, pca_x=xy[:, 0],
+                                                     pca_y=xy[:, 1])
+    return {'model': kmeans, 'scaler': scaler, 'pca': pca, 'features': list(features.columns),
+            'data': data}
+
+
+def test_sync_unchanged_frame(model):
+    synced = sync_clusters(model, make_frame())
+    assert synced['sync'] == {'players': 60, 'new': 0, 'changed': 0, 'removed': 0}
+
+
+def test_sync_tolerates_duplicate_keys(model):
+    frame = make_frame()
+    # Jugador 0 aparece dos veces, la segunda con otras estadísticas
+    duplicated = frame.iloc[[0]].assign(**{'goles_totales': 40.0})
+    frame = pd.concat([frame, duplicated], ignore_index=True)
+
+    synced = sync_clusters(model, frame)
+    assert len(synced['data']) == len(eligible_rows(frame))
+    assert synced['sync'] == {'players': 61, 'new': 0, 'changed': 1, 'removed': 0}
+
+    # El modelo ya sincronizado (con la clave repetida) se vuelve a sincronizar
+    again = sync_clusters(synced, frame.drop(index=1))
+    assert again['sync'] == {'players': 60, 'new': 0, 'changed': 1, 'removed': 1}
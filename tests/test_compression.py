@@ -0,0 +1,55 @@
+import gzip
+
+import pytest
+
+from compression import StaticCompressor, accepted_encoding, available_encodings, compress
+
+
+@pytest.fixture
+def compressor(tmp_path):
+    return StaticCompressor(directory=str(tmp_path), max_bytes=4096)
+
+
+def body(seed):
+    return (f"var bundle{seed} = ".encode() + bytes(range(256)) * 8)
+
+
+def test_accepted_encoding():
+    assert accepted_encoding('gzip, deflate') == 'gzip'
+    assert accepted_encoding('gzip;q=0') is None
+    assert accepted_encoding('identity') is None
+    assert accepted_encoding(None) is None
+    assert accepted_encoding('*') == available_encodings()[0]
+
+
+def test_precompressed_file_is_served(compressor):
+    data = body(0)
+    compressor.precompress(data)
+    served = compressor.get(data, 'gzip')
+    assert gzip.decompress(served) == data
+    assert compressor.status()['precompressed_hits'] == 1
+
+
+def test_same_body_shares_one_entry(compressor):
+    data = body(1)
+    first = compressor.get(data, 'gzip')
+    # Antes la clave era la URL: cada query string nuevo guardaba otra copia
+    for _ in range(10):
+        assert compressor.get(data, 'gzip') is first
+    status = compressor.status()
+    assert status['files'] == 1
+    assert status['compressed_on_the_fly'] == 1
+
+
+def test_memory_is_bounded(compressor):
+    for seed in range(200):
+        data = body(seed) + bytes([seed]) * 2000
+        assert gzip.decompress(compressor.get(data, 'gzip')) == data
+    status = compressor.status()
+    assert status['bytes'] <= compressor.max_bytes
+    assert status['evictions'] > 0
+
+
+def test_compress_gzip_roundtrip():
+    data = b'{"x": 1}' * 500
+    assert gzip.decompress(compress(data, 'gzip')) == data
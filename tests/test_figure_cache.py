@@ -0,0 +1,57 @@
+import json
+
+from figure_cache import FigureCache
+
+
+def make_cache(max_bytes=1024):
+    return FigureCache(max_bytes=max_bytes, serialize=json.dumps)
+
+
+def builder(calls, fig):
+    def build():
+        calls.append(1)
+        return fig
+    return build
+
+
+def test_hit_after_first_build():
+    cache, calls = make_cache(), []
+    fig = {'data': [{'x': [1, 2]}], 'layout': {}}
+    assert cache.get_or_build('a', 1, builder(calls, fig)) == fig
+    assert cache.get_or_build('a', 1, builder(calls, fig)) == fig
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_new_dataset_version_drops_entries():
+    cache, calls = make_cache(), []
+    cache.get_or_build('a', 1, builder(calls, {'v': 1}))
+    assert cache.get_or_build('a', 2, builder(calls, {'v': 2})) == {'v': 2}
+    assert cache.stats()['version'] == 2
+    # Un callback iniciado antes de la recarga no usa ni llena la caché
+    assert cache.get_or_build('a', 1, builder(calls, {'v': 1})) == {'v': 1}
+    assert cache.get_or_build('a', 2, builder(calls, {'v': 2})) == {'v': 2}
+    assert len(calls) == 3
+
+
+def test_lru_eviction_by_bytes():
+    cache, calls = make_cache(max_bytes=100), []
+    fig = {'d': 'x' * 30}  # ~40 bytes de JSON
+    cache.get_or_build('a', 1, builder(calls, fig))
+    cache.get_or_build('b', 1, builder(calls, fig))
+    cache.get_or_build('a', 1, builder(calls, fig))  # 'a' pasa a ser la más reciente
+    cache.get_or_build('c', 1, builder(calls, fig))  # expulsa 'b'
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['bytes'] <= 100
+    cache.get_or_build('a', 1, builder(calls, fig))
+    assert len(calls) == 3
+    cache.get_or_build('b', 1, builder(calls, fig))
+    assert len(calls) == 4
+
+
+def test_oversized_figure_is_not_cached():
+    cache, calls = make_cache(max_bytes=10), []
+    cache.get_or_build('a', 1, builder(calls, {'d': 'x' * 50}))
+    cache.get_or_build('a', 1, builder(calls, {'d': 'x' * 50}))
+    assert len(calls) == 2 and cache.stats()['entries'] == 0
@@ -0,0 +1,76 @@
+import base64
+import json
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import pytest
+
+from figure_encoding import dumps, figure_json, loads, slim_figure, typed_array
+
+
+def decode(value):
+    """Array de un typed array de Plotly.js ({'dtype', 'bdata'[, 'shape']})."""
+    if not isinstance(value, dict):
+        return np.asarray(value)
+    arr = np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype'])
+    if 'shape' in value:
+        arr = arr.reshape([int(n) for n in value['shape'].split(',')])
+    return arr
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rng = np.random.default_rng(0)
+    n = 300
+    return pd.DataFrame({
+        'goles': rng.integers(0, 40, size=n),
+        'valor': rng.integers(0, 10**8, size=n),
+        'ratio': rng.random(n),
+        'team': rng.choice(['Rojo', 'Azul'], size=n),
+        'position': rng.choice(['Attack', 'Defender'], size=n),
+    })
+
+
+@pytest.mark.parametrize('values, dtype', [(list(range(100)), 'int8'), (list(range(200)), 'uint8'), (list(range(-5, 300)), 'int16'),
+                                           ([0.5] * 20, 'float32'), ([1e10] * 20, 'float64')])
+def test_typed_array_dtypes(values, dtype):
+    encoded = typed_array(values)
+    assert encoded['dtype'] == dtype
+    np.testing.assert_allclose(decode(encoded), values, rtol=1e-6)
+
+
+def test_short_and_text_arrays_stay_lists():
+    assert typed_array([1, 2, 3]) is None
+    assert typed_array(['a'] * 50) is None
+
+
+def test_slim_scatter_keeps_data_and_hover(frame):
+    fig = px.scatter(frame, x='goles', y='ratio', color='position', hover_data=['team', 'valor'])
+    before = fig.to_json()
+    slim = json.loads(figure_json(fig))
+    assert fig.to_json() == before  # la figura original no se toca
+
+    for full, small in zip(fig.data, slim['data']):
+        np.testing.assert_array_equal(decode(small['x']), full.x)
+        np.testing.assert_allclose(decode(small['y']), full.y, rtol=1e-6)
+        # La posición ya es el color: sale del customdata y va al hovertemplate
+        assert full.name in small['hovertemplate']
+        custom = np.asarray(small['customdata'], dtype=object)
+        assert custom.shape == (len(full.x), 2)
+        np.testing.assert_array_equal(custom[:, 0], np.asarray(full.customdata)[:, 0])
+        assert 'xaxis' not in small and 'legendgroup' not in small
+
+
+def test_template_trimmed_to_trace_types(frame):
+    fig = px.bar(frame.groupby('team', as_index=False)['goles'].sum(), x='team', y='goles',
+                 template='plotly_white')
+    template = slim_figure(fig)['layout']['template']
+    assert set(template['data']) == {'bar'}
+    assert 'geo' not in template['layout'] and 'colorway' in template['layout']
+    assert len(dumps(template)) < len(dumps(fig.to_dict()['layout']['template'])) / 2
+
+
+def test_dumps_roundtrip():
+    obj = {'a': np.arange(3), 'b': np.float32(1.5), 'c': [None, 'x']}
+    assert loads(dumps(obj)) == {'a': [0, 1, 2], 'b': 1.5, 'c': [None, 'x']}
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from forest_inference import FlatForest, export_forest, floor_float32
+
+
+@pytest.fixture(scope='module')
+def forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 5))
+    y = X[:, 0] * 3 + np.sin(X[:, 1]) + rng.normal(scale=0.1, size=400)
+    # Algunos NaN en el entrenamiento: cada nodo aprende a qué lado van
+    X[rng.random(X.shape) < 0.05] = np.nan
+    model = RandomForestRegressor(n_estimators=15, max_depth=8, random_state=0).fit(X, y)
+    return model, FlatForest(export_forest(model)), X
+
+
+def test_batch_matches_sklearn(forest):
+    model, flat, X = forest
+    X = np.nan_to_num(X)
+    np.testing.assert_array_equal(flat.predict(X), model.predict(X))
+
+
+def test_single_row_matches_sklearn(forest):
+    model, flat, X = forest
+    for row in np.nan_to_num(X[:25]):
+        np.testing.assert_array_equal(flat.predict(row), model.predict(row[None, :]))
+
+
+def test_inputs_on_split_thresholds(forest):
+    model, flat, _ = forest
+    tree = model.estimators_[0].tree_
+    # Los nodos que solo separan NaN de no-NaN tienen umbral infinito
+    internal = np.flatnonzero((tree.children_left != -1) & np.isfinite(tree.threshold))
+    X = np.zeros((3 * len(internal), model.n_features_in_))
+    for i, node in enumerate(internal):
+        t = tree.threshold[node]
+        # Justo en el umbral y el float64 inmediato a cada lado
+        for j, value in enumerate((np.nextafter(t, -np.inf), t, np.nextafter(t, np.inf))):
+            X[3 * i + j, tree.feature[node]] = value
+    np.testing.assert_array_equal(flat.predict(X), model.predict(X))
+
+
+def test_floor_float32_is_largest_float32_not_above():
+    values = np.array([0.1, -0.1, 1 / 3, 2.5, 1e-40])
+    floored = floor_float32(values)
+    assert floored.dtype == np.float32
+    assert (floored.astype(np.float64) <= values).all()
+    assert (np.nextafter(floored, np.float32(np.inf)).astype(np.float64) > values).all()
+
+
+def test_nan_routing_matches_sklearn(forest):
+    model, flat, X = forest
+    assert np.isnan(X).any()
+    np.testing.assert_array_equal(flat.predict(X), model.predict(X))
+    rows = np.full((model.n_features_in_, model.n_features_in_), 0.5)
+    np.fill_diagonal(rows, np.nan)
+    np.testing.assert_array_equal(flat.predict(rows), model.predict(rows))
@@ -0,0 +1,81 @@
+import os
+
+from hot_reload import Reloader
+from model_registry import READY, ModelRegistry
+
+
+def write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def touch_later(path, text):
+    """Reescribe `path` con otro tamaño y un mtime distinto."""
+    write(path, text)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def test_reloader_reports_changed_files(tmp_path):
+    a, b = str(tmp_path / 'a.csv'), str(tmp_path / 'b.pkl')
+    write(a, 'x')
+    write(b, 'y')
+    seen = []
+    reloader = Reloader([a, b], seen.append)
+
+    assert reloader.check() == []
+    touch_later(a, 'xx')
+    assert reloader.check() == [a]
+    assert seen == [[a]]
+    # Ya registrado: no se vuelve a recargar
+    assert reloader.check() == []
+    os.remove(b)
+    assert reloader.check() == [b]
+    assert reloader.check(force=True) == [a, b]
+    assert reloader.status()['reloads'] == 3
+
+
+def test_failed_reload_keeps_running(tmp_path):
+    path = str(tmp_path / 'a.csv')
+    write(path, 'x')
+
+    def on_change(paths):
+        raise ValueError("CSV corrupto")
+
+    reloader = Reloader([path], on_change)
+    touch_later(path, 'xx')
+    assert reloader.check() == [path]
+    assert 'CSV corrupto' in reloader.status()['last_error']
+    # El cambio fallido no se reintenta hasta que el fichero vuelva a cambiar
+    assert reloader.check() == []
+
+
+def test_registry_reload_swaps_model_and_keeps_it_on_failure():
+    versions = iter(['v1', 'v2'])
+
+    def loader():
+        value = next(versions, None)
+        if value is None:
+            raise OSError("pkl a medio escribir")
+        return value
+
+    registry = ModelRegistry()
+    registry.register('a', loader, paths=['data/a.pkl'])
+    # Sin pedir todavía: la recarga no carga nada
+    registry.reload('a')
+    assert registry.version('a') == 0
+
+    assert registry.get('a') == 'v1'
+    registry.reload('a')
+    assert registry.get('a') == 'v2' and registry.version('a') == 2
+    registry.reload('a')
+    assert registry.get('a') == 'v2' and registry.state('a') == READY
+    assert 'medio escribir' in registry.status()['a']['error']
+    assert registry.version('a') == 2
+
+
+def test_watched_paths_groups_models_by_file():
+    registry = ModelRegistry()
+    registry.register('a', lambda: 1, paths=['data/a.pkl'])
+    registry.register('b', lambda: 2, paths=['data/a.pkl', 'data/b.pkl'])
+    assert registry.watched_paths() == {'data/a.pkl': ['a', 'b'], 'data/b.pkl': ['b']}
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indexes import (BEST_BY_GROUP, POSITION_BITS, POSITION_PATTERNS, TEAM_TOP_METRICS,
+                     TOPK_METRICS, build_position_index, build_team_index, build_team_stats,
+                     build_topk_index, in_position_group, topk_rows)
+
+POSITIONS = ['Goalkeeper', 'Defender Centre-Back', 'Defender Left-Back', 'midfield-CentralMidfield',
+             'midfield-AttackingMidfield', 'midfield-DefensiveMidfield', 'Attack Centre-Forward',
+             'Attack-LeftWinger', 'Striker', 'Defender', 'Attack']
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rng = np.random.default_rng(0)
+    n = 500
+    df = pd.DataFrame({
+        'position': rng.choice(POSITIONS, size=n),
+        'team': rng.choice([f'Equipo {i}' for i in range(12)], size=n),
+        'appearance': rng.integers(0, 40, size=n),
+        # Valores con muchos empates para comprobar el desempate por fila
+        'goles_totales': rng.integers(0, 8, size=n),
+        'asistencias_totales': rng.integers(0, 8, size=n),
+        'current_value': rng.choice([0, 0, 500000, 1000000, 2500000], size=n),
+        'age': rng.integers(17, 38, size=n),
+        'yellow cards': rng.integers(0, 10, size=n),
+        'red cards': rng.integers(0, 2, size=n),
+        'clean sheets': rng.integers(0, 3, size=n),
+    })
+    # Un equipo sin portero, medios ni delanteros
+    df.loc[n] = ['Defender Centre-Back', 'Sin portero', 10, 0, 0, 0, 20, 1, 0, 0]
+    df['contribucion_total'] = df['goles_totales'] + df['asistencias_totales']
+    df['minutes played'] = df['appearance'] * 80
+    df['goles_por_partido'] = df['goles_totales'] / df['appearance'].replace(0, np.nan)
+    df['position_group'], _ = build_position_index(df)
+    return df
+
+
+@pytest.mark.parametrize('group', list(POSITION_BITS))
+def test_position_index_matches_regex(frame, group):
+    expected = frame['position'].str.contains(POSITION_PATTERNS[group], case=False, regex=True).to_numpy()
+    _, rows = build_position_index(frame)
+    np.testing.assert_array_equal(in_position_group(frame, group), expected)
+    np.testing.assert_array_equal(rows[group], np.flatnonzero(expected))
+
+
+def test_attacking_midfield_is_in_two_groups(frame):
+    groups, _ = build_position_index(pd.DataFrame({'position': ['midfield-AttackingMidfield']}))
+    assert groups[0] == POSITION_BITS['Midfield'] | POSITION_BITS['Attack']
+
+
+# ==================== EQUIPOS ====================
+
+def test_team_index_matches_groupby(frame):
+    index = build_team_index(frame)
+    assert set(index) == set(frame['team'])
+    for team, rows in index.items():
+        np.testing.assert_array_equal(rows, np.flatnonzero(frame['team'].to_numpy() == team))
+
+
+def test_team_stats_match_per_team_scan(frame):
+    stats = build_team_stats(frame)
+    for team, team_df in frame.groupby('team'):
+        row = stats.loc[team]
+        assert row['jugadores'] == len(team_df)
+        assert row['goles'] == team_df['goles_totales'].sum()
+        assert row['valor'] == team_df['current_value'].sum()
+        assert row['con_valor'] == (team_df['current_value'] > 0).sum()
+        assert row['edad_media'] == pytest.approx(team_df['age'].mean())
+        for metric in TEAM_TOP_METRICS:
+            assert row[f'top_{metric}'] == team_df.nlargest(1, metric).index[0]
+
+        # Mismo criterio que el filtro original por posición + nlargest(1)
+        for group, metric in BEST_BY_GROUP.items():
+            filtered = team_df[team_df['position'].str.contains(POSITION_PATTERNS[group], case=False)]
+            expected = filtered.nlargest(1, metric).index[0] if len(filtered) else -1
+            assert row[f'best_{group}'] == expected
+        gk = team_df[team_df['position'] == 'Goalkeeper']
+        metric = 'clean sheets' if gk['clean sheets'].sum() > 0 else 'appearance'
+        expected = gk.nlargest(1, metric).index[0] if len(gk) else -1
+        assert row['best_Goalkeeper'] == expected
+
+
+# ==================== TOP-K DEL DASHBOARD ====================
+
+@pytest.mark.parametrize('metric', list(TOPK_METRICS))
+def test_topk_matches_nlargest(frame, metric):
+    index = build_topk_index(frame, k=15)
+    for min_matches in [0, 1, 5, 17, 30, 39, 40, 100]:
+        df_f = frame[frame['appearance'] >= min_matches]
+        if TOPK_METRICS[metric]:
+            df_f = df_f[df_f[metric] > 0]
+        rows = topk_rows(index, metric, min_matches)
+        expected = df_f.nlargest(15, metric)
+        np.testing.assert_array_equal(frame[metric].to_numpy()[rows], expected[metric].to_numpy())
+        # Con menos de k candidatos nlargest ordena con un sort inestable y
+        # el orden de los empates es arbitrario; el índice los deja por fila
+        if len(df_f) > 15:
+            np.testing.assert_array_equal(rows, expected.index.to_numpy(),
+                                          err_msg=f"{metric} >= {min_matches}")
+        stable = df_f.sort_values(metric, ascending=False, kind='stable').head(15)
+        np.testing.assert_array_equal(rows, stable.index.to_numpy())
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from model_registry import ERROR, LOADING, PENDING, READY, ModelRegistry
+
+
+def counting_loader(value, delay=0.0):
+    calls = []
+
+    def load():
+        calls.append(1)
+        time.sleep(delay)
+        return value
+    return load, calls
+
+
+def failing_loader():
+    raise OSError("falta el .pkl")
+
+
+def test_loads_lazily_once():
+    registry = ModelRegistry()
+    loader, calls = counting_loader({'modelo': 1})
+    registry.register('a', loader)
+    assert registry.state('a') == PENDING and not calls
+
+    assert registry.get('a') == {'modelo': 1}
+    assert registry.get('a') == {'modelo': 1}
+    assert len(calls) == 1
+    assert registry.state('a') == READY
+    assert registry.version('a') == 1
+
+
+def test_concurrent_gets_share_one_load():
+    registry = ModelRegistry()
+    loader, calls = counting_loader('modelo', delay=0.05)
+    registry.register('a', loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get('a'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['modelo'] * 8
+    assert len(calls) == 1
+
+
+def test_failed_load_is_reported():
+    registry = ModelRegistry()
+    registry.register('a', failing_loader, label="Modelo A")
+    assert registry.get('a') is None
+    status = registry.status()['a']
+    assert status['state'] == ERROR
+    assert 'falta el .pkl' in status['error']
+
+
+def test_get_without_wait_loads_in_background():
+    registry = ModelRegistry()
+    loader, calls = counting_loader('modelo', delay=0.1)
+    registry.register('a', loader)
+    assert registry.get('a', wait=False) is None
+    assert registry.is_loading('a')
+    assert registry.state('a') in (PENDING, LOADING)
+    assert registry.get('a') == 'modelo'
+    assert len(calls) == 1
+
+
+def test_load_async_warms_up_all_models():
+    registry = ModelRegistry()
+    loader_a, _ = counting_loader('a')
+    loader_b, _ = counting_loader('b')
+    registry.register('a', loader_a)
+    registry.register('b', loader_b)
+    registry.load_async().join()
+    assert [registry.state(n) for n in 'ab'] == [READY, READY]
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from neighbors import player_vectors
+
+FEATURES = ['goles', 'asistencias', 'partidos']
+
+
+def make_model(players, frame):
+    scaler = StandardScaler().fit(frame[FEATURES])
+    return {'players_data': players, 'features': FEATURES, 'scaler': scaler}
+
+
+def test_player_vectors_tolerates_duplicate_keys():
+    frame = pd.DataFrame({
+        'name': ['Ana', 'Ana', 'Bea', 'Eva'],
+        'team': ['Rojo', 'Rojo', 'Azul', 'Azul'],
+        'goles': [10, 0, 3, 7],
+        'asistencias': [2, 9, 5, 1],
+        'partidos': [30, 5, 20, 25],
+    })
+    players = pd.DataFrame({'name': ['Eva', 'Ana', 'Lia'], 'team': ['Azul', 'Rojo', 'Azul']})
+    model = make_model(players, frame)
+
+    vectors = player_vectors(model, frame)
+
+    # Ana|Rojo se repite: cuenta su primera fila; Lia no está y queda nula
+    expected = player_vectors(model, frame.drop(index=1))
+    np.testing.assert_array_equal(vectors, expected)
+    np.testing.assert_allclose(np.linalg.norm(vectors[:2], axis=1), 1, rtol=1e-6)
+    assert not vectors[2].any()
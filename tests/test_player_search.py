@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from player_search import build_search_index, fold, player_options, search_players
+
+
+@pytest.fixture(scope='module')
+def frame():
+    return pd.DataFrame({
+        'name': ['Lionel Messi', 'Messias', 'Thomas Müller', 'Martin Ødegaard', 'Gerd Muller',
+                 'Ana Messina', 'Luka Modrić'],
+        'team': ['Inter Miami', 'Genoa', 'Bayern Munich', 'Arsenal FC', 'Bayern Munich',
+                 'Real Madrid', 'Real Madrid'],
+        'position': ['Attack', 'Attack', 'midfield', 'midfield', 'Attack', 'Defender', 'midfield'],
+        'current_value': [30e6, 1e6, 5e6, 90e6, 0, 2e6, 10e6],
+    })
+
+
+def test_fold():
+    assert fold('Thomas Müller') == 'thomas muller'
+    assert fold('Martin Ødegaard') == 'martin odegaard'
+    assert fold('  Modrić, Luka ') == 'modric luka'
+
+
+def test_exact_word_before_prefix_before_rest(frame):
+    index = build_search_index(frame)
+    # Palabra completa (Messi), nombre que empieza así (Messias), resto (Messina)
+    assert list(search_players(index, 'messi')) == [0, 1, 5]
+
+
+def test_words_are_prefixes_of_name_or_team(frame):
+    index = build_search_index(frame)
+    assert list(search_players(index, 'muller')) == [2, 4]
+    assert list(search_players(index, 'bay mu')) == [2, 4]
+    assert list(search_players(index, 'real mod')) == [6]
+    assert list(search_players(index, 'zzz')) == []
+
+
+def test_matches_a_full_scan(frame):
+    index = build_search_index(frame)
+    words = [set(fold(f"{n} {t}").split()) for n, t in zip(frame['name'], frame['team'])]
+    for query in ['m', 'ma', 'mes', 'real', 'a', 'ar', 'b m', 'lu mo']:
+        expected = {i for i, ws in enumerate(words)
+                    if all(any(w.startswith(q) for w in ws) for q in fold(query).split())}
+        assert set(search_players(index, query)) == expected, query
+
+
+def test_empty_query_lists_most_valuable(frame):
+    index = build_search_index(frame)
+    assert list(search_players(index, '', limit=3)) == [3, 0, 6]
+
+
+def test_options_on_a_subset_keep_selected(frame):
+    rows = np.flatnonzero(frame['current_value'].to_numpy() > 0)
+    index = build_search_index(frame, rows)
+    assert list(search_players(index, 'muller')) == [2]
+    options = player_options(index, 'messi', selected=3)
+    assert [o['value'] for o in options] == [0, 1, 5, 3]
+    assert options[-1]['label'] == 'Martin Ødegaard (Arsenal FC) - midfield'
+    assert 'odegaard' in options[-1]['search']
+    # Un seleccionado fuera del índice no se ofrece
+    assert [o['value'] for o in player_options(index, 'zzz', selected=4)] == []
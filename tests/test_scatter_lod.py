@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scatter_lod import density_layer, lod_scatter, stratified_sample
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rng = np.random.default_rng(0)
+    n = 5000
+    return pd.DataFrame({
+        'goles': rng.integers(0, 30, size=n),
+        'valor': rng.random(n) * 1e8,
+        'edad': rng.integers(17, 38, size=n),
+        # Un grupo muy pequeño que no debe desaparecer de la muestra
+        'position': rng.choice(['Attack', 'Defender', 'midfield'], size=n).astype(object),
+    }).assign(position=lambda d: d['position'].where(d.index != 123, 'Goalkeeper'))
+
+
+def test_sample_is_stratified_and_deterministic(frame):
+    sample = stratified_sample(frame, 500, 'position')
+    assert len(sample) == 500
+    assert sample.index.is_unique and sample.index.is_monotonic_increasing
+    assert 123 in sample.index  # el grupo de 1 fila conserva su fila
+    share = sample['position'].value_counts(normalize=True)
+    expected = frame['position'].value_counts(normalize=True)
+    assert (share - expected).abs().drop('Goalkeeper').max() < 0.01
+    pd.testing.assert_frame_equal(stratified_sample(frame, 500, 'position'), sample)
+
+
+def test_sample_keeps_shown_players_when_filter_narrows(frame):
+    sample = stratified_sample(frame, 500, 'position')
+    narrowed = frame[frame['position'] == 'Attack']
+    narrowed_sample = stratified_sample(narrowed, 200, 'position')
+    # Las filas de menor clave estable siguen apareciendo
+    shown = sample.index[sample['position'] == 'Attack']
+    assert set(shown) <= set(narrowed_sample.index)
+
+
+def test_small_frame_is_not_sampled(frame):
+    small = frame.head(100)
+    assert stratified_sample(small, 500, 'position') is small
+
+
+def test_density_counts_every_player(frame):
+    layer = density_layer(frame['goles'], frame['valor'], bins=10)
+    assert np.nansum(np.asarray(layer.z, dtype=float)) == len(frame)
+
+
+@pytest.mark.parametrize('n, sampled, dense', [(1000, False, False), (5000, False, True),
+                                               (5000, True, True)])
+def test_lod_levels(frame, n, sampled, dense):
+    fig = lod_scatter(frame.head(n), 'goles', 'valor', 'position', 'edad',
+                      max_points=3000 if sampled else 20000)
+    types = [trace.type for trace in fig.data]
+    assert types[0] == ('heatmap' if dense else 'scattergl')
+    assert set(types[1:]) <= {'scattergl'}
+    points = sum(len(trace.x) for trace in fig.data if trace.type == 'scattergl')
+    assert points == (3000 if sampled else n)
+    assert bool(fig.layout.annotations) == sampled
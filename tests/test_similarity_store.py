@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from similarity_store import (check_quantized, exact_neighbours, extend_neighbours, neighbour_scores,
+                              quantize_scores)
+
+
+def unit_vectors(n=300, dim=9, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.fixture(scope='module')
+def neighbours():
+    vectors = unit_vectors()
+    top_indices, top_scores = exact_neighbours(vectors, 20)
+    return extend_neighbours(top_indices, top_scores, vectors, k=120)
+
+
+def decode(q, lo, scale):
+    return lo[:, None] + q * scale[:, None].astype(np.float64)
+
+
+def test_ranking_unchanged_after_quantization(neighbours):
+    _, scores = neighbours
+    decoded = decode(*quantize_scores(scores))
+    # Donde el original baja (o se mantiene), el decodificado no sube
+    ordered = np.diff(scores.astype(np.float64), axis=1) <= 0
+    assert ordered.all()
+    assert (np.diff(decoded, axis=1)[ordered] <= 0).all()
+    np.testing.assert_array_equal(np.argsort(-decoded, axis=1, kind='stable'),
+                                  np.argsort(-scores, axis=1, kind='stable'))
+
+
+def test_error_within_half_step(neighbours):
+    _, scores = neighbours
+    q, lo, scale = quantize_scores(scores)
+    error = np.abs(decode(q, lo, scale) - scores)
+    assert (error <= scale[:, None] / 2 + 1e-6).all()
+    assert check_quantized(scores, q, lo, scale) == pytest.approx(error.max())
+
+
+def test_rows_without_duplicates(neighbours):
+    indices, _ = neighbours
+    assert indices.shape == (300, 120)
+    for row, neighbours_of_row in enumerate(indices):
+        assert len(np.unique(neighbours_of_row)) == len(neighbours_of_row)
+        assert neighbours_of_row[0] == row
+
+
+def test_constant_row_decodes_exactly():
+    scores = np.array([[0.5, 0.5, 0.5], [1.0, 0.2, -0.3]], dtype=np.float32)
+    q, lo, scale = quantize_scores(scores)
+    np.testing.assert_allclose(decode(q, lo, scale)[0], 0.5)
+
+
+def test_check_quantized_rejects_reordering():
+    scores = np.array([[1.0, 0.9, 0.5, 0.1]])
+    q, lo, scale = quantize_scores(scores)
+    q[0, [1, 2]] = q[0, [2, 1]]
+    with pytest.raises(ValueError):
+        check_quantized(scores, q, lo, scale)
+
+
+def test_neighbour_scores_decodes_each_row(neighbours):
+    _, scores = neighbours
+    q, lo, scale = quantize_scores(scores)
+    model = {'top_scores_q': q, 'score_min': lo, 'score_scale': scale}
+    for row in (0, 17, 299):
+        np.testing.assert_allclose(neighbour_scores(model, row), decode(q, lo, scale)[row])
@@ -0,0 +1,74 @@
+import os
+import pickle
+
+import pandas as pd
+import pytest
+
+import train_models
+from train_models import check_stage, read_models_manifest
+
+
+def fake_stage(path):
+    def train(df, n_jobs, kept):
+        return {path: {'rows': len(df)}}, {'param': 1}, {'rows': len(df)}
+    return train
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('data')
+    pd.DataFrame({'x': [1, 2, 3]}).to_csv('data/final_data.csv', index=False)
+    monkeypatch.setattr(train_models, 'CSV_PATH', 'data/final_data.csv')
+    monkeypatch.setattr(train_models, 'read_csv', pd.read_csv)
+    monkeypatch.setattr(train_models, 'STAGES', {'a': fake_stage('data/a.pkl'), 'b': fake_stage('data/b.pkl')})
+    monkeypatch.setattr(train_models, 'ARTIFACTS', {'a': ['data/a.pkl'], 'b': ['data/b.pkl']})
+    monkeypatch.setattr(os, 'cpu_count', lambda: 1)
+    # b.pkl ya existe y no lo generó train_models.py
+    with open('data/b.pkl', 'wb') as f:
+        pickle.dump('repo', f)
+    return tmp_path
+
+
+def csv_hash():
+    return train_models.file_hash('data/final_data.csv')
+
+
+def test_missing_trains_only_absent_stages(workdir):
+    train_models.main(['--missing'])
+    manifest = read_models_manifest()
+
+    assert manifest['stages']['a']['trained']
+    assert manifest['stages']['a']['dataset_sha256'] == csv_hash()
+    with open('data/b.pkl', 'rb') as f:
+        assert pickle.load(f) == 'repo'
+    # La etapa conservada no hereda el hash del CSV actual
+    assert manifest['stages']['b']['trained'] is False
+    assert manifest['stages']['b']['dataset_sha256'] is None
+
+    assert check_stage(manifest, 'a', csv_hash()) == []
+    issues = check_stage(manifest, 'b', csv_hash())
+    assert len(issues) == 1 and 'origen desconocido' in issues[0]
+
+
+def test_check_stage_detects_changes(workdir):
+    train_models.main(['a'])
+    manifest = read_models_manifest()
+    assert check_stage(manifest, 'a', csv_hash()) == []
+    assert 'otra versión' in check_stage(manifest, 'a', 'otro-hash')[0]
+    assert 'no aparece' in check_stage(manifest, 'b')[0]
+    assert 'origen desconocido' in check_stage(None, 'a')[-1]
+
+    with open('data/a.pkl', 'wb') as f:
+        pickle.dump('cambiado', f)
+    assert 'no es el generado' in check_stage(manifest, 'a')[0]
+    os.remove('data/a.pkl')
+    assert check_stage(manifest, 'a') == ['falta data/a.pkl']
+
+
+def test_retraining_keeps_other_stage_entries(workdir):
+    train_models.main(['a'])
+    os.remove('data/b.pkl')
+    train_models.main(['b'])
+    stages = read_models_manifest()['stages']
+    assert stages['a']['trained'] and stages['b']['trained']
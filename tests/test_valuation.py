@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+from valuation import feature_matrix, scale_features, score_players, valuation_ranking, value_table
+
+FEATURES = ['age', 'appearance', 'goles_totales', 'days_injured']
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rng = np.random.default_rng(0)
+    n = 400
+    return pd.DataFrame({
+        'name': [f'Jugador {i}' for i in range(n)],
+        'team': rng.choice(['Rojo', 'Azul'], size=n),
+        'position': rng.choice(['Attack', 'Defender'], size=n),
+        'age': rng.integers(17, 38, size=n).astype(np.int8),
+        'appearance': rng.integers(0, 40, size=n).astype(np.int16),
+        'goles_totales': rng.integers(0, 30, size=n),
+        'current_value': rng.choice([0, 1e6, 5e6, 2e7], size=n),
+    })
+
+
+@pytest.fixture(scope='module')
+def valuation(frame):
+    # days_injured no está en el dataset: se rellena con 0
+    X = feature_matrix(frame, FEATURES)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestRegressor(n_estimators=10, random_state=0).fit(scaler.transform(X),
+                                                                      frame['current_value'])
+    return {'model': model, 'scaler': scaler, 'features': FEATURES}
+
+
+def test_feature_matrix(frame):
+    X = feature_matrix(frame, FEATURES, rows=np.array([3, 1]))
+    assert list(X.columns) == FEATURES and (X.dtypes == np.float64).all()
+    assert list(X.index) == [3, 1]
+    assert (X['days_injured'] == 0).all()
+    assert X.loc[3, 'age'] == frame.loc[3, 'age']
+
+
+@pytest.mark.parametrize('scaler_class', [StandardScaler, MinMaxScaler])
+def test_scale_features_matches_sklearn(frame, scaler_class):
+    X = feature_matrix(frame, FEATURES)
+    scaler = scaler_class().fit(X)
+    np.testing.assert_allclose(scale_features(scaler, X), scaler.transform(X), rtol=1e-12)
+
+
+def test_bulk_scores_match_one_by_one(frame, valuation):
+    bulk = score_players(valuation, frame)
+    for row in [0, 7, 123, 399]:
+        X = feature_matrix(frame, FEATURES, rows=[row])
+        single = valuation['model'].predict(valuation['scaler'].transform(X))
+        assert bulk[row] == pytest.approx(single[0], rel=1e-12)
+    np.testing.assert_array_equal(score_players(valuation, frame, rows=np.array([5, 2])), bulk[[5, 2]])
+    assert len(score_players(valuation, frame, rows=np.array([], dtype=int))) == 0
+
+
+def test_value_table_and_ranking(frame, valuation):
+    values = value_table(valuation, frame)
+    real = frame['current_value'].to_numpy()
+    np.testing.assert_allclose(values['value_gap'], values['predicted_value'] - real)
+    assert (values['value_gap_pct'][real == 0] == 0).all()
+
+    top = valuation_ranking(frame, values, n=10, undervalued=True)
+    eligible = frame[(frame['current_value'] > 0) & (frame['appearance'] >= 10)]
+    gap_pct = values.loc[eligible.index, 'value_gap_pct']
+    assert list(top.index) == list(gap_pct.sort_values(ascending=False, kind='stable').index[:10])
+    bottom = valuation_ranking(frame, values, n=10, undervalued=False)
+    assert list(bottom.index) == list(gap_pct.sort_values(kind='stable').index[:10])
@@ -0,0 +1,346 @@
+# Football Analytics Pro - Entrenamiento reproducible de los modelos
+# Uso: python train_models.py [valuation clustering anomaly recommendation] [--missing]
+#
+# Regenera todos los .pkl de data/ a partir de final_data.csv. Las cuatro
+# etapas son independientes: se entrenan en paralelo en un pool de procesos
+# y cada estimador usa n_jobs con los núcleos que le tocan (BLAS/OpenMP
+# limitados a los mismos, sin sobresuscribir la máquina). Todas las semillas
+# son fijas: el mismo CSV da los mismos modelos.
+#
+# Al terminar se escribe data/models_manifest.json con el hash del CSV, las
+# versiones de las librerías, y por etapa el tiempo, los parámetros, las
+# métricas y el tamaño/hash de cada fichero generado. app.py lo comprueba al
+# cargar cada modelo. Sin argumentos se entrenan todas las etapas; con
+# --missing solo las que tienen algún fichero ausente, sin sobrescribir los
+# que ya existen (el build de Render conserva así los .pkl del repositorio),
+# y las etapas que no se entrenan quedan en el manifest con sus ficheros.
+
+import json
+import os
+import pickle
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from build_data import CSV_PATH, file_hash, file_stamp, read_csv
+from forest_inference import FOREST_PKL
+
+MODELS_MANIFEST = 'data/models_manifest.json'
+MANIFEST_VERSION = 2
+RANDOM_STATE = 42
+
+VALUATION_FEATURES = ['age', 'appearance', 'goles_totales', 'asistencias_totales', 'minutes played',
+                      'days_injured', 'position_encoded', 'goles_por_partido',
+                      'asistencias_por_partido', 'contribucion_total']
+RECOMMENDATION_FEATURES = ['goles_totales', 'asistencias_totales', 'appearance', 'minutes played',
+                           'yellow cards', 'age', 'contribucion_total', 'goles_por_partido',
+                           'asistencias_por_partido']
+
+# Ficheros que genera cada etapa
+ARTIFACTS = {
+    'valuation': [FOREST_PKL, 'data/scaler_valuation.pkl', 'data/features_valuation.pkl'],
+    'clustering': ['data/model_clustering.pkl'],
+    'anomaly': ['data/model_anomaly.pkl'],
+    'recommendation': ['data/model_recommendation_optimized.pkl'],
+}
+
+
+def write_pickle(obj, path):
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def read_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def artifact_entry(path):
+    return {'bytes': os.path.getsize(path), 'sha256': file_hash(path), 'stamp': file_stamp(path)}
+
+
+# ==================== ETAPAS ====================
+# Cada etapa recibe el dataset, los núcleos de su estimador y los ficheros
+# suyos que se conservan ({ruta: objeto}, vacío salvo con --missing) y
+# devuelve ({ruta: objeto a guardar}, parámetros, métricas)
+
+def train_valuation(df, n_jobs, kept):
+    """Random Forest del valor de mercado (€) con las features escaladas.
+
+    Si se conservan el scaler o la lista de features, el forest se entrena
+    con ellos para que siga siendo coherente con los ficheros existentes.
+    """
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.metrics import mean_absolute_error, r2_score
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+
+    features = list(kept.get('data/features_valuation.pkl', VALUATION_FEATURES))
+    market = df[df['current_value'] > 0]
+    X = market[features].astype(np.float64)
+    X_train, X_test, y_train, y_test = train_test_split(X, market['current_value'], test_size=0.2,
+                                                        random_state=RANDOM_STATE)
+    scaler = kept.get('data/scaler_valuation.pkl') or StandardScaler().fit(X_train)
+    # Hojas de al menos 3 jugadores: mejor R² en test que los árboles completos
+    # (0.47 frente a 0.46) y un .pkl de ~21 MB en lugar de ~68 MB
+    params = {'n_estimators': 100, 'min_samples_leaf': 3, 'random_state': RANDOM_STATE}
+    model = RandomForestRegressor(n_jobs=n_jobs, **params).fit(scaler.transform(X_train), y_train)
+    # Guardado sin paralelismo: predict con n_jobs no compensa para un jugador
+    model.set_params(n_jobs=None)
+
+    predicted = model.predict(scaler.transform(X_test))
+    metrics = {'train_rows': len(X_train), 'test_rows': len(X_test),
+               'r2': float(r2_score(y_test, predicted)),
+               'mae': float(mean_absolute_error(y_test, predicted))}
+    artifacts = {FOREST_PKL: model, 'data/scaler_valuation.pkl': scaler,
+                 'data/features_valuation.pkl': features}
+    return artifacts, params, metrics
+
+
+def style_label(center):
+    """Nombre del estilo de un centroide (en unidades originales de las features)."""
+    goals, assists = center['goles_por_90'], center['asist_por_90']
+    if goals + assists < 0.05:
+        return '⚪ Defensores Sólidos'
+    if center['linea_posicion'] >= 5 and center['ratio_goleador'] > 0.6:
+        return '🔴 Goleadores Puros'
+    if goals > 0.5:
+        return '🟣 Delanteros Completos'
+    if center['linea_posicion'] >= 3:
+        return '🟢 Mediapuntas'
+    if center['ratio_asistente'] > 0.6:
+        return '🟦 Defensores Ofensivos'
+    return '🟤 Defensores Anotadores'
+
+
+def train_clustering(df, n_jobs, kept):
+    """K-Means de estilos de juego, PCA 2D para el mapa y etiqueta de cada cluster."""
+    from sklearn.cluster import KMeans
+    from sklearn.decomposition import PCA
+    from sklearn.preprocessing import StandardScaler
+
+    from cluster_service import eligible_rows, style_features
+
+    players = df.iloc[eligible_rows(df)]
+    features = style_features(players)
+    scaler = StandardScaler().fit(features)
+    X = scaler.transform(features)
+    params = {'n_clusters': 8, 'n_init': 20, 'max_iter': 500, 'random_state': RANDOM_STATE}
+    kmeans = KMeans(**params).fit(X)
+    pca = PCA(n_components=2, random_state=RANDOM_STATE).fit(X)
+
+    centers = pd.DataFrame(scaler.inverse_transform(kmeans.cluster_centers_), columns=features.columns)
+    labels = [style_label(center) for _, center in centers.iterrows()]
+    xy = pca.transform(X)
+    data = players[['name', 'team', 'position', 'age']].reset_index(drop=True)
+    data['cluster'] = kmeans.labels_.astype(np.int32)
+    data['pca_x'], data['pca_y'] = xy[:, 0], xy[:, 1]
+    for col in ['goles_totales', 'asistencias_totales', 'appearance', 'current_value']:
+        data[col] = players[col].to_numpy()
+
+    model = {'model': kmeans, 'scaler': scaler, 'pca': pca, 'features': list(features.columns),
+             'labels': labels, 'data': data}
+    metrics = {'rows': len(data), 'inertia': float(kmeans.inertia_),
+               'sizes': np.bincount(kmeans.labels_).tolist(),
+               'pca_variance': float(pca.explained_variance_ratio_.sum())}
+    return {'data/model_clustering.pkl': model}, params, metrics
+
+
+def train_anomaly(df, n_jobs, kept):
+    """Isolation Forest sobre rendimiento, valor y edad, y la lista de gangas por defecto."""
+    from sklearn.ensemble import IsolationForest
+
+    from bargains import (ANOMALY_FEATURES, BARGAIN_COLUMNS, bargain_ranking, performance_score,
+                          score_table)
+
+    market = df[df['current_value'] > 0].assign(rendimiento_score=lambda d: performance_score(d))
+    params = {'n_estimators': 100, 'contamination': 0.05, 'random_state': RANDOM_STATE}
+    forest = IsolationForest(n_jobs=n_jobs, **params).fit(market[ANOMALY_FEATURES])
+    forest.set_params(n_jobs=None)
+
+    model = {'model': forest}
+    scores = score_table(model, df)
+    gangas = bargain_ranking(df, scores)
+    model['gangas'] = gangas[BARGAIN_COLUMNS + ['ratio', 'rendimiento_score']]
+    metrics = {'train_rows': len(market), 'outliers': int(scores['outlier'].sum()),
+               'gangas': len(gangas)}
+    return {'data/model_anomaly.pkl': model}, params, metrics
+
+
+def train_recommendation(df, n_jobs, kept):
+    """Vecinos más parecidos (coseno sobre features escaladas) de cada jugador de campo."""
+    from sklearn.preprocessing import StandardScaler
+
+    from similarity_store import exact_neighbours
+
+    outfield = ~df['position'].astype(str).str.contains('Goalkeeper')
+    players = df[(df['appearance'] >= 5) & (df['current_value'] > 0) & outfield].reset_index(drop=True)
+    scaler = StandardScaler().fit(players[RECOMMENDATION_FEATURES])
+    X = scaler.transform(players[RECOMMENDATION_FEATURES])
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    params = {'top_k': 50, 'min_appearances': 5}
+    top_indices, top_scores = exact_neighbours(X / np.where(norms > 0, norms, 1), params['top_k'])
+
+    model = {
+        'scaler': scaler,
+        'features': list(RECOMMENDATION_FEATURES),
+        'top_indices': top_indices.astype(np.int32),
+        'top_scores': top_scores.astype(np.float32),
+        'players_data': players[['name', 'team', 'position', 'age', 'appearance', 'goles_totales',
+                                 'asistencias_totales', 'current_value']],
+    }
+    return {'data/model_recommendation_optimized.pkl': model}, params, {'rows': len(players)}
+
+
+STAGES = {
+    'valuation': train_valuation,
+    'clustering': train_clustering,
+    'anomaly': train_anomaly,
+    'recommendation': train_recommendation,
+}
+
+
+def run_stage(name, df, n_jobs, keep=False):
+    """Entrena y guarda una etapa; devuelve su entrada del manifest.
+
+    Con `keep` los ficheros de la etapa que ya existen no se sobrescriben:
+    se pasan a la etapa y solo se guardan los que faltaban.
+    """
+    from threadpoolctl import threadpool_limits
+
+    start = time.perf_counter()
+    kept = {path: read_pickle(path) for path in ARTIFACTS[name] if keep and os.path.exists(path)}
+    with threadpool_limits(limits=n_jobs):
+        artifacts, params, metrics = STAGES[name](df, n_jobs, kept)
+    train_seconds = time.perf_counter() - start
+    for path, obj in artifacts.items():
+        if path not in kept:
+            write_pickle(obj, path)
+    return {
+        'trained': True,
+        'kept': sorted(kept),
+        'seconds': round(time.perf_counter() - start, 3),
+        'train_seconds': round(train_seconds, 3),
+        'n_jobs': n_jobs,
+        'params': params,
+        'metrics': metrics,
+        'artifacts': {path: artifact_entry(path) for path in artifacts},
+    }
+
+
+# ==================== MANIFEST ====================
+
+def read_models_manifest(path=MODELS_MANIFEST):
+    """Manifest de train_models.py o None si no existe (o es de otra versión)."""
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('version') == MANIFEST_VERSION else None
+
+
+def check_stage(manifest, name, dataset_sha256=None):
+    """Problemas de los ficheros de la etapa `name` frente al manifest (lista vacía si está al día).
+
+    Igual que el snapshot: si tamaño y mtime coinciden no se calcula el hash.
+    Una etapa registrada sin entrenar (--missing con sus ficheros ya
+    presentes) solo garantiza que los ficheros no han cambiado: su origen y
+    el CSV con que se entrenó son desconocidos.
+    """
+    stage = (manifest or {}).get('stages', {}).get(name)
+    if stage is None:
+        missing = [f"falta {path}" for path in ARTIFACTS.get(name, []) if not os.path.exists(path)]
+        if manifest is None:
+            return missing + [f"sin {MODELS_MANIFEST}: modelos de origen desconocido (python train_models.py)"]
+        return missing + [f"{name} no aparece en {MODELS_MANIFEST}"]
+
+    issues = []
+    for path, entry in stage['artifacts'].items():
+        if not os.path.exists(path):
+            issues.append(f"falta {path}")
+        elif entry['stamp'] != file_stamp(path) and (os.path.getsize(path) != entry['bytes']
+                                                     or file_hash(path) != entry['sha256']):
+            issues.append(f"{path} no es el generado por train_models.py")
+    if not stage.get('trained'):
+        issues.append(f"{name}: modelos de origen desconocido, no los entrenó train_models.py")
+    elif dataset_sha256 is not None and stage['dataset_sha256'] != dataset_sha256:
+        issues.append(f"{name} se entrenó con otra versión de {manifest['dataset']['path']}")
+    return issues
+
+
+def library_versions():
+    import sklearn
+    return {'python': platform.python_version(), 'numpy': np.__version__,
+            'pandas': pd.__version__, 'scikit-learn': sklearn.__version__}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    unknown = [a for a in argv if a not in STAGES and a != '--missing']
+    if unknown:
+        raise SystemExit(f"❌ Etapas desconocidas: {', '.join(unknown)} (disponibles: {', '.join(STAGES)})")
+    names = [a for a in argv if a in STAGES] or list(STAGES)
+    keep = '--missing' in argv
+    if keep:
+        names = [n for n in names if not all(os.path.exists(p) for p in ARTIFACTS[n])]
+
+    start = time.perf_counter()
+    df = read_csv(CSV_PATH)
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(len(names), cpus))
+    n_jobs = max(1, cpus // workers)
+
+    if names:
+        print(f"🏋️ Entrenando {', '.join(names)} ({workers} procesos × {n_jobs} núcleos)")
+    else:
+        print("✅ Todos los modelos existen: nada que entrenar")
+
+    if workers == 1:
+        stages = {name: run_stage(name, df, n_jobs, keep) for name in names}
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {name: pool.submit(run_stage, name, df, n_jobs, keep) for name in names}
+            stages = {name: future.result() for name, future in futures.items()}
+    for name, stage in stages.items():
+        size = sum(a['bytes'] for a in stage['artifacts'].values())
+        print(f"  ✅ {name}: {stage['seconds']:.2f}s, {size / 1e6:.1f} MB {stage['metrics']}")
+
+    # Cada etapa guarda el hash del CSV con que se entrenó. Las no entrenadas
+    # ahora conservan su entrada anterior; con --missing, las que no la
+    # tienen se registran con sus ficheros actuales y sin hash (origen
+    # desconocido)
+    dataset_sha256 = file_hash(CSV_PATH)
+    for stage in stages.values():
+        stage['dataset_sha256'] = dataset_sha256
+    stages = {**(read_models_manifest() or {}).get('stages', {}), **stages}
+    if keep:
+        for name in STAGES:
+            if name not in stages:
+                stages[name] = {'trained': False, 'dataset_sha256': None,
+                                'artifacts': {path: artifact_entry(path) for path in ARTIFACTS[name]}}
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'dataset': {'path': CSV_PATH, 'sha256': dataset_sha256, 'rows': len(df)},
+        'libraries': library_versions(),
+        'random_state': RANDOM_STATE,
+        'workers': workers,
+        'seconds': round(time.perf_counter() - start, 3),
+        'stages': {name: stages[name] for name in STAGES if name in stages},
+    }
+    tmp = f"{MODELS_MANIFEST}.tmp-{os.getpid()}"
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, MODELS_MANIFEST)
+    print(f"✅ Modelos: {len(names)} etapas en {manifest['seconds']:.1f}s → {MODELS_MANIFEST}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# Football Analytics Pro - Valoración de todos los jugadores de una vez
+#
+# El Random Forest de valoración tiene un coste fijo alto por llamada, así
+# que en lugar de predecir un jugador por click se puntúa la tabla entera
+# en una sola pasada vectorizada (al arrancar o tras una recarga) y los
+# callbacks leen el resultado. score_players() sirve también para listas
+# arbitrarias de jugadores.
+
+import numpy as np
+import pandas as pd
+
+# Mínimo de partidos para entrar en los rankings de infra/sobrevalorados
+RANKING_MIN_MATCHES = 10
+
+
+def feature_matrix(frame, features, rows=None):
+    """DataFrame float64 con las columnas `features` (0 si falta alguna), en ese orden."""
+    index = frame.index if rows is None else frame.index[rows]
+    columns = {}
+    for feat in features:
+        if feat not in frame.columns:
+            columns[feat] = np.zeros(len(index))
+            continue
+        values = frame[feat].to_numpy()
+        columns[feat] = (values if rows is None else values[rows]).astype(np.float64)
+    return pd.DataFrame(columns, index=index)
+
+
+def scale_features(scaler, X):
+    """scaler.transform(X); un StandardScaler se aplica directamente en NumPy.
+
+    Misma aritmética que sklearn ((X - mean_) / scale_) sin su validación
+    de la entrada, que para un solo jugador cuesta más que el propio cálculo.
+    """
+    if type(scaler).__name__ != 'StandardScaler':
+        return scaler.transform(X)
+    X = np.array(X, dtype=np.float64)
+    if scaler.with_mean:
+        X -= scaler.mean_
+    if scaler.with_std:
+        X /= scaler.scale_
+    return X
+
+
+def score_players(valuation, frame, rows=None):
+    """Valor predicho (array) de las filas `rows` de `frame` (todas por defecto).
+
+    Una sola llamada al scaler y a model.predict para todo el lote: el
+    coste por jugador es una fracción del de predecirlos de uno en uno.
+    """
+    X = feature_matrix(frame, valuation['features'], rows)
+    if len(X) == 0:
+        return np.empty(0)
+    return valuation['model'].predict(scale_features(valuation['scaler'], X))
+
+
+def value_table(valuation, frame):
+    """predicted_value, value_gap (predicho - real) y value_gap_pct de cada jugador."""
+    predicted = score_players(valuation, frame)
+    real = frame['current_value'].to_numpy(dtype=np.float64)
+    gap = predicted - real
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gap_pct = np.where(real > 0, gap / real * 100, 0.0)
+    return pd.DataFrame({'predicted_value': predicted, 'value_gap': gap, 'value_gap_pct': gap_pct},
+                        index=frame.index)
+
+
+def valuation_ranking(frame, values, n=10, undervalued=True, min_matches=RANKING_MIN_MATCHES):
+    """Los `n` jugadores más infravalorados (o sobrevalorados) según la diferencia en %.
+
+    Solo cuentan jugadores con valor de mercado y al menos `min_matches`
+    partidos, para que no dominen los de muestras muy pequeñas.
+    """
+    eligible = (frame['current_value'].to_numpy() > 0) & (frame['appearance'].to_numpy() >= min_matches)
+    gap_pct = values['value_gap_pct'].to_numpy()
+    candidates = np.flatnonzero(eligible)
+    order = np.argsort(-gap_pct[candidates] if undervalued else gap_pct[candidates], kind='stable')
+    rows = candidates[order[:n]]
+    return frame.iloc[rows][['name', 'team', 'position', 'current_value']].join(values.iloc[rows])